@@ -0,0 +1,119 @@
+"""
+CONTENT-ADDRESSED ARTIFACT STORE
+Trained models live in <root>/<key>/, where the key is a hash of everything
+that determines them: input data, hyperparameters, code format version.
+Changed data or config therefore yields a new key and can never pick up a
+stale artifact, while an unchanged request is a directory lookup.
+
+Entries are built in a private temp directory and renamed into place in one
+step, so readers only ever see complete entries. Every load touches the
+entry's meta file; evict() drops the least recently used entries beyond the
+configured count, never touching protected (live) keys.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+META_FILE = "meta.json"
+
+
+def data_digest(values):
+    """Stable digest of an array's dtype, shape and bytes (~10 µs for 8760 floats)."""
+    arr = np.ascontiguousarray(values)
+    h = hashlib.sha256(f"{arr.dtype.str}{arr.shape}".encode())
+    h.update(arr.tobytes())
+    return h.hexdigest()[:20]
+
+
+def _canonical(obj):
+    if isinstance(obj, np.ndarray):
+        return {"__array__": data_digest(obj)}
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def artifact_key(*parts):
+    """Hash of JSON-able parts; arrays are replaced by their data digest."""
+    blob = json.dumps(_canonical(parts), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()[:24]
+
+
+class ArtifactStore:
+    def __init__(self, root="model_store", max_entries=24):
+        self.root = root
+        self.max_entries = max_entries
+
+    def path(self, key):
+        return os.path.join(self.root, key)
+
+    def has(self, key):
+        return os.path.exists(os.path.join(self.path(key), META_FILE))
+
+    def open(self, key):
+        """(entry dir, meta dict) for a complete entry, or None. Marks it recently used."""
+        meta_path = os.path.join(self.path(key), META_FILE)
+        try:
+            with open(meta_path) as fin:
+                meta = json.load(fin)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        return self.path(key), meta
+
+    def put(self, key, write, meta=None, protect=()):
+        """
+        Builds an entry with write(tmp_dir) and publishes it atomically.
+        If another writer published the same key first, theirs is kept
+        (same key, same content). Returns the entry dir.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            write(tmp)
+            with open(os.path.join(tmp, META_FILE), "w") as fout:
+                json.dump(dict(meta or {}, key=key), fout, indent=1)
+            try:
+                os.rename(tmp, self.path(key))
+            except OSError:
+                if not self.has(key):
+                    raise
+        finally:
+            if os.path.exists(tmp):
+                shutil.rmtree(tmp, ignore_errors=True)
+        self.evict(protect=set(protect) | {key})
+        return self.path(key)
+
+    def entries(self):
+        """[(last_used, key)] for complete entries, oldest first."""
+        out = []
+        if not os.path.isdir(self.root):
+            return out
+        for key in os.listdir(self.root):
+            try:
+                out.append((os.stat(os.path.join(self.root, key, META_FILE)).st_mtime, key))
+            except OSError:
+                continue   # temp dirs and partial entries
+        return sorted(out)
+
+    def evict(self, protect=()):
+        """Removes least recently used entries beyond max_entries."""
+        entries = self.entries()
+        excess = len(entries) - self.max_entries
+        candidates = [k for _, k in entries if k not in protect]
+        for key in candidates[:max(0, excess)]:
+            # Rename first so a concurrent reader never sees a half-deleted entry
+            doomed = tempfile.mkdtemp(prefix=".del-", dir=self.root)
+            try:
+                os.rename(self.path(key), os.path.join(doomed, key))
+            except OSError:
+                pass
+            shutil.rmtree(doomed, ignore_errors=True)
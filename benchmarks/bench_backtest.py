@@ -0,0 +1,227 @@
+"""
+ROLLING-ORIGIN BACKTEST: ACCURACY VS. LATENCY
+Evaluates the forecasters on many forecast origins across the year instead of
+one fixed 80/20 split. Origins are grouped into blocks; each (model, block)
+fold fits on the trailing --train-window hours before the block and then
+issues a next --horizon forecast at every --stride-th hour inside it, using
+only hours before each origin. Folds run in parallel on a process pool.
+
+Models (each mirrors how it is served):
+  naive    seasonal naive, same hour yesterday
+  ridge    direct multi-horizon ridge on lag + hour-of-day features
+  prophet  Prophet curve precomputed at fit time, sliced per origin
+  lstm     LSTM trained in Keras, rolled out recursively on the NumPy kernel
+  profile  NumPy fallback for Prophet (trend + hour-of-week profile)
+  lagls    NumPy fallback for the LSTM (least squares on lags, recursive)
+
+Reports RMSE per horizon step and mean RMSE/MAE next to fit time per fold
+and per-origin inference latency.
+
+Run from the repository root:
+    python -m benchmarks.bench_backtest --models naive ridge --workers 4
+    python -m benchmarks.bench_backtest --json backtest.json
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+CSV_PATH = "Historical_Data/Total_P&Q.csv"
+MODELS = ("naive", "ridge", "prophet", "lstm", "profile", "lagls")
+REPORT_STEPS = (1, 6, 12, 24)
+
+
+class SeasonalNaive:
+    def __init__(self, horizon, **_):
+        self.horizon = horizon
+
+    def fit(self, train, start_hour):
+        return self
+
+    def predict(self, history, origin):
+        h = np.arange(self.horizon)
+        return history[origin + h - 24 * (1 + h // 24)]
+
+
+class LagRidge:
+    """Single-series MultiBusForecaster; train windows start on a day boundary."""
+    def __init__(self, horizon, **_):
+        from bus_forecaster import MultiBusForecaster
+        self.model = MultiBusForecaster(horizon=horizon)
+
+    def fit(self, train, start_hour):
+        self.start_hour = start_hour
+        self.model.fit(train[:, np.newaxis])
+        return self
+
+    def predict(self, history, origin):
+        return self.model.predict(history[self.start_hour:, np.newaxis], origin - self.start_hour)[:, 0]
+
+
+class ProphetCurve:
+    def __init__(self, horizon, block_end, **_):
+        self.horizon = horizon
+        self.block_end = block_end
+
+    def fit(self, train, start_hour):
+        import forecasting
+        model = forecasting.fit_prophet(train, start_hour=start_hour)
+        self.curve_start = start_hour + len(train)
+        ds = forecasting.hour_timestamps(self.curve_start, self.block_end + self.horizon - self.curve_start)
+        self.curve = model.predict(pd.DataFrame({'ds': ds}))['yhat'].values
+        return self
+
+    def predict(self, history, origin):
+        lo = origin - self.curve_start
+        return self.curve[lo:lo + self.horizon]
+
+
+class LSTMKernel:
+    def __init__(self, horizon, epochs, **_):
+        self.horizon = horizon
+        self.epochs = epochs
+
+    def fit(self, train, start_hour):
+        import forecasting
+        from lstm_numpy import kernel_from_keras
+        keras_model, scaler = forecasting.fit_lstm(train, epochs=self.epochs)
+        self.kernel = kernel_from_keras(keras_model, scaler)
+        return self
+
+    def predict(self, history, origin):
+        k = self.kernel
+        window = k.scaler.transform(history[origin - k.lookback:origin].reshape(-1, 1)).ravel()
+        return k.scaler.inverse_transform(k.rollout(window, self.horizon).reshape(-1, 1)).ravel()
+
+
+class ProfileCurve(ProphetCurve):
+    def fit(self, train, start_hour):
+        import forecasting
+        from fallback_forecaster import SeasonalProfile
+        model = SeasonalProfile(forecasting.FORECAST_EPOCH).fit(train, start_hour)
+        self.curve_start = start_hour + len(train)
+        self.curve = model.predict_hours(np.arange(self.curve_start, self.block_end + self.horizon))
+        return self
+
+
+class LagLSRollout(LSTMKernel):
+    def fit(self, train, start_hour):
+        from fallback_forecaster import LagLeastSquares
+        self.kernel = LagLeastSquares().fit(train)
+        return self
+
+
+FACTORIES = {"naive": SeasonalNaive, "ridge": LagRidge, "prophet": ProphetCurve, "lstm": LSTMKernel,
+             "profile": ProfileCurve, "lagls": LagLSRollout}
+
+
+def run_fold(model_name, series, train_start, origins, horizon, epochs):
+    """Fits one model before the block and forecasts every origin in it."""
+    block_end = int(origins[-1]) + 1
+    model = FACTORIES[model_name](horizon=horizon, epochs=epochs, block_end=block_end)
+    train = series[train_start:origins[0]]
+    t0 = time.perf_counter()
+    model.fit(train, train_start)
+    fit_s = time.perf_counter() - t0
+
+    errors = np.empty((len(origins), horizon))
+    infer_ms = np.empty(len(origins))
+    for i, origin in enumerate(origins):
+        history = series[:origin]   # nothing at or after the origin is visible
+        t = time.perf_counter()
+        pred = model.predict(history, origin)
+        infer_ms[i] = (time.perf_counter() - t) * 1e3
+        errors[i] = pred - series[origin:origin + horizon]
+    return {"model": model_name, "errors": errors, "fit_s": fit_s, "infer_ms": infer_ms}
+
+
+def make_folds(n_hours, horizon, train_window, refit_every, stride, start):
+    """(train_start, origins) per block; train windows begin on a day boundary."""
+    folds = []
+    last_origin = n_hours - horizon
+    for block_start in range(start, last_origin + 1, refit_every):
+        origins = np.arange(block_start, min(block_start + refit_every, last_origin + 1), stride)
+        train_start = max(0, (block_start - train_window) // 24 * 24)
+        folds.append((train_start, origins))
+    return folds
+
+
+def available_models(names):
+    import forecasting
+    skip = {"prophet": not forecasting.PROPHET_AVAILABLE, "lstm": not forecasting.LSTM_AVAILABLE}
+    for name in names:
+        if skip.get(name):
+            print(f"skipping {name}: dependency not installed")
+    return [name for name in names if not skip.get(name)]
+
+
+def summarize(results, horizon):
+    summary = {}
+    for name in dict.fromkeys(r["model"] for r in results):
+        rs = [r for r in results if r["model"] == name]
+        err = np.concatenate([r["errors"] for r in rs])
+        infer = np.concatenate([r["infer_ms"] for r in rs])
+        rmse = np.sqrt(np.mean(err ** 2, axis=0))
+        summary[name] = {
+            "origins": len(err), "folds": len(rs),
+            "rmse_per_step": rmse.tolist(), "mae_per_step": np.mean(np.abs(err), axis=0).tolist(),
+            "rmse": float(np.sqrt(np.mean(err ** 2))), "mae": float(np.mean(np.abs(err))),
+            "fit_s_mean": float(np.mean([r["fit_s"] for r in rs])),
+            "infer_ms_p50": float(np.percentile(infer, 50)), "infer_ms_p95": float(np.percentile(infer, 95)),
+        }
+    return summary
+
+
+def print_table(summary, horizon):
+    steps = [s for s in REPORT_STEPS if s <= horizon]
+    header = f"{'model':<8} {'origins':>7} " + " ".join(f"{f'rmse@{s}h':>9}" for s in steps)
+    header += f" {'rmse':>8} {'mae':>8} {'fit s':>7} {'infer p50':>10} {'p95 ms':>8}"
+    print(header)
+    for name, s in summary.items():
+        row = f"{name:<8} {s['origins']:>7} " + " ".join(f"{s['rmse_per_step'][k - 1]:>9.1f}" for k in steps)
+        row += f" {s['rmse']:>8.1f} {s['mae']:>8.1f} {s['fit_s_mean']:>7.2f} {s['infer_ms_p50']:>10.3f} {s['infer_ms_p95']:>8.3f}"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=list(MODELS))
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--train-window", type=int, default=24 * 7 * 8, help="Trailing hours each fold fits on")
+    parser.add_argument("--refit-every", type=int, default=24 * 28, help="Hours per block (one fit per block)")
+    parser.add_argument("--stride", type=int, default=24, help="Hours between forecast origins")
+    parser.add_argument("--start", type=int, default=None, help="First origin (default: one train window in)")
+    parser.add_argument("--epochs", type=int, default=5, help="LSTM epochs per fold")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--json", help="Write the full per-step summary here")
+    args = parser.parse_args()
+
+    series = pd.read_csv(CSV_PATH)["Total_Active_Power"].values.astype(float)
+    start = args.train_window if args.start is None else args.start
+    folds = make_folds(len(series), args.horizon, args.train_window, args.refit_every, args.stride, start)
+    models = available_models(args.models)
+    tasks = [(name, series, train_start, origins, args.horizon, args.epochs)
+             for name in models for train_start, origins in folds]
+    print(f"{len(folds)} folds x {len(models)} models = {len(tasks)} tasks on {args.workers} workers")
+
+    t0 = time.perf_counter()
+    # spawn: TensorFlow is not fork-safe once initialised
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context("spawn")) as pool:
+        results = list(pool.map(run_fold, *zip(*tasks)))
+    print(f"backtest wall time {time.perf_counter() - t0:.1f}s\n")
+
+    summary = summarize(results, args.horizon)
+    print_table(summary, args.horizon)
+    if args.json:
+        with open(args.json, "w") as fout:
+            json.dump({"config": vars(args), "summary": summary}, fout, indent=1)
+        print(f"\nwrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
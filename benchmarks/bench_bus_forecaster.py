@@ -0,0 +1,58 @@
+"""
+WALL-TIME SCALING: PER-BUS MULTI-OUTPUT FORECASTER
+Grows the number of series by tiling the metered feeder columns (with small
+multiplicative noise) and times the batched fit / all-bus inference against
+fitting one model per bus in a Python loop.
+
+Run from the repository root:
+    python -m benchmarks.bench_bus_forecaster --buses 15 59 120 240 480
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bus_forecaster import MultiBusForecaster, load_bus_matrix
+
+
+def _grow(Y, n_buses, rng):
+    reps = -(-n_buses // Y.shape[1])
+    tiled = np.tile(Y, (1, reps))[:, :n_buses]
+    return tiled * rng.uniform(0.9, 1.1, size=tiled.shape)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buses", type=int, nargs="+", default=[15, 59, 120, 240])
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--loop-max", type=int, default=120, help="Skip the per-bus loop baseline above this size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    _, Y_base = load_bus_matrix()
+    split = int(len(Y_base) * 0.8)
+
+    print(f"{'BUSES':>6}{'BATCH FIT (s)':>15}{'LOOP FIT (s)':>14}{'PREDICT ALL (ms)':>18}{'us/BUS':>9}")
+    for n in args.buses:
+        Y = _grow(Y_base, n, rng)
+        t = time.perf_counter()
+        model = MultiBusForecaster(horizon=args.horizon).fit(Y[:split])
+        fit_s = time.perf_counter() - t
+
+        loop_s = float("nan")
+        if n <= args.loop_max:
+            t = time.perf_counter()
+            for j in range(n):
+                MultiBusForecaster(horizon=args.horizon).fit(Y[:split, j:j + 1])
+            loop_s = time.perf_counter() - t
+
+        model.predict(Y, split)
+        t = time.perf_counter()
+        for _ in range(20):
+            model.predict(Y, split)
+        pred_ms = (time.perf_counter() - t) / 20 * 1e3
+        print(f"{n:>6}{fit_s:>15.3f}{loop_s:>14.3f}{pred_ms:>18.2f}{pred_ms * 1e3 / n:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
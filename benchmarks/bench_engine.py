@@ -0,0 +1,123 @@
+"""
+SHARED SIMULATION ENGINE VS. PER-SESSION PHYSICS
+Compares what N open dashboard sessions cost per tick:
+
+  per-session  every session advances its own grid state (the old model: the
+               master tick ran inside each session's fragment) and walks
+               every bus in Python for the topology view
+  shared       one engine tick (grid_physics.tick with the vectorized network
+               solve) plus N lock-free snapshot reads
+
+Also reports the engine's tick and snapshot-publish latency percentiles and
+the command round trip through a running engine thread.
+
+Run from the repository root:
+    python -m benchmarks.bench_engine --sessions 1 10 50 --ticks 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+import grid_physics
+from sim_engine import SimulationEngine, load_plant, take_snapshot
+
+
+def legacy_topology(state, plant, idx):
+    """The old per-bus loop (get_node_sim_data for every bus)."""
+    out = []
+    for bus in plant.network.bus_list:
+        col = plant.feeder_p.get(bus)
+        if col is not None:
+            p_kw = col[idx % len(col)]
+            q_kvar = p_kw * 0.4
+        else:
+            p_kw = (80.0 if "30" in bus else 50.0) + 10 * np.sin(idx * 0.1) + np.random.uniform(-2, 2)
+            q_kvar = p_kw * 0.3
+        pv_out, _, _ = grid_physics.calculate_pv_physics(state, plant, bus, idx, state.mpc_curtailment)
+        out.append(grid_physics.calculate_voltage_profile(plant, bus, p_kw, q_kvar, state.tap_position, p_gen_kw=pv_out))
+    return out
+
+
+def new_state(plant, penetration):
+    bus0 = plant.network.bus_list[0]
+    state = grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0)
+    state.spatial_penetration_pct = penetration
+    state.bess_active = True
+    return state
+
+
+def pct(values, q):
+    return np.percentile(values, q)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--penetration", type=int, default=50, help="Solar penetration slider (%%)")
+    args = parser.parse_args()
+
+    plant = load_plant()
+    print(f"{len(plant.network.bus_list)} buses, {len(plant.network.solar_sites)} solar sites, "
+          f"{len(plant.total_p)} hours; penetration {args.penetration}%\n")
+
+    # --- Engine tick and publish latency ---
+    state = new_state(plant, args.penetration)
+    tick_ms, pub_ms, legacy_ms = [], [], []
+    for _ in range(args.ticks):
+        t0 = time.perf_counter()
+        grid_physics.tick(state, plant)
+        t1 = time.perf_counter()
+        take_snapshot(state)
+        t2 = time.perf_counter()
+        legacy_topology(state, plant, state.idx)
+        t3 = time.perf_counter()
+        tick_ms.append((t1 - t0) * 1e3)
+        pub_ms.append((t2 - t1) * 1e3)
+        legacy_ms.append((t3 - t2) * 1e3)
+    print(f"engine tick        p50 {pct(tick_ms, 50):7.3f} ms   p95 {pct(tick_ms, 95):7.3f} ms")
+    print(f"snapshot publish   p50 {pct(pub_ms, 50):7.3f} ms   p95 {pct(pub_ms, 95):7.3f} ms")
+    print(f"legacy bus loop    p50 {pct(legacy_ms, 50):7.3f} ms   (per view, replaced by the vectorized solve)\n")
+
+    # --- Command round trip through the running thread ---
+    engine = SimulationEngine(plant)
+    engine.start()
+    rtt = []
+    for k in range(50):
+        t = time.perf_counter()
+        engine.execute("set", tap_position=1.0 + (k % 2) * 0.01)
+        rtt.append((time.perf_counter() - t) * 1e3)
+    t = time.perf_counter()
+    for _ in range(10000):
+        engine.snapshot()
+    read_us = (time.perf_counter() - t) / 10000 * 1e6
+    engine.stop()
+    print(f"command round trip p50 {pct(rtt, 50):7.3f} ms; snapshot read {read_us:.2f} us\n")
+
+    # --- N sessions: per-session physics vs one shared engine ---
+    print(f"{'sessions':>8} {'per-session ms/tick':>20} {'shared ms/tick':>15} {'speed-up':>9}")
+    ticks = max(10, args.ticks // 10)
+    for n in args.sessions:
+        states = [new_state(plant, args.penetration) for _ in range(n)]
+        t = time.perf_counter()
+        for _ in range(ticks):
+            for s in states:
+                grid_physics.tick(s, plant)
+                legacy_topology(s, plant, s.idx)
+        per_session = (time.perf_counter() - t) / ticks * 1e3
+
+        engine = SimulationEngine(plant, state=new_state(plant, args.penetration))
+        t = time.perf_counter()
+        for _ in range(ticks):
+            with engine._lock:
+                grid_physics.tick(engine.state, plant)
+                engine._publish(0.0)
+            for _ in range(n):
+                engine.snapshot()
+        shared = (time.perf_counter() - t) / ticks * 1e3
+        print(f"{n:>8} {per_session:>20.2f} {shared:>15.2f} {per_session / shared:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
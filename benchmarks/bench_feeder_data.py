@@ -0,0 +1,78 @@
+"""
+FEEDER DATA SCALING
+Per-tick cost of the per-bus solve (grid_physics.solve_network, which also
+sums every bus into per-feeder totals) and of a whole master tick as the
+number of metered buses grows: none (every bus synthetic), Feeder A from its
+CSV (15), every Historical_Data CSV (59) and all three feeders from the
+OpenDSS .mat files (239). Also shows the one-off load and plant build time
+and the memory of the per-bus tables. The per-tick columns should stay flat:
+a tick reads one row of the hour-major tables whatever their width.
+
+Run from the repository root:
+    python -m benchmarks.bench_feeder_data --ticks 2000
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+
+import grid_physics
+from feeder_data import load_feeder_data
+from grid_network import get_grid_network
+from sim_engine import CSV_PATH, SOLAR_CSV
+
+
+def per_tick_us(fn, ticks, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(ticks):
+            fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / ticks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=2000)
+    args = parser.parse_args()
+
+    network = get_grid_network()
+    df_raw = pd.read_csv(CSV_PATH)
+    solar = pd.read_csv(SOLAR_CSV).iloc[:, 0].to_numpy(dtype=float)
+    total_p, total_q = df_raw["Total_Active_Power"].to_numpy(), df_raw["Total_Reac_Power"].to_numpy()
+
+    t0 = time.perf_counter()
+    full = load_feeder_data()
+    load_s = time.perf_counter() - t0
+    csvs = load_feeder_data(mat_dir="")
+    cases = (
+        ("synthetic", {}, {}),
+        ("Feeder A CSV", {b: c for b, c in csvs.columns("p").items() if b.startswith("bus1")},
+         {b: c for b, c in csvs.columns("q").items() if b.startswith("bus1")}),
+        ("all CSVs", csvs.columns("p"), csvs.columns("q")),
+        ("all feeders", full.columns("p"), full.columns("q")),
+    )
+    print(f"feeder data: {len(full.buses)} buses loaded in {load_s:.2f}s "
+          f"from {', '.join(sorted({os.path.dirname(path) for path in full.sources.values()}))}\n")
+    print(f"{'case':<14} {'metered':>7} {'build s':>7} {'tables MB':>9} {'network us':>10} {'tick us':>8}")
+    for name, cols_p, cols_q in cases:
+        t0 = time.perf_counter()
+        plant = grid_physics.build_plant(network, total_p, total_q, cols_p, solar / solar.max(), feeder_q=cols_q)
+        build_s = time.perf_counter() - t0
+        bus0 = network.bus_list[0]
+        state = grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0, seed=0)
+        state.bess_active, state.spatial_penetration_pct = True, 50
+        for _ in range(100):
+            grid_physics.tick(state, plant)
+        site_pv = grid_physics.pv_fleet_output(state, plant, state.idx)
+        network_us = per_tick_us(lambda: grid_physics.solve_network(state, plant, state.idx, site_pv), args.ticks)
+        tick_us = per_tick_us(lambda: grid_physics.tick(state, plant), args.ticks)
+        tables_mb = (plant.bus_meter_rows.nbytes + plant.bus_meter_q.nbytes) / 2 ** 20
+        print(f"{name:<14} {int(plant.bus_metered.sum()):>7} {build_s:>7.2f} {tables_mb:>9.1f} "
+              f"{network_us:>10.1f} {tick_us:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+PER-TICK FORECAST LATENCY: ROLLING-ORIGIN SERVICE
+Advances a ForecastService hour by hour over the load series and times each
+tick (ingest one observation + next-24h forecast). Ticks that hit a
+scheduled retrain are reported separately.
+
+Run from the repository root:
+    python -m benchmarks.bench_forecast_service --ticks 200 --retrain-every 168
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import forecasting
+
+CSV_PATH = "Historical_Data/Total_P&Q.csv"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--origin", type=int, default=4000, help="Simulation hour to start ticking from")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--retrain-every", type=int, default=168)
+    args = parser.parse_args()
+
+    values = pd.read_csv(CSV_PATH)["Total_Active_Power"].values
+    t0 = time.perf_counter()
+    svc = forecasting.ForecastService(values, n_hours=len(values), retrain_every=args.retrain_every)
+    svc.advance_to(args.origin)
+    print(f"service ready in {time.perf_counter() - t0:.1f}s")
+
+    tick_ms, retrain_ms, errors = [], [], []
+    for origin in range(args.origin + 1, args.origin + 1 + args.ticks):
+        retrains = svc.retrain_count
+        t = time.perf_counter()
+        svc.advance_to(origin)
+        fc = svc.forecast(origin)
+        dt = (time.perf_counter() - t) * 1e3
+        (retrain_ms if svc.retrain_count != retrains else tick_ms).append(dt)
+        if fc['lstm'] is not None:
+            errors.append(fc['lstm'][0] - values[origin % len(values)])
+
+    tick_ms = np.array(tick_ms)
+    print(f"ticks: {len(tick_ms)}  p50 {np.percentile(tick_ms, 50):.2f} ms  p95 {np.percentile(tick_ms, 95):.2f} ms  max {tick_ms.max():.2f} ms")
+    if retrain_ms:
+        print(f"scheduled retrains: {len(retrain_ms)}  mean {np.mean(retrain_ms) / 1e3:.1f} s")
+    if errors:
+        print(f"LSTM 1h-ahead RMSE over run: {np.sqrt(np.mean(np.square(errors))):.1f} kW")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+LIVE UPDATE PAYLOAD: PLOTLY FIGURES VS. BINARY DELTA FRAMES
+Bytes a live view receives per tick, and what a client must parse:
+
+  plotly figures   the specs the dashboard's Live Telemetry and Grid Topology
+                   fragments send on every refresh (captured through
+                   Streamlit's AppTest, so they are exactly what st.plotly_chart
+                   serializes)
+  json frame       telemetry_server's per-tick JSON frame (all buses)
+  binary delta     telemetry_codec frames for the same views (all buses),
+                   plain and zlib-compressed, plus the key frame size
+
+Client cost is measured as parse time in Python (json.loads of the figure
+specs vs. FrameDecoder.apply); the browser renderer (static/live_client.html)
+runs the same decode and then restyles existing traces instead of rebuilding
+figures.
+
+Run from the repository root:
+    python -m benchmarks.bench_frames --ticks 300 --reruns 3
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import grid_physics
+from sim_engine import SimulationEngine, load_plant
+from telemetry_codec import FrameDecoder, FrameEncoder
+from telemetry_server import encode_frame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ("Live Telemetry", "Grid Topology")
+
+
+def plotly_specs(reruns):
+    """Plotly spec strings sent by one refresh of each live page."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "dashboard_Pro.py"), default_timeout=300)
+    at.session_state["logged_in"] = True
+    at.run()
+    specs = []
+    for _ in range(reruns):
+        for page in PAGES:
+            at.sidebar.radio[0].set_value(page).run()
+            specs.append([chart.proto.spec for chart in at.get("plotly_chart")])
+    # One tick refreshes both pages' fragments
+    return [a + b for a, b in zip(specs[::2], specs[1::2])]
+
+
+def timed(fn, repeat):
+    t = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=300)
+    parser.add_argument("--reruns", type=int, default=3, help="Dashboard refreshes to capture")
+    parser.add_argument("--penetration", type=int, default=50)
+    args = parser.parse_args()
+
+    # --- Before: full Plotly figures per refresh ---
+    refreshes = plotly_specs(args.reruns)
+    fig_bytes = [sum(len(s.encode()) for s in specs) for specs in refreshes]
+    fig_parse = timed(lambda: [json.loads(s) for s in refreshes[-1]], 50)
+
+    # --- After: one engine, one delta stream over every bus ---
+    engine = SimulationEngine(load_plant())
+    engine.execute("set", spatial_penetration_pct=args.penetration, run_simulation=True)
+    plain, packed = FrameEncoder(engine.plant.network), FrameEncoder(engine.plant.network, compress=True)
+    json_bytes, delta_bytes, zlib_bytes, key_bytes, frames = [], [], [], [], []
+    for k in range(args.ticks):
+        with engine._lock:
+            if k == args.ticks // 2:
+                engine._apply("inject_fault", {"bus": engine.plant.network.bus_list[5], "fault_type": "L-G (Line-to-Ground)"})
+            grid_physics.tick(engine.state, engine.plant)
+            engine._publish(0.0)
+        snap = engine.snapshot()
+        frame, zframe = plain.encode(snap), packed.encode(snap)
+        json_bytes.append(len(encode_frame(snap, engine.plant.network)))
+        if k:
+            delta_bytes.append(len(frame.delta))
+            zlib_bytes.append(len(zframe.delta))
+        key_bytes.append(len(frame.key))
+        frames.append(frame)
+
+    last_json = encode_frame(engine.snapshot(), engine.plant.network)
+    json_parse = timed(lambda: json.loads(last_json), 200)
+    t = time.perf_counter()
+    decoder = FrameDecoder()
+    decoder.apply(frames[0].key)
+    for frame in frames[1:]:
+        decoder.apply(frame.delta)
+    bin_parse = (time.perf_counter() - t) / len(frames) * 1e3
+
+    print(f"{len(engine.plant.network.bus_list)} buses, penetration {args.penetration}%, {args.ticks} ticks "
+          f"(fault injected half way), {len(refreshes)} dashboard refreshes\n")
+    print(f"{'payload per tick':<34} {'mean bytes':>11} {'p95 bytes':>10} {'vs figures':>11} {'parse ms':>9}")
+    rows = (
+        ("plotly figures (Live+Topology)", fig_bytes, fig_parse),
+        ("json frame (all buses)", json_bytes, json_parse),
+        ("binary key frame", key_bytes, None),
+        ("binary delta", delta_bytes, bin_parse),
+        ("binary delta + zlib", zlib_bytes, None),
+    )
+    base = np.mean(fig_bytes)
+    for name, sizes, parse in rows:
+        parse_txt = f"{parse:9.3f}" if parse is not None else f"{'':>9}"
+        print(f"{name:<34} {np.mean(sizes):>11.0f} {np.percentile(sizes, 95):>10.0f} "
+              f"{base / np.mean(sizes):>10.1f}x {parse_txt}")
+
+
+if __name__ == "__main__":
+    main()
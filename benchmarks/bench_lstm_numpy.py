@@ -0,0 +1,83 @@
+"""
+PARITY + LATENCY: NUMPY LSTM KERNEL vs KERAS
+Rebuilds the live load LSTM from the model store in Keras (or trains one
+epoch on the fly if nothing is published), exports it to a temporary .npz,
+checks that the NumPy forward pass matches
+Keras on real windows, and times single-step, batched and 24-step rollout
+inference against model.predict / predict_on_batch.
+
+Exits non-zero if the outputs differ by more than --tol (scaled units).
+
+Run from the repository root:
+    python -m benchmarks.bench_lstm_numpy
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import forecasting
+from lstm_numpy import NumpyLSTM, export_lstm_npz
+
+CSV_PATH = "Historical_Data/Total_P&Q.csv"
+
+
+def _time_ms(fn, repeat):
+    fn()
+    t = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=int, default=512, help="Windows used for the parity check")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--tol", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    values = pd.read_csv(CSV_PATH)["Total_Active_Power"].values
+    entry = forecasting.manifest_entry(is_solar=False) or {}
+    live = forecasting.load_artifact(entry.get('artifact'))
+    if live is not None and isinstance(live.kernel, NumpyLSTM):
+        model, scaler = forecasting.keras_from_kernel(live.kernel), live.kernel.scaler
+    else:
+        model, scaler = forecasting.fit_lstm(values, epochs=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lstm.npz")
+        export_lstm_npz(model, scaler, path)
+        kernel = NumpyLSTM.load(path)
+        size_kb = os.path.getsize(path) / 1024
+
+    scaled = scaler.transform(values.reshape(-1, 1))
+    X, _ = forecasting.prepare_lstm_data(scaled)
+    X = np.ascontiguousarray(X[:args.windows])
+    ref = np.asarray(model.predict_on_batch(X))
+    out = kernel.predict_on_batch(X)
+    max_err = float(np.max(np.abs(ref - out)))
+    ok = max_err <= args.tol
+    print(f"export: {size_kb:.1f} KiB  parity on {len(X)} windows: max |keras - numpy| = {max_err:.2e}  {'OK' if ok else 'MISMATCH'}")
+
+    one = X[:1]
+    batch = X[:24]
+    rows = [
+        ("1 window   keras.predict", _time_ms(lambda: model.predict(one, verbose=0), args.repeat)),
+        ("1 window   keras.predict_on_batch", _time_ms(lambda: model.predict_on_batch(one), args.repeat)),
+        ("1 window   numpy", _time_ms(lambda: kernel.predict_on_batch(one), args.repeat)),
+        ("24 windows keras.predict", _time_ms(lambda: model.predict(batch, verbose=0), args.repeat)),
+        ("24 windows numpy", _time_ms(lambda: kernel.predict_on_batch(batch), args.repeat)),
+        ("24h rollout numpy", _time_ms(lambda: kernel.rollout(one.ravel(), 24), args.repeat)),
+    ]
+    for name, ms in rows:
+        print(f"{name:<36}{ms:>10.3f} ms")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+METRICS OVERHEAD
+What the metrics registry (metrics.py) costs the engine. The shared engine
+runs flat out for --seconds (its speed budget below the tick time, so every
+tick also takes the overrun path); its mean tick is compared with the
+per-tick metric updates the engine thread makes (histogram observe and
+tick-rate timestamp, plus the overrun counter), timed on their own. A scrape
+renders the whole registry, including the engine's scrape-time gauges (stage
+percentiles, queue depth, memory); its cost is shown as a share of one CPU
+at a few scrape intervals. Exits non-zero if the per-tick overhead reaches
+--limit.
+
+Run from the repository root:
+    python -m benchmarks.bench_metrics --seconds 10
+"""
+import argparse
+import collections
+import sys
+import time
+import timeit
+import urllib.request
+
+import numpy as np
+
+import metrics
+from sim_engine import TICK_SECONDS, SimulationEngine, load_plant
+
+
+def per_call_us(fn, repeat=7):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10.0, help="Engine run time")
+    parser.add_argument("--limit", type=float, default=0.01, help="Largest acceptable overhead (0.01 = 1%%)")
+    args = parser.parse_args()
+
+    np.random.seed(0)
+    engine = SimulationEngine(load_plant())
+    engine.execute("set", speed=1e-4, bess_active=True, auto_tap_mode=True, spatial_penetration_pct=50,
+                   run_simulation=True)
+    count0, sum0 = TICK_SECONDS.count, TICK_SECONDS.sum
+    engine.start()
+    time.sleep(args.seconds)
+    engine.execute("set", run_simulation=False)
+    engine.stop()
+    ticks = TICK_SECONDS.count - count0
+    tick_us = (TICK_SECONDS.sum - sum0) / ticks * 1e6
+    print(f"engine: {ticks} ticks in {args.seconds:.0f}s, mean tick {tick_us:.0f} us "
+          f"(histogram agrees with the profiler: {engine.profiler.ticks} ticks)\n")
+
+    # The engine thread's per-tick updates, on throwaway metrics of the same kinds
+    hist = metrics.Histogram("bench_tick_seconds", "")
+    overruns = metrics.Counter("bench_overruns_total", "")
+    times = collections.deque(maxlen=32)
+    value = tick_us / 1e6
+
+    def tick_updates():
+        hist.observe(value)
+        times.append(time.monotonic())
+
+    def overrun_update():
+        overruns.inc()
+
+    rows = [("observe + rate timestamp", per_call_us(tick_updates)), ("overrun counter", per_call_us(overrun_update))]
+    per_tick = sum(us for _, us in rows)
+    print(f"{'per-tick update':<26} {'us':>7} {'of tick':>8}")
+    for name, us in rows:
+        print(f"{name:<26} {us:>7.3f} {us / tick_us:>8.3%}")
+    overhead = per_tick / tick_us
+    print(f"{'total (worst case)':<26} {per_tick:>7.3f} {overhead:>8.3%}\n")
+
+    # Scrapes: registry render in-process and a full HTTP round trip
+    render_us = per_call_us(metrics.REGISTRY.render, repeat=5)
+    server = metrics.serve(port=0)
+    url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+    body = urllib.request.urlopen(url).read()
+    http_us = per_call_us(lambda: urllib.request.urlopen(url).read(), repeat=5)
+    server.shutdown()
+    print(f"scrape: render {render_us / 1e3:.2f} ms, HTTP round trip {http_us / 1e3:.2f} ms, "
+          f"{len(body) / 1024:.1f} KB, {body.count(b'# TYPE')} metrics")
+    for interval in (1, 5, 15):
+        print(f"  every {interval:>2}s: {http_us / 1e6 / interval:.4%} of one CPU")
+
+    verdict = "OK" if overhead < args.limit else "OVER"
+    print(f"\nper-tick metrics overhead {overhead:.3%} (limit {args.limit:.0%}): {verdict}")
+    if overhead >= args.limit:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
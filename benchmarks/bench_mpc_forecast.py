@@ -0,0 +1,146 @@
+"""
+CLOSED-LOOP MPC UNDER FORECAST ERROR
+Replays the load and solar series hour by hour and runs the MPC controller on
+four look-aheads side by side, each driving its own copy of a simple plant
+(tap, BESS state of charge, curtailed PV, linear voltage sensitivity):
+
+  perfect   the actual future hours via the old per-step df_raw.iloc lookups
+            (perfect foresight, an upper bound)
+  forecast  ForecastService.horizon_forecast rows, as the dashboard serves them
+  naive     seasonal naive (same hour yesterday)
+  stochastic  forecast rows plus K bootstrapped residual scenarios, solved by
+            plan_dispatch_stochastic under the --risk violation bound
+
+Reports voltage violations, mean deviation from 1.0 pu, tap moves, curtailed
+and BESS energy, and per-tick look-ahead + solve latency. For the forecast
+mode the cost of a repeat lookup (another session at the same hour) is
+reported separately.
+
+Run from the repository root:
+    python -m benchmarks.bench_mpc_forecast --start 4000 --hours 336
+    python -m benchmarks.bench_mpc_forecast --penetration 100 --horizon 12
+    python -m benchmarks.bench_mpc_forecast --penetration 100 --scenarios 64 --risk 0.02
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import forecasting
+from grid_network import get_grid_network
+from mpc_controller import (BESS_CAPACITY_KWH, MPC_RISK, MPC_SCENARIOS, VOLTAGE_SENSITIVITY_CONST,
+                            plan_dispatch, plan_dispatch_stochastic, sample_scenarios)
+
+CSV_PATH = "Historical_Data/Total_P&Q.csv"
+SOLAR_CSV = "Historical_Data/solardata.csv"
+SOLAR_SCALE_KW = 5000.0
+MODES = ("perfect", "forecast", "naive", "stochastic")
+
+
+class Plant:
+    """One controller's copy of the grid state plus the run's tallies."""
+    def __init__(self, tap=1.0, soc=50.0):
+        self.tap, self.soc = tap, soc
+        self.voltages, self.solve_ms, self.lookahead_ms = [], [], []
+        self.tap_moves = 0
+        self.curtailed_kwh = 0.0
+        self.bess_kwh = 0.0
+
+    def step(self, tap, bess_cmd, curtail, load_kw, pv_kw):
+        if tap != self.tap:
+            self.tap_moves += 1
+        self.tap = tap
+        # Same safety limits as the dashboard's bess_dispatch_logic
+        if bess_cmd < 0 and self.soc >= 98.0: bess_cmd = 0.0
+        if bess_cmd > 0 and self.soc <= 5.0: bess_cmd = 0.0
+        self.soc = max(0.0, min(100.0, self.soc - bess_cmd / BESS_CAPACITY_KWH * 100))
+        self.curtailed_kwh += pv_kw * curtail
+        self.bess_kwh += abs(bess_cmd)
+        net = load_kw - pv_kw * (1.0 - curtail) - bess_cmd
+        self.voltages.append(self.tap - net / VOLTAGE_SENSITIVITY_CONST)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", type=int, default=4000, help="First simulation hour")
+    parser.add_argument("--hours", type=int, default=336)
+    parser.add_argument("--horizon", type=int, default=6, help="MPC look-ahead hours")
+    parser.add_argument("--penetration", type=float, default=10, help="Solar penetration slider (%%)")
+    parser.add_argument("--cloud-shading", action="store_true")
+    parser.add_argument("--scenarios", type=int, default=MPC_SCENARIOS, help="Stochastic mode: scenarios per tick")
+    parser.add_argument("--risk", type=float, default=MPC_RISK, help="Stochastic mode: max violation probability")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    load_series = pd.read_csv(CSV_PATH)["Total_Active_Power"]
+    load = load_series.values.astype(float)
+    irradiance = pd.read_csv(SOLAR_CSV).iloc[:, 0].values.astype(float)
+    n = len(load)
+    # The solar file is shorter than the year; it wraps like get_solar_contribution
+    irradiance = np.resize(irradiance / irradiance.max(), n)
+    capacity = get_grid_network().active_solar_capacity(args.penetration)
+    shading = 0.3 if args.cloud_shading else 1.0
+
+    t0 = time.perf_counter()
+    load_svc = forecasting.ForecastService(load, n_hours=n)
+    solar_svc = forecasting.ForecastService(irradiance * SOLAR_SCALE_KW, n_hours=n, is_solar=True)
+    print(f"services ready in {time.perf_counter() - t0:.1f}s  (solar capacity {capacity:.0f} kW)")
+
+    rng = np.random.default_rng(args.seed)
+    plants = {m: Plant() for m in MODES}
+    load_err, hit_ms = [], []
+    for origin in range(args.start, args.start + args.hours):
+        hours = np.arange(origin, origin + args.horizon) % n
+        for mode, plant in plants.items():
+            t = time.perf_counter()
+            if mode == "perfect":
+                # The controller's old per-step pandas lookups
+                fl = np.array([load_series.iloc[h] for h in hours])
+                fs = irradiance[hours]
+            else:
+                load_svc.advance_to(origin)
+                solar_svc.advance_to(origin)
+                if mode == "forecast":
+                    fl = load_svc.horizon_forecast(origin)[:args.horizon]
+                    fs = solar_svc.horizon_forecast(origin)[:args.horizon] / SOLAR_SCALE_KW
+                    load_err.append(fl - load[hours])
+                    # What every other session at this hour pays: a matrix row read
+                    th = time.perf_counter()
+                    load_svc.horizon_forecast(origin), solar_svc.horizon_forecast(origin)
+                    hit_ms.append((time.perf_counter() - th) * 1e3)
+                elif mode == "naive":
+                    fl = load_svc.forecast(origin)['naive'][:args.horizon]
+                    fs = solar_svc.forecast(origin)['naive'][:args.horizon] / SOLAR_SCALE_KW
+                else:
+                    fl = sample_scenarios(load_svc.horizon_forecast(origin)[:args.horizon],
+                                          load_svc.horizon_residuals(origin), args.scenarios, rng)
+                    fs = sample_scenarios(solar_svc.horizon_forecast(origin)[:args.horizon] / SOLAR_SCALE_KW,
+                                          solar_svc.horizon_residuals(origin) / SOLAR_SCALE_KW, len(fl), rng, lower=0.0)
+            t1 = time.perf_counter()
+            if mode == "stochastic":
+                tap, bess, curt = plan_dispatch_stochastic(fl, fs, plant.tap, plant.soc, capacity,
+                                                           args.cloud_shading, args.risk)
+            else:
+                tap, bess, curt = plan_dispatch(fl, fs, plant.tap, plant.soc, capacity, args.cloud_shading)
+            t2 = time.perf_counter()
+            plant.lookahead_ms.append((t1 - t) * 1e3)
+            plant.solve_ms.append((t2 - t1) * 1e3)
+            plant.step(tap, bess, curt, load[origin % n], irradiance[origin % n] * capacity * shading)
+
+    print(f"{args.hours} hours from {args.start}, horizon {args.horizon}h; "
+          f"load forecast RMSE over look-ahead {np.sqrt(np.mean(np.square(load_err))):.1f} kW")
+    print(f"forecast matrix: first lookup per hour p50 {np.percentile(plants['forecast'].lookahead_ms, 50):.2f} ms, "
+          f"shared hit p50 {np.percentile(hit_ms, 50) * 1e3:.1f} us\n")
+    print(f"{'mode':<10} {'viol':>5} {'|1-v| pu':>9} {'min v':>7} {'max v':>7} {'taps':>5} "
+          f"{'curt kWh':>9} {'bess kWh':>9} {'look ms':>8} {'solve ms':>9}")
+    for mode, p in plants.items():
+        v = np.array(p.voltages)
+        viol = np.count_nonzero((v < 0.95) | (v > 1.05))
+        print(f"{mode:<10} {viol:>5} {np.mean(np.abs(1 - v)):>9.4f} {v.min():>7.3f} {v.max():>7.3f} {p.tap_moves:>5} "
+              f"{p.curtailed_kwh:>9.0f} {p.bess_kwh:>9.0f} {np.percentile(p.lookahead_ms, 50):>8.3f} "
+              f"{np.percentile(p.solve_ms, 50):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+RERUN LATENCY BENCHMARK: GRID NETWORK
+Compares what every Streamlit rerun used to pay for the topology block
+(parse coords, distance map, seeded solar site sampling) against the cached
+GridNetwork lookup, plus the per-rerun solar capacity sums that now read the
+pre-computed cumulative capacity.
+
+Run from the repository root:
+    python -m benchmarks.bench_network
+"""
+import argparse
+import timeit
+
+from grid_network import build_grid_network, get_grid_network
+
+
+def legacy_capacity_history(net, penetration_pct, window=60):
+    # Old render_home loop: sum site capacities per history point
+    out = []
+    for _ in range(window):
+        active_count = int(len(net.solar_sites) * penetration_pct / 100.0)
+        s_gen = 0.0
+        for b in net.solar_sites[:active_count]:
+            s_gen += net.solar_capacity[b]
+        out.append(s_gen)
+    return out
+
+
+def cached_capacity_history(net, penetration_pct, window=60):
+    cap = net.active_solar_capacity(penetration_pct)
+    return [cap] * window
+
+
+def _best_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=200, help="Calls per timing repeat")
+    parser.add_argument("--penetration", type=float, default=50.0, help="Spatial penetration (%%)")
+    args = parser.parse_args()
+
+    net = get_grid_network()
+    rows = [
+        ("topology block per rerun", _best_us(build_grid_network, args.number), _best_us(get_grid_network, args.number)),
+        ("history capacity (60 pts)",
+         _best_us(lambda: legacy_capacity_history(net, args.penetration), args.number),
+         _best_us(lambda: cached_capacity_history(net, args.penetration), args.number)),
+    ]
+
+    print(f"{'STAGE':<28}{'BEFORE (us)':>14}{'AFTER (us)':>14}{'SPEEDUP':>10}")
+    total_before = total_after = 0.0
+    for name, before, after in rows:
+        total_before += before
+        total_after += after
+        print(f"{name:<28}{before:>14.1f}{after:>14.2f}{before / max(after, 1e-9):>9.0f}x")
+    print(f"{'TOTAL PER RERUN':<28}{total_before:>14.1f}{total_after:>14.2f}{total_before / max(total_after, 1e-9):>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
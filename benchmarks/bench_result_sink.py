@@ -0,0 +1,73 @@
+"""
+RESULT SINK OVERHEAD
+Headless ticks with and without result_sink.ResultSink: the cost record()
+adds to each tick (copy into the batch buffers; conversion, compression and
+file I/O happen on the writer thread), how long record() had to wait for the
+writer, the time close() needs to flush, and the size of the result files.
+
+Run from the repository root:
+    python -m benchmarks.bench_result_sink --hours 8760
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import grid_physics
+from result_sink import ResultSink
+from sim_engine import load_plant
+
+
+def run(plant, hours, penetration, sink=None):
+    bus0 = plant.network.bus_list[0]
+    state = grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0)
+    state.spatial_penetration_pct = penetration
+    state.run_simulation = True
+    tick_ms, record_us = [], []
+    for _ in range(hours):
+        t0 = time.perf_counter()
+        grid_physics.tick(state, plant)
+        t1 = time.perf_counter()
+        if sink is not None:
+            sink.record(state)
+        tick_ms.append((t1 - t0) * 1e3)
+        record_us.append((time.perf_counter() - t1) * 1e6)
+    return tick_ms, record_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=int, default=8760)
+    parser.add_argument("--penetration", type=int, default=50)
+    args = parser.parse_args()
+
+    plant = load_plant()
+    print(f"{len(plant.network.bus_list)} buses, {args.hours} ticks\n")
+    print(f"{'sink':<18} {'tick p50 ms':>11} {'record p50 us':>13} {'record p95 us':>13} {'waited ms':>9} "
+          f"{'close ms':>8} {'run s':>6} {'MB':>6}")
+    tmp = tempfile.mkdtemp(prefix="dt_results_")
+    try:
+        for label, fmt, compression in (("none", None, None), ("parquet zstd", "parquet", "zstd"),
+                                        ("parquet snappy", "parquet", "snappy"), ("arrow ipc", "arrow", None)):
+            out = os.path.join(tmp, label.replace(" ", "_"))
+            sink = ResultSink(out, plant.network, fmt, compression=compression) if fmt else None
+            t0 = time.perf_counter()
+            tick_ms, record_us = run(plant, args.hours, args.penetration, sink)
+            t1 = time.perf_counter()
+            waited = close_ms = mb = 0.0
+            if sink is not None:
+                sink.close()
+                close_ms = (time.perf_counter() - t1) * 1e3
+                waited = sink.stall_ms
+                mb = sum(os.path.getsize(p) for p in sink.paths.values()) / 1e6
+            print(f"{label:<18} {np.percentile(tick_ms, 50):>11.3f} {np.percentile(record_us, 50):>13.1f} "
+                  f"{np.percentile(record_us, 95):>13.1f} {waited:>9.1f} {close_ms:>8.1f} {t1 - t0:>6.1f} {mb:>6.1f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
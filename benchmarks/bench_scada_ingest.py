@@ -0,0 +1,84 @@
+"""
+SCADA INGESTION THROUGHPUT
+Runs scada_ingest.ScadaIngest in this process and the stand-in Modbus/TCP
+publisher (one connection per RTU) in a separate process, stepping the
+per-RTU scan rate up. For each step it reports offered and accepted points
+per second, points dropped by backpressure (Server Busy replies), late
+points, the RTUs' write round trip, the ingest queue high-water mark and
+the event-loop lag on the ingestion side.
+
+Run from the repository root:
+    python -m benchmarks.bench_scada_ingest --rates 10 50 200 --seconds 5
+    python -m benchmarks.bench_scada_ingest --rates 200 --queue-scans 8   # force busy replies
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from grid_network import get_grid_network
+from scada_ingest import BUSES_PER_RTU, ScadaIngest, rtu_count, run_publisher
+
+
+def publish(port, scan_hz, seconds, late, lateness):
+    return asyncio.run(run_publisher(get_grid_network(), port=port, scan_hz=scan_hz, seconds=seconds,
+                                     late=late, lateness=lateness))
+
+
+async def loop_lag(stop, samples, period=0.01):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(period)
+        samples.append((time.perf_counter() - t - period) * 1e3)
+
+
+async def bench(args):
+    network = get_grid_network()
+    n_rtu = rtu_count(network)
+    print(f"{len(network.bus_list)} buses on {n_rtu} RTUs ({BUSES_PER_RTU} buses, 48 points per scan), "
+          f"{args.seconds}s per step, {args.late:.0%} of scans sent late\n")
+    print(f"{'scans/s/RTU':>11} {'offered pts/s':>13} {'accepted pts/s':>14} {'busy pts':>9} {'late pts':>9} "
+          f"{'ack p95 ms':>10} {'queue high':>10} {'lag p95 ms':>10} {'frames':>6}")
+    pool = ProcessPoolExecutor(1, mp_context=mp.get_context("spawn"))
+    try:
+        for rate in args.rates:
+            ingest = await ScadaIngest(network, port=0, interval=args.interval, lateness=args.lateness,
+                                       queue_scans=args.queue_scans).start()
+            stop, lag = asyncio.Event(), []
+            lagger = asyncio.ensure_future(loop_lag(stop, lag))
+            t0 = time.perf_counter()
+            totals = await asyncio.wrap_future(pool.submit(publish, ingest.port, rate, args.seconds, args.late,
+                                                           args.lateness))
+            elapsed = time.perf_counter() - t0
+            # Let the open buckets close
+            await asyncio.sleep(args.interval + args.lateness + 0.5)
+            stop.set()
+            await lagger
+            stats = ingest.stats()
+            await ingest.stop()
+            points_per_scan = 3 * BUSES_PER_RTU
+            print(f"{rate:>11g} {totals['sent'] * points_per_scan / elapsed:>13.0f} "
+                  f"{stats['points'] / elapsed:>14.0f} {stats['dropped_points']:>9} {stats['late_points']:>9} "
+                  f"{totals['ack_p95_ms']:>10.2f} {stats['queue_high']:>10} {np.percentile(lag, 95):>10.2f} "
+                  f"{stats['frames']:>6}")
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", type=float, nargs="+", default=[10, 50, 200], help="Scans per second per RTU")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--late", type=float, default=0.01)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--lateness", type=float, default=1.0)
+    parser.add_argument("--queue-scans", type=int, default=1024)
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
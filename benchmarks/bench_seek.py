@@ -0,0 +1,75 @@
+"""
+CHECKPOINTED SEEK
+Cost of jumping to random hours of the year with a timeline.Timeline against
+replaying every tick from hour 0, for a few checkpoint intervals: the
+one-off prefill of the year, the size of the checkpoints, and seek latency
+percentiles. Every seek is checked against the state the straight run had
+at that hour.
+
+Run from the repository root:
+    python -m benchmarks.bench_seek --every 6 24 168 --seeks 200
+"""
+import argparse
+import pickle
+import time
+
+import numpy as np
+
+import grid_physics
+from sim_engine import load_plant
+from timeline import Timeline
+
+CHECKED = ("bess_soc", "tap_position", "transformer_thermal", "grid_freq", "rotor_angle", "room_temp",
+           "capacitor_bank_kvAr", "relay_accumulator", "p_grid_net")
+
+
+def fresh_state(plant):
+    bus0 = plant.network.bus_list[0]
+    state = grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0, seed=0)
+    state.bess_active, state.spatial_penetration_pct = True, 60
+    state.auto_tap_mode = state.apfc_auto_mode = True
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--every", type=int, nargs="+", default=[6, 24, 168], help="Checkpoint interval (hours)")
+    parser.add_argument("--seeks", type=int, default=200)
+    args = parser.parse_args()
+
+    plant = load_plant()
+    n_hours = len(plant.total_p)
+    targets = np.random.default_rng(0).integers(1, n_hours, args.seeks)
+
+    # Reference trajectory and the replay-from-zero baseline
+    state = fresh_state(plant)
+    reference = {}
+    t0 = time.perf_counter()
+    for _ in range(n_hours - 1):
+        grid_physics.tick(state, plant)
+        reference[state.idx] = [getattr(state, k) for k in CHECKED]
+    tick_ms = (time.perf_counter() - t0) / (n_hours - 1) * 1e3
+    print(f"{n_hours} hours, {tick_ms:.2f} ms/tick; replaying from hour 0 to the same targets would take "
+          f"{tick_ms * targets.mean():.0f} ms on average (up to {tick_ms * n_hours / 1e3:.1f} s)\n")
+    print(f"{'every h':>7} {'prefill s':>9} {'ckpts':>5} {'KB/ckpt':>7} {'seek p50 ms':>11} {'seek p95 ms':>11} "
+          f"{'seek max ms':>11} {'exact':>5}")
+    for every in args.every:
+        state = fresh_state(plant)
+        timeline = Timeline(every)
+        timeline.record(state, force=True)
+        t0 = time.perf_counter()
+        timeline.prefill(plant)
+        prefill_s = time.perf_counter() - t0
+        kb = len(pickle.dumps(timeline.nearest(n_hours // 2))) / 1024
+        seek_ms, exact = [], 0
+        for hour in targets:
+            t0 = time.perf_counter()
+            timeline.seek(state, plant, int(hour))
+            seek_ms.append((time.perf_counter() - t0) * 1e3)
+            exact += np.allclose([getattr(state, k) for k in CHECKED], reference[hour])
+        print(f"{every:>7} {prefill_s:>9.1f} {len(timeline):>5} {kb:>7.1f} {np.percentile(seek_ms, 50):>11.2f} "
+              f"{np.percentile(seek_ms, 95):>11.2f} {max(seek_ms):>11.2f} {exact:>3}/{len(targets)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+STARTUP BENCHMARK: TIME-TO-FIRST-RENDER
+Spawns a fresh interpreter per scenario and renders dashboard_Pro.py through
+Streamlit's AppTest harness (login bypassed), reporting wall time from
+process start to the first completed render:
+
+  * default page only (forecasting stack should stay unloaded)
+  * default page, then the "AI Forecasting" page (stack loaded on demand)
+
+The eager-import baseline (what every process start paid when TensorFlow and
+Prophet were imported at module top) is measured in its own interpreter.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --budget 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+APP_FILE = "dashboard_Pro.py"
+
+RENDER_SNIPPET = """
+import json, sys, time
+t0 = float(sys.argv[1])
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[2], default_timeout=float(sys.argv[4]))
+at.session_state["logged_in"] = True
+at.run()
+t_first = time.time() - t0
+heavy_first = "tensorflow" in sys.modules or "prophet" in sys.modules
+page = sys.argv[3]
+t_page = None
+if page:
+    at.sidebar.radio[0].set_value(page).run()
+    t_page = time.time() - t0
+print(json.dumps({"first_render_s": t_first, "page_render_s": t_page, "heavy_loaded_at_first_render": heavy_first,
+                  "exceptions": [str(e.value) for e in at.exception]}))
+"""
+
+EAGER_SNIPPET = """
+import json, sys, time
+t0 = float(sys.argv[1])
+import tensorflow, prophet
+print(json.dumps({"import_s": time.time() - t0}))
+"""
+
+
+def _spawn(snippet, *args):
+    t0 = time.time()
+    out = subprocess.run([sys.executable, "-c", snippet, repr(t0), *args],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=5.0, help="Time-to-first-render budget in seconds")
+    parser.add_argument("--timeout", type=float, default=600.0, help="AppTest timeout per render (s)")
+    parser.add_argument("--skip-ai", action="store_true", help="Do not visit the AI page (avoids training on a cold cache)")
+    args = parser.parse_args()
+
+    app = os.path.abspath(APP_FILE)
+    rows = []
+    cold = _spawn(RENDER_SNIPPET, app, "", str(args.timeout))
+    rows.append(("first render, AI page not visited", cold["first_render_s"], cold["heavy_loaded_at_first_render"]))
+    if not args.skip_ai:
+        ai = _spawn(RENDER_SNIPPET, app, "AI Forecasting", str(args.timeout))
+        rows.append(("first render, then AI page", ai["page_render_s"], True))
+    try:
+        eager = _spawn(EAGER_SNIPPET)
+        rows.append(("eager TF+Prophet import alone (old cost)", eager["import_s"], True))
+    except subprocess.CalledProcessError:
+        rows.append(("eager TF+Prophet import alone (old cost)", float("nan"), False))
+
+    print(f"{'SCENARIO':<44}{'SECONDS':>10}  HEAVY STACK LOADED")
+    for name, secs, heavy in rows:
+        print(f"{name:<44}{secs:>10.2f}  {heavy}")
+
+    within = cold["first_render_s"] <= args.budget and not cold["heavy_loaded_at_first_render"]
+    print(f"\nBUDGET {args.budget:.1f}s: {'PASS' if within else 'FAIL'}")
+    sys.exit(0 if within else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+TELEMETRY SERVER LOAD TEST
+Runs the shared engine and telemetry_server.TelemetryServer in this process
+and opens hundreds of local SSE subscribers from separate client processes
+(--client-procs), with a mix of filters (all buses, one feeder, a few buses).
+A handful of --slow clients connect and never read, to exercise the
+per-client backpressure.
+
+Phase 1 measures the engine with no subscribers, phase 2 with all of them.
+Reports engine tick time and tick interval (cadence) for both phases, the
+per-tick fan-out cost, frames received per client, end-to-end latency
+(publish -> client parse) and frames dropped by the drop-oldest queues.
+Full frames are ~10 KB, so at 1 Hz a stalled client needs minutes to fill the
+loopback socket buffers; a fast tick (--speed 0.05) shows the shedding within
+seconds while the engine cadence holds.
+
+Run from the repository root:
+    python -m benchmarks.bench_telemetry --clients 300 --seconds 20
+    python -m benchmarks.bench_telemetry --clients 500 --speed 0.5 --slow 10
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sim_engine import SimulationEngine, load_plant
+from telemetry_server import TelemetryServer
+
+FILTERS = ("", "feeder=A", "feeder=B", "feeder=C", "bus=bus1003,bus2005,bus3001")
+
+
+def run_clients(port, n, slow, seconds, offset):
+    """Client process: n reading SSE subscribers plus `slow` that never read."""
+    async def reader(k):
+        r, w = await asyncio.open_connection("127.0.0.1", port)
+        query = FILTERS[(offset + k) % len(FILTERS)]
+        w.write(f"GET /stream?{query} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await r.readuntil(b"\r\n\r\n")
+        lat, frames = [], 0
+        end = time.time() + seconds
+        try:
+            while time.time() < end:
+                line = await asyncio.wait_for(r.readuntil(b"\n\n"), end - time.time())
+                frame = json.loads(line[6:])
+                lat.append(time.time() - frame["published_at"])
+                frames += 1
+        except asyncio.TimeoutError:
+            pass
+        w.close()
+        return frames, lat
+
+    async def sleeper():
+        # Small receive window so the server's socket and write buffers fill within a few frames
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.connect(("127.0.0.1", port))
+        r, w = await asyncio.open_connection(sock=sock)
+        w.write(b"GET /stream HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await asyncio.sleep(seconds)
+        w.close()
+
+    async def main():
+        out = await asyncio.gather(*[reader(k) for k in range(n)], *[sleeper() for _ in range(slow)])
+        return [o for o in out if o is not None]
+
+    results = asyncio.run(main())
+    return [f for f, _ in results], [x for _, lat in results for x in lat]
+
+
+def pct(values, q):
+    return np.percentile(values, q) if len(values) else float("nan")
+
+
+async def bench(args):
+    engine = SimulationEngine(load_plant())
+    engine.execute("set", speed=args.speed, spatial_penetration_pct=args.penetration, run_simulation=True)
+    ticks = []
+    engine.add_listener(lambda snap: ticks.append((snap.published_at, snap.tick_ms)))
+    engine.start()
+    server = await TelemetryServer(engine, port=0).start()
+    fanout = []
+    fan_out = server._fan_out
+
+    def timed_fan_out(snap):
+        fan_out(snap)
+        fanout.append(server.fanout_ms)
+    server._fan_out = timed_fan_out
+
+    # Phase 1: no subscribers
+    await asyncio.sleep(args.seconds)
+    baseline = list(ticks)
+
+    # Phase 2: all subscribers
+    ticks.clear()
+    fanout.clear()
+    per_proc = [args.clients // args.client_procs + (k < args.clients % args.client_procs) for k in range(args.client_procs)]
+    slow = [args.slow // args.client_procs + (k < args.slow % args.client_procs) for k in range(args.client_procs)]
+    with ProcessPoolExecutor(args.client_procs, mp_context=mp.get_context("spawn")) as pool:
+        futures = [asyncio.wrap_future(pool.submit(run_clients, server.port, n, s, args.seconds, sum(per_proc[:k])))
+                   for k, (n, s) in enumerate(zip(per_proc, slow))]
+        await asyncio.sleep(args.seconds / 2)
+        peak = server.stats()
+        results = await asyncio.gather(*futures)
+    loaded = list(ticks)
+    stats = server.stats()
+    await server.stop()
+    engine.stop()
+
+    frames = [f for fr, _ in results for f in fr]
+    lat_ms = np.array([x for _, lat in results for x in lat]) * 1e3
+    print(f"{args.clients} SSE subscribers + {args.slow} slow, {args.client_procs} client process(es), "
+          f"tick every {args.speed}s, {args.seconds}s per phase\n")
+    print(f"{'phase':<12} {'ticks':>5} {'tick p50 ms':>12} {'tick p95 ms':>12} {'interval p50 s':>15} {'interval max s':>15}")
+    for name, rows in (("idle", baseline), ("subscribed", loaded)):
+        at = np.array([t for t, _ in rows])
+        ms = [m for _, m in rows]
+        gaps = np.diff(at) if len(at) > 1 else [float("nan")]
+        print(f"{name:<12} {len(rows):>5} {pct(ms, 50):>12.3f} {pct(ms, 95):>12.3f} "
+              f"{np.median(gaps):>15.3f} {np.max(gaps):>15.3f}")
+    print(f"\nsubscribers connected at mid-phase: {peak['subscribers']}")
+    print(f"fan-out per tick: p50 {pct(fanout, 50):.2f} ms, max {max(fanout, default=float('nan')):.2f} ms")
+    print(f"frames per reading client: min {min(frames)}, median {int(np.median(frames))}, max {max(frames)}")
+    print(f"publish -> client latency: p50 {pct(lat_ms, 50):.1f} ms, p95 {pct(lat_ms, 95):.1f} ms, max {lat_ms.max():.1f} ms")
+    print(f"frames sent {stats['frames_sent']}, dropped (backpressure) {stats['frames_dropped']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--slow", type=int, default=5, help="Subscribers that never read")
+    parser.add_argument("--client-procs", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=20.0, help="Duration of each phase")
+    parser.add_argument("--speed", type=float, default=1.0, help="Seconds per tick (1.0 = 1 Hz)")
+    parser.add_argument("--penetration", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+MICRO-BENCHMARK SUITE: PHYSICS AND CONTROL HOT PATHS
+Times every per-tick hot path headless with fixed seeds: PV physics, voltage
+profile, the MPC planners, the WLS state estimators, the swing equation,
+symmetrical components, LSTM window preparation, the feeder panel, the
+per-bus network solve, a full master tick (with and without MPC) and a full
+engine snapshot. Each case is timed with timeit (autoranged to at least
+--min-time seconds per repeat); the best and median per-call times go into a
+JSON file together with the interpreter, NumPy and git revision.
+
+`compare` checks a new run against a baseline and exits non-zero when any
+case got slower than --threshold (on the best time, which is the least
+noisy statistic for code this small).
+
+The dashboard's run_mpc_optimization reads the shared forecast services, so
+the MPC cases time headless.lookahead_planner (plan_dispatch over the same
+[idx, idx + horizon) window, taken from the replay data) and
+plan_dispatch_stochastic on 32 sampled scenarios of that window.
+advance_simulation_step is grid_physics.tick since the engine refactor.
+
+Run from the repository root:
+    python -m benchmarks.microbench run                      # -> results/microbench/<timestamp>.json
+    python -m benchmarks.microbench run --filter mpc --out results/microbench/mpc.json
+    python -m benchmarks.microbench compare results/microbench/base.json results/microbench/new.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+import numpy as np
+
+import grid_physics
+from forecasting import prepare_lstm_data
+from headless import lookahead_planner
+from mpc_controller import plan_dispatch_stochastic, sample_scenarios
+from sim_engine import load_plant, take_snapshot
+
+OUT_DIR = "results/microbench"
+SEED = 0
+WARM_TICKS = 48
+
+
+def _warm_state(plant):
+    """A state 48 hours into a run with BESS, smart inverters and auto tap on."""
+    bus0 = plant.network.bus_list[0]
+    state = grid_physics.GridState(fault_bus=bus0, monitored_bus="bus1003")
+    state.bess_active = state.enable_smart_inverter = state.auto_tap_mode = True
+    state.spatial_penetration_pct = 50
+    for _ in range(WARM_TICKS):
+        grid_physics.tick(state, plant)
+    return state
+
+
+def cases(plant):
+    """name -> setup(); setup() returns the zero-argument callable to time."""
+    bus = "bus1003"
+
+    def pv_physics():
+        state = _warm_state(plant)
+        site = plant.network.solar_sites[0]
+        return lambda: grid_physics.calculate_pv_physics(state, plant, site, 12)
+
+    def pv_fleet():
+        state = _warm_state(plant)
+        return lambda: grid_physics.pv_fleet_output(state, plant, 12)
+
+    def voltage_profile():
+        return lambda: grid_physics.calculate_voltage_profile(plant, bus, 45.0, 18.0, 1.0, p_gen_kw=20.0)
+
+    def mpc_lookahead():
+        state = _warm_state(plant)
+        state.mpc_active = True
+        planner = lookahead_planner(plant)
+        return lambda: planner(state, 12, 5000.0)
+
+    def mpc_stochastic():
+        state = _warm_state(plant)
+        rng = np.random.default_rng(SEED)
+        load = plant.total_p[12:18]
+        irr = np.array([grid_physics.get_solar_contribution(plant, h) for h in range(12, 18)])
+        load_s = sample_scenarios(load, rng.normal(0, 150, (200, 6)), rng=rng)
+        irr_s = sample_scenarios(irr, rng.normal(0, 0.05, (200, 6)), k=len(load_s), rng=rng, lower=0.0)
+        capacity = plant.network.active_solar_capacity(state.spatial_penetration_pct)
+        return lambda: plan_dispatch_stochastic(load_s, irr_s, state.tap_position, state.bess_soc, capacity)
+
+    def se_scalar():
+        se = grid_physics.StateEstimator(0.05, 0.02)
+        z = np.array([0.985, 0.045, 0.018])
+        return lambda: se.solve(z)
+
+    def se_batch():
+        n = len(plant.network.bus_list)
+        rng = np.random.default_rng(SEED)
+        R, X = np.full(n, 0.05) * rng.uniform(0.5, 1.5, n), np.full(n, 0.02) * rng.uniform(0.5, 1.5, n)
+        z = np.column_stack([rng.uniform(0.97, 1.0, n), rng.uniform(0.0, 0.06, n), rng.uniform(0.0, 0.03, n)])
+        return lambda: grid_physics.wls_estimate_batch(R, X, z)
+
+    def swing():
+        state = _warm_state(plant)
+        return lambda: grid_physics.update_grid_physics(state, 5000.0, 2000.0)
+
+    def symmetrical():
+        faults = list(grid_physics.FAULT_LIBRARY)
+        return lambda: [grid_physics.compute_symmetrical_components_physics(f) for f in faults]
+
+    def lstm_windows():
+        series = plant.total_p.astype(np.float32)
+        return lambda: prepare_lstm_data(series)
+
+    def feeder_panel():
+        state = _warm_state(plant)
+        return lambda: grid_physics.feeder_step(state, plant, bus, state.idx)
+
+    def network_solve():
+        state = _warm_state(plant)
+        site_pv = grid_physics.pv_fleet_output(state, plant, state.idx)
+        return lambda: grid_physics.solve_network(state, plant, state.idx, site_pv)
+
+    def tick():
+        state = _warm_state(plant)
+        return lambda: grid_physics.tick(state, plant)
+
+    def tick_mpc():
+        state = _warm_state(plant)
+        state.mpc_active = True
+        planner = lookahead_planner(plant)
+        return lambda: grid_physics.tick(state, plant, planner)
+
+    def snapshot():
+        state = _warm_state(plant)
+        return lambda: take_snapshot(state)
+
+    return {
+        "pv.calculate_pv_physics": pv_physics,
+        "pv.fleet_output": pv_fleet,
+        "network.calculate_voltage_profile": voltage_profile,
+        "mpc.lookahead_planner": mpc_lookahead,
+        "mpc.plan_dispatch_stochastic": mpc_stochastic,
+        "se.StateEstimator.solve": se_scalar,
+        "se.wls_estimate_batch_240": se_batch,
+        "physics.update_grid_physics": swing,
+        "protection.symmetrical_components_x4": symmetrical,
+        "forecast.prepare_lstm_data_8760": lstm_windows,
+        "feeder.feeder_step": feeder_panel,
+        "network.solve_network": network_solve,
+        "engine.tick": tick,
+        "engine.tick_mpc": tick_mpc,
+        "engine.take_snapshot": snapshot,
+    }
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_case(setup, repeat, min_time):
+    np.random.seed(SEED)
+    fn = setup()
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    # autorange stops at 0.2 s; scale to the requested time per repeat
+    number = max(1, int(number * min_time / 0.2))
+    times = np.array(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+    return dict(best_us=float(times.min()), median_us=float(np.median(times)), number=number, repeat=repeat)
+
+
+def run(args):
+    plant = load_plant()
+    selected = {k: v for k, v in cases(plant).items() if not args.filter or any(f in k for f in args.filter)}
+    if not selected:
+        sys.exit(f"no case matches {args.filter}")
+    results = {}
+    print(f"{'case':<38} {'best us':>10} {'median us':>10} {'calls':>7}")
+    for name, setup in selected.items():
+        results[name] = r = time_case(setup, args.repeat, args.min_time)
+        print(f"{name:<38} {r['best_us']:>10.2f} {r['median_us']:>10.2f} {r['number']:>7}")
+    meta = dict(
+        created=datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        git=_git_rev(), python=platform.python_version(), numpy=np.__version__, machine=platform.machine(),
+        processor=platform.processor(), cpus=os.cpu_count(), seed=SEED,
+    )
+    out = args.out or os.path.join(OUT_DIR, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"\n{len(results)} cases -> {out}")
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        base = json.load(f)
+    with open(args.current) as f:
+        cur = json.load(f)
+    print(f"baseline {args.baseline} ({base['meta'].get('git')}), current {args.current} ({cur['meta'].get('git')})")
+    print(f"{'case':<38} {'base us':>10} {'now us':>10} {'change':>8}")
+    regressions = []
+    for name in sorted(set(base["results"]) | set(cur["results"])):
+        b, c = base["results"].get(name), cur["results"].get(name)
+        if b is None or c is None:
+            print(f"{name:<38} {'only in ' + ('current' if b is None else 'baseline'):>30}")
+            continue
+        change = c["best_us"] / b["best_us"] - 1.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -args.threshold:
+            flag = "  faster"
+        print(f"{name:<38} {b['best_us']:>10.2f} {c['best_us']:>10.2f} {change:>+8.1%}{flag}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\nno regression over {args.threshold:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_run = sub.add_parser("run", help="Time the cases and write a JSON result file")
+    p_run.add_argument("--filter", nargs="+", help="Only cases whose name contains one of these")
+    p_run.add_argument("--repeat", type=int, default=7)
+    p_run.add_argument("--min-time", type=float, default=0.1, help="Seconds per repeat")
+    p_run.add_argument("--out", help=f"Result file (default: {OUT_DIR}/<timestamp>.json)")
+    p_cmp = sub.add_parser("compare", help="Flag regressions of CURRENT against BASELINE")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("--threshold", type=float, default=0.15, help="Relative slow-down that counts (0.15 = 15%%)")
+    sub.add_parser("list", help="List the case names")
+    args = parser.parse_args()
+    if args.command == "list":
+        print("\n".join(cases(None)))
+    elif args.command == "run":
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+PER-BUS MULTI-OUTPUT LOAD FORECASTER
+One model over every metered bus in Historical_Data/Feeder*_P.csv. Each bus
+gets its own ridge coefficients on a shared feature layout (recent lags, the
+same hour yesterday / last week, daily Fourier terms), with one coefficient set
+per horizon step (direct multi-horizon). Training solves all buses x horizon
+steps as a single batched normal-equation system. Inference for all buses is
+one einsum, so no Prophet/LSTM per bus and no Python loop over buses.
+"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from grid_network import normalize_bus_name
+
+FEEDER_P_PATTERN = "Historical_Data/Feeder*_P.csv"
+
+BUS_LAGS = (1, 2, 3, 24, 168)
+FOURIER_HARMONICS = 2
+
+
+def load_bus_matrix(pattern=FEEDER_P_PATTERN):
+    """Stacks every per-bus P column into a (hours, buses) float array."""
+    names, cols = [], []
+    for path in sorted(glob.glob(pattern)):
+        df = pd.read_csv(path)
+        for col in df.columns:
+            name = normalize_bus_name(col)
+            if name in names: continue
+            names.append(name)
+            cols.append(df[col].to_numpy(dtype=float))
+    if not cols:
+        return [], np.zeros((0, 0))
+    return names, np.column_stack(cols)
+
+
+def _fourier(hours):
+    hours = np.asarray(hours, dtype=float)
+    feats = []
+    for k in range(1, FOURIER_HARMONICS + 1):
+        ang = 2 * np.pi * k * hours / 24.0
+        feats.extend((np.sin(ang), np.cos(ang)))
+    return np.stack(feats, axis=-1)
+
+
+class MultiBusForecaster:
+    """Direct multi-horizon ridge forecaster for many series at once."""
+    def __init__(self, horizon=24, lags=BUS_LAGS, ridge=1.0):
+        self.horizon = horizon
+        self.lags = tuple(lags)
+        self.ridge = ridge
+        self.bus_names = []
+        self.coef = None   # (horizon, buses, features)
+        self.mu = None
+        self.sigma = None
+
+    @property
+    def n_features(self):
+        return 1 + len(self.lags) + 2 * FOURIER_HARMONICS
+
+    def _features(self, Y, origins):
+        """
+        Features for forecast origins (hours whose past is known up to origin-1).
+        Y: (hours, buses) in kW; only the lagged rows are standardized.
+        Returns (buses, len(origins), features).
+        """
+        origins = np.asarray(origins)
+        F = np.empty((Y.shape[1], len(origins), self.n_features))
+        F[..., 0] = 1.0
+        for j, lag in enumerate(self.lags):
+            F[..., 1 + j] = ((Y[origins - lag] - self.mu) / self.sigma).T
+        F[..., 1 + len(self.lags):] = _fourier(origins)   # shared by every bus
+        return F
+
+    def fit(self, Y, bus_names=None):
+        """Y: (hours, buses). One batched ridge solve for every bus and horizon step."""
+        Y = np.asarray(Y, dtype=float)
+        self.bus_names = list(bus_names) if bus_names is not None else [str(i) for i in range(Y.shape[1])]
+        self.mu = Y.mean(axis=0)
+        self.sigma = Y.std(axis=0)
+        self.sigma[self.sigma < 1e-9] = 1.0
+        Z = (Y - self.mu) / self.sigma
+
+        origins = np.arange(max(self.lags), len(Z) - self.horizon + 1)
+        F = self._features(Y, origins)                                   # (B, n, k)
+        # Targets for every horizon step: (B, n, H), one contiguous copy for BLAS
+        T = np.ascontiguousarray(sliding_window_view(Z.T, self.horizon, axis=1)[:, origins[0]:origins[-1] + 1])
+        Ft = F.transpose(0, 2, 1)
+        G = Ft @ F                                                       # batched BLAS
+        G[:, np.arange(F.shape[2]), np.arange(F.shape[2])] += self.ridge
+        R = Ft @ T
+        self.coef = np.linalg.solve(G, R).transpose(2, 0, 1)           # (H, B, k)
+        return self
+
+    def predict(self, history, origin):
+        """
+        Next-horizon forecast for all buses from `history` (hours, buses) known
+        up to origin-1. Returns (horizon, buses) in kW.
+        """
+        F = self._features(np.asarray(history, dtype=float), [origin])[:, 0]   # (B, k)
+        return np.einsum('bk,hbk->hb', F, self.coef) * self.sigma + self.mu
+
+    def predict_many(self, history, origins):
+        """Forecasts for several origins at once: (origins, horizon, buses)."""
+        F = self._features(np.asarray(history, dtype=float), origins)    # (B, n, k)
+        return np.einsum('bnk,hbk->nhb', F, self.coef) * self.sigma + self.mu
+
+    def forecast_dict(self, history, origin):
+        pred = self.predict(history, origin)
+        return {name: pred[:, j] for j, name in enumerate(self.bus_names)}
+
+    def evaluate(self, Y, origins):
+        """RMSE / MAE per horizon step (averaged over buses) at the given origins."""
+        Y = np.asarray(Y, dtype=float)
+        origins = np.asarray(origins)
+        pred = self.predict_many(Y, origins)
+        actual = sliding_window_view(Y, self.horizon, axis=0)[origins].transpose(0, 2, 1)
+        err = pred - actual
+        return {"rmse": np.sqrt(np.mean(err ** 2, axis=(0, 2))), "mae": np.mean(np.abs(err), axis=(0, 2))}
+
+
+def train_bus_forecaster(pattern=FEEDER_P_PATTERN, horizon=24, train_frac=0.8):
+    """Fits on the first train_frac of the year and scores hourly origins on the rest."""
+    names, Y = load_bus_matrix(pattern)
+    split = int(len(Y) * train_frac)
+    model = MultiBusForecaster(horizon=horizon).fit(Y[:split], names)
+    metrics = model.evaluate(Y, np.arange(split, len(Y) - horizon + 1))
+    return model, Y, metrics
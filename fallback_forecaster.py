@@ -0,0 +1,123 @@
+"""
+DEPENDENCY-LIGHT FALLBACK FORECASTERS
+Pure-NumPy stand-ins used when Prophet and/or TensorFlow are not installed.
+Both fit on a full 8760-hour year in milliseconds and expose the interfaces
+the forecasting engine already consumes:
+
+  SeasonalProfile  (Prophet slot)  moving-average trend + hour-of-week profile;
+                                   predict(df with 'ds') -> df with 'yhat'
+  LagLeastSquares  (LSTM slot)     ridge least-squares on lagged, MinMax-scaled
+                                   values; predict_on_batch / rollout like
+                                   NumpyLSTM, with its scaler attached
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from lstm_numpy import MinMaxParams
+
+SEASON_HOURS = 24 * 7
+FALLBACK_LAGS = (1, 2, 3, 24, 48, 72, 96, 120, 144, 168)
+
+
+def _minmax(values):
+    lo, hi = float(np.min(values)), float(np.max(values))
+    scale = 1.0 / (hi - lo) if hi > lo else 1.0
+    return MinMaxParams([scale], [-lo * scale])
+
+
+class SeasonalProfile:
+    """
+    Additive decomposition on the fixed time base: a centred moving-average
+    trend plus a zero-mean hour-of-week profile. Hours past the training data
+    hold the trend at its last value.
+    """
+    label = "SEASONAL PROFILE (Fallback)"
+
+    def __init__(self, epoch, period=SEASON_HOURS):
+        self.epoch = pd.Timestamp(epoch)
+        self.period = period
+        self.start_hour = 0
+        self.trend = None
+        self.profile = None
+
+    def fit(self, values, start_hour=0):
+        y = np.asarray(values, dtype=float)
+        n = len(y)
+        self.start_hour = int(start_hour)
+        # Centred moving average, normalised by the window count at the edges
+        w = min(self.period, n)
+        kernel = np.ones(w)
+        self.trend = np.convolve(y, kernel, mode='same') / np.convolve(np.ones(n), kernel, mode='same')
+        slot = (self.start_hour + np.arange(n)) % self.period
+        sums = np.bincount(slot, weights=y - self.trend, minlength=self.period)
+        counts = np.bincount(slot, minlength=self.period)
+        profile = np.divide(sums, counts, out=np.zeros(self.period), where=counts > 0)
+        self.profile = profile - profile[counts > 0].mean()
+        return self
+
+    def predict_hours(self, hours):
+        hours = np.asarray(hours, dtype=int)
+        idx = np.clip(hours - self.start_hour, 0, len(self.trend) - 1)
+        return self.trend[idx] + self.profile[hours % self.period]
+
+    def predict(self, future):
+        """Prophet-style: `future` has a 'ds' column of hourly timestamps."""
+        hours = ((pd.to_datetime(future['ds']) - self.epoch) // pd.Timedelta(hours=1)).to_numpy()
+        return pd.DataFrame({'ds': future['ds'].values, 'yhat': self.predict_hours(hours)})
+
+
+class LagLeastSquares:
+    """Linear next-step model on selected lags of the scaled series."""
+    label = "LAG LEAST-SQUARES (Fallback)"
+
+    def __init__(self, lags=FALLBACK_LAGS, ridge=1e-3):
+        self.lags = np.asarray(sorted(lags), dtype=int)
+        self.lookback = int(self.lags.max())
+        self.ridge = ridge
+        self.coef = None
+        self.intercept = 0.0
+        self.scaler = None
+
+    def _columns(self, windows):
+        return windows[:, self.lookback - self.lags]
+
+    def fit(self, values, scaler=None):
+        y = np.asarray(values, dtype=float).reshape(-1, 1)
+        self.scaler = scaler or _minmax(y)
+        z = self.scaler.transform(y).ravel()
+        X = self._columns(sliding_window_view(z[:-1], self.lookback))
+        t = z[self.lookback:]
+        A = np.column_stack([X, np.ones(len(X))])
+        G = A.T @ A
+        G[np.arange(len(self.lags)), np.arange(len(self.lags))] += self.ridge
+        sol = np.linalg.solve(G, A.T @ t)
+        self.coef, self.intercept = sol[:-1], float(sol[-1])
+        return self
+
+    def predict_on_batch(self, X):
+        """X: (batch, lookback[, 1]) scaled windows -> (batch, 1) scaled next step."""
+        X = np.asarray(X, dtype=float).reshape(len(X), self.lookback)
+        return (self._columns(X) @ self.coef + self.intercept)[:, np.newaxis]
+
+    def rollout(self, window, steps):
+        """Recursive multi-step forecast from one scaled (lookback,) window."""
+        buf = np.empty(self.lookback + steps)
+        buf[:self.lookback] = np.asarray(window, dtype=float).reshape(-1)
+        for s in range(steps):
+            buf[self.lookback + s] = buf[self.lookback + s - self.lags] @ self.coef + self.intercept
+        return buf[self.lookback:]
+
+    def save(self, path):
+        np.savez(path, lags=self.lags, coef=self.coef, intercept=self.intercept,
+                 scale=self.scaler.scale_, min_=self.scaler.min_)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            model = cls(lags=data['lags'])
+            model.coef = data['coef']
+            model.intercept = float(data['intercept'])
+            model.scaler = MinMaxParams(data['scale'], data['min_'])
+        return model
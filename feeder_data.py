@@ -0,0 +1,162 @@
+"""
+PER-BUS FEEDER DATA
+Hourly active and reactive load of every metered bus on feeders A, B and C,
+read once per process into column-major (hours, buses) arrays, so one bus is
+one contiguous column and per-feeder aggregates are a single matrix product.
+
+Each feeder and quantity comes from the first source that loads:
+  OpenDSS Model (08.13.2020)/Feeder{X}_{P,Q}.mat   every load bus of the feeder,
+      named by Feeder{X}_P_Q_Header.mat (MATLAB v7.3 files need h5py,
+      older ones scipy)
+  Historical_Data/Feeder{X}_{P,Q}.csv              the non-zero buses only
+Feeder C has no reactive data; buses without Q are NaN in `q` and False in
+`has_q` (grid_physics then applies its fixed power factor).
+
+    python feeder_data.py
+"""
+import importlib.util
+import os
+import time
+from dataclasses import dataclass
+from typing import Mapping, Tuple
+
+import numpy as np
+import pandas as pd
+
+from grid_network import FEEDERS, normalize_bus_name
+
+SCIPY_AVAILABLE = importlib.util.find_spec("scipy") is not None
+H5PY_AVAILABLE = importlib.util.find_spec("h5py") is not None
+
+MAT_DIR = "OpenDSS Model (08.13.2020)"
+CSV_DIR = "Historical_Data"
+KINDS = ("P", "Q")
+
+
+@dataclass(frozen=True)
+class FeederData:
+    """Per-bus replay data of all feeders; columns are aligned with `buses`."""
+    buses: Tuple[str, ...]        # topology names ('bus2002'), feeder by feeder
+    feeders: Tuple[str, ...]      # feeder of each bus
+    p: np.ndarray                 # (hours, buses) kW, Fortran order
+    q: np.ndarray                 # (hours, buses) kVAR, NaN where the bus has no Q
+    has_q: np.ndarray             # (buses,) bool
+    sources: Mapping[str, str]    # "A_P" -> file it was read from
+
+    def columns(self, kind="p"):
+        """{bus: (hours,) column view} of P or Q; Q only for buses that have it."""
+        data = self.p if kind == "p" else self.q
+        return {b: data[:, j] for j, b in enumerate(self.buses) if kind == "p" or self.has_q[j]}
+
+    def summary(self):
+        """Rows of feeder, bus count, buses with Q and the P / Q sources."""
+        feeders = np.array(self.feeders)
+        return [dict(feeder=f, buses=int((feeders == f).sum()), with_q=int(self.has_q[feeders == f].sum()),
+                     p_source=self.sources.get(f"{f}_P"), q_source=self.sources.get(f"{f}_Q"))
+                for f in FEEDERS]
+
+
+# ----------------------------------------------------------
+# READERS (each returns None when its source is missing or unreadable)
+# ----------------------------------------------------------
+def _read_mat(path, var):
+    """The (hours, columns) matrix `var` of a .mat file."""
+    if not os.path.exists(path):
+        return None
+    try:
+        if H5PY_AVAILABLE:
+            import h5py
+            if h5py.is_hdf5(path):
+                with h5py.File(path, "r") as f:
+                    # v7.3 stores MATLAB's column-major (hours, buses) as a row-major (buses, hours)
+                    return f[var][()].T
+        if SCIPY_AVAILABLE:
+            from scipy.io import loadmat
+            return np.asarray(loadmat(path, variable_names=[var])[var], dtype=float)
+    except (OSError, KeyError, ValueError, NotImplementedError):
+        pass
+    return None
+
+
+def _read_mat_header(path, var):
+    """Bus names of a .mat cell array of strings."""
+    if not os.path.exists(path):
+        return None
+    try:
+        if H5PY_AVAILABLE:
+            import h5py
+            if h5py.is_hdf5(path):
+                with h5py.File(path, "r") as f:
+                    return ["".join(map(chr, f[ref][()].ravel())) for ref in f[var][()].ravel()]
+        if SCIPY_AVAILABLE:
+            from scipy.io import loadmat
+            return [str(np.ravel(cell)[0]) for cell in loadmat(path, variable_names=[var])[var].ravel()]
+    except (OSError, KeyError, ValueError, NotImplementedError, IndexError):
+        pass
+    return None
+
+
+def _read_feeder(feeder, kind, mat_dir, csv_dir):
+    """(bus names, (hours, buses) matrix, source path) of one feeder quantity, or None."""
+    path = os.path.join(mat_dir, f"Feeder{feeder}_{kind}.mat")
+    names = _read_mat_header(os.path.join(mat_dir, f"Feeder{feeder}_P_Q_Header.mat"), f"Feeder{feeder}_P_Q_Header")
+    matrix = _read_mat(path, f"Feeder{feeder}_{kind}") if names else None
+    if matrix is not None and matrix.ndim == 2 and len(names) in matrix.shape:
+        return names, (matrix if matrix.shape[1] == len(names) else matrix.T), path
+    path = os.path.join(csv_dir, f"Feeder{feeder}_{kind}.csv")
+    if os.path.exists(path):
+        df = pd.read_csv(path)
+        return list(df.columns), df.to_numpy(dtype=float), path
+    return None
+
+
+def _wrap(matrix, hours):
+    return matrix if len(matrix) == hours else matrix[np.arange(hours) % len(matrix)]
+
+
+def load_feeder_data(mat_dir=MAT_DIR, csv_dir=CSV_DIR):
+    """All feeders' per-bus data; buses with neither source are simply absent."""
+    tables, sources = {}, {}
+    for feeder in FEEDERS:
+        for kind in KINDS:
+            found = _read_feeder(feeder, kind, mat_dir, csv_dir)
+            if found is not None:
+                names, matrix, sources[f"{feeder}_{kind}"] = found
+                tables[feeder, kind] = ([normalize_bus_name(n) for n in names], matrix)
+
+    buses, feeders = [], []
+    for feeder in FEEDERS:
+        names = tables.get((feeder, "P"), ((), None))[0]
+        buses.extend(names)
+        feeders.extend([feeder] * len(names))
+    hours = max((len(m) for (_, kind), (_, m) in tables.items() if kind == "P"), default=0)
+
+    # One preallocated column-major block per quantity; every table is a single slice assignment
+    col_of = {b: j for j, b in enumerate(buses)}
+    p = np.zeros((hours, len(buses)), order="F")
+    q = np.full((hours, len(buses)), np.nan, order="F")
+    for (feeder, kind), (names, matrix) in tables.items():
+        keep = [k for k, n in enumerate(names) if n in col_of]
+        cols = [col_of[names[k]] for k in keep]
+        (p if kind == "P" else q)[:, cols] = _wrap(matrix, hours)[:, keep]
+    has_q = ~np.isnan(q).any(axis=0) if hours else np.zeros(len(buses), dtype=bool)
+    for arr in (p, q, has_q):
+        arr.flags.writeable = False
+    return FeederData(buses=tuple(buses), feeders=tuple(feeders), p=p, q=q, has_q=has_q, sources=sources)
+
+
+def main():
+    t0 = time.perf_counter()
+    data = load_feeder_data()
+    print(f"{len(data.buses)} metered buses x {len(data.p)} hours in {time.perf_counter() - t0:.2f}s "
+          f"({(data.p.nbytes + data.q.nbytes) / 2 ** 20:.1f} MB)\n")
+    print(f"{'feeder':<7} {'buses':>5} {'with Q':>6} {'peak kW':>8}  source")
+    feeders = np.array(data.feeders)
+    for row in data.summary():
+        peak = data.p[:, feeders == row["feeder"]].sum(axis=1).max() if row["buses"] else 0.0
+        print(f"{row['feeder']:<7} {row['buses']:>5} {row['with_q']:>6} {peak:>8.1f}  "
+              f"{row['p_source']} / {row['q_source'] or '-'}")
+
+
+if __name__ == "__main__":
+    main()
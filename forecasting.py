@@ -0,0 +1,727 @@
+"""
+AI FORECASTING ENGINE
+Hybrid Prophet (seasonality/trend) + LSTM (short-term dynamics) forecasting.
+
+The heavy stacks (TensorFlow/Keras, Prophet, scikit-learn) are imported lazily
+on first use. Availability flags are resolved from the import system's module
+specs, so checking them never pays the import cost.
+"""
+import contextlib
+import datetime
+import importlib.util
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from artifact_store import ArtifactStore, artifact_key, data_digest
+from fallback_forecaster import LagLeastSquares, SeasonalProfile
+from metrics import LOAD_BUCKETS, counter, histogram
+from lstm_numpy import NumpyLSTM, kernel_from_keras, save_kernel
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# AI MODEL ARTIFACTS
+# Content-addressed store of trained model sets (see artifact_store.py)
+MODEL_STORE_DIR = "model_store"
+# Bump when the entry layout or training code changes what a key produces
+MODEL_FORMAT = 3
+# Points each series at its live store entry; swapped atomically on publish
+MODEL_MANIFEST_FILE = "models_manifest.json"
+# Serializes manifest updates across processes (dashboard and training worker)
+MODEL_MANIFEST_LOCK = MODEL_MANIFEST_FILE + ".lock"
+# Hyperparameters chosen by model_search.py (per series, merged over defaults)
+MODEL_CONFIG_FILE = "model_config.json"
+
+
+def _has_module(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+PROPHET_AVAILABLE = _has_module("prophet")
+LSTM_AVAILABLE = _has_module("tensorflow")
+
+# ----------------------------------------------------------
+# LAZY LOADERS (imported once per process, thread-safe)
+# ----------------------------------------------------------
+_import_lock = threading.Lock()
+_stacks = {}
+
+def _load_stack(name, loader):
+    stack = _stacks.get(name)
+    if stack is None:
+        with _import_lock:
+            stack = _stacks.get(name)
+            if stack is None:
+                stack = loader()
+                _stacks[name] = stack
+    return stack
+
+def _import_prophet():
+    from prophet import Prophet
+    from prophet.serialize import model_to_json, model_from_json
+    return SimpleNamespace(Prophet=Prophet, model_to_json=model_to_json, model_from_json=model_from_json)
+
+def _import_keras():
+    import tensorflow as tf
+    from tensorflow.keras.models import Sequential, load_model
+    from tensorflow.keras.layers import LSTM, Dense
+    return SimpleNamespace(tf=tf, Sequential=Sequential, load_model=load_model, LSTM=LSTM, Dense=Dense)
+
+def _import_sklearn():
+    from sklearn.metrics import mean_squared_error, mean_absolute_error
+    from sklearn.preprocessing import MinMaxScaler
+    return SimpleNamespace(mean_squared_error=mean_squared_error, mean_absolute_error=mean_absolute_error,
+                           MinMaxScaler=MinMaxScaler)
+
+def prophet_stack():
+    return _load_stack("prophet", _import_prophet)
+
+def keras_stack():
+    return _load_stack("keras", _import_keras)
+
+def sklearn_stack():
+    return _load_stack("sklearn", _import_sklearn)
+
+# ----------------------------------------------------------
+# TRAINING & INFERENCE
+# ----------------------------------------------------------
+LSTM_LOOKBACK = 24
+
+def sliding_windows(series, lookback=LSTM_LOOKBACK):
+    """
+    Read-only (N - lookback + 1, lookback) view of every lookback window.
+    Built with stride tricks, so no window data is copied.
+    """
+    return sliding_window_view(np.asarray(series, dtype=np.float32).reshape(-1), lookback)
+
+def prepare_lstm_data(series, lookback=LSTM_LOOKBACK):
+    """(X, y) pairs for next-step training; X is a (N - lookback, lookback, 1) view."""
+    series = np.asarray(series, dtype=np.float32).reshape(-1)
+    X = sliding_windows(series[:-1], lookback)[..., np.newaxis]
+    y = series[lookback:, np.newaxis]
+    return X, y
+
+def make_lstm_dataset(X, y, batch_size=32, shuffle=True, seed=None):
+    """
+    Streaming tf.data pipeline over window views. Only one batch of windows is
+    gathered at a time; batch order is reshuffled every epoch.
+    """
+    tf = keras_stack().tf
+    n = len(X)
+    rng = np.random.default_rng(seed)
+
+    def _batches():
+        order = rng.permutation(n) if shuffle else np.arange(n)
+        for i in range(0, n, batch_size):
+            sel = np.sort(order[i:i + batch_size])
+            yield X[sel], y[sel]
+
+    spec = (tf.TensorSpec(shape=(None,) + X.shape[1:], dtype=tf.float32),
+            tf.TensorSpec(shape=(None,) + y.shape[1:], dtype=tf.float32))
+    n_batches = -(-n // batch_size)
+    ds = tf.data.Dataset.from_generator(_batches, output_signature=spec)
+    return ds.apply(tf.data.experimental.assert_cardinality(n_batches)).prefetch(2)
+
+def lstm_forecast_slice(lstm_model, scaler, values, start, end, lookback=None):
+    """
+    One-step-ahead LSTM predictions for hours [start, end) only. Hour i is
+    predicted from values[i - lookback:i]; hours without a full lookback are 0.
+    `lookback` defaults to the model's own.
+    """
+    lookback = lookback or lstm_model.lookback
+    end = min(end, len(values))
+    out = np.zeros(max(0, end - start))
+    lo = max(start, lookback)
+    if lo >= end:
+        return out
+    scaled = scaler.transform(np.asarray(values[lo - lookback:end - 1], dtype=float).reshape(-1, 1))
+    windows = sliding_windows(scaled, lookback)[..., np.newaxis]
+    pred_scaled = np.asarray(lstm_model.predict_on_batch(np.ascontiguousarray(windows)))
+    out[lo - start:] = scaler.inverse_transform(pred_scaled).flatten()
+    return out
+
+# Fixed time base: simulation hour 0 is always FORECAST_EPOCH, so cached
+# forecasts keep the same 'ds' axis across runs and processes.
+FORECAST_EPOCH = datetime.datetime(2025, 1, 1)
+FORECAST_HORIZON = 24 # Hours per forecast; baseline curves extend this far past the data
+
+def hour_timestamps(start_hour, count):
+    return pd.date_range(FORECAST_EPOCH + datetime.timedelta(hours=int(start_hour)), periods=int(count), freq='h')
+
+# ----------------------------------------------------------
+# MODEL HYPERPARAMETERS
+# ----------------------------------------------------------
+DEFAULT_MODEL_CONFIG = {
+    "prophet": {"daily_seasonality": True, "weekly_seasonality": "auto", "yearly_seasonality": False,
+                "changepoint_prior_scale": 0.05, "seasonality_mode": "additive"},
+    "lstm": {"units": 50, "lookback": LSTM_LOOKBACK, "epochs": 5, "batch_size": 32,
+             "learning_rate": 0.001, "patience": None},
+}
+
+def model_config(is_solar=False, path=None):
+    """Defaults overlaid with the tuned config for this series, if one was saved."""
+    try:
+        with open(path or MODEL_CONFIG_FILE, 'r') as fin:
+            tuned = json.load(fin).get("solar" if is_solar else "load", {})
+    except (OSError, ValueError):
+        tuned = {}
+    return {family: dict(params, **tuned.get(family, {})) for family, params in DEFAULT_MODEL_CONFIG.items()}
+
+def fit_prophet(values, start_hour=0, config=None):
+    pr = prophet_stack()
+    params = dict(DEFAULT_MODEL_CONFIG["prophet"], **(config or {}))
+    df_prophet = pd.DataFrame({'ds': hour_timestamps(start_hour, len(values)), 'y': values})
+    model = pr.Prophet(**params)
+    model.fit(df_prophet)
+    return model
+
+def keras_from_kernel(kernel):
+    """Rebuilds a trainable Keras model from an exported NumPy kernel."""
+    kr = keras_stack()
+    model = kr.Sequential()
+    model.add(kr.LSTM(kernel.units, return_sequences=False, input_shape=(kernel.lookback, 1)))
+    model.add(kr.Dense(1))
+    model.set_weights(kernel.get_keras_weights())
+    return model
+
+def fit_lstm(values, scaler=None, model=None, epochs=None, on_epoch=None, config=None):
+    """
+    Trains a new LSTM(units)+Dense, or fine-tunes `model` (Keras model or
+    NumPy kernel, whose lookback wins) when one is given. Always returns a
+    Keras model; model.history.epoch lists the epochs actually run.
+    `config` overrides DEFAULT_MODEL_CONFIG["lstm"]; with a `patience` the
+    last 10% of windows are held out and training stops early on val_loss.
+    `on_epoch(done, total)` is called after every epoch for progress reporting.
+    """
+    kr = keras_stack()
+    params = dict(DEFAULT_MODEL_CONFIG["lstm"], **(config or {}))
+    epochs = epochs or params["epochs"]
+    if scaler is None:
+        scaler = sklearn_stack().MinMaxScaler(feature_range=(0, 1))
+        scaler.fit(np.asarray(values).reshape(-1, 1))
+    if isinstance(model, NumpyLSTM):
+        model = keras_from_kernel(model)
+    lookback = model.input_shape[1] if model is not None else params["lookback"]
+    scaled_data = scaler.transform(np.asarray(values).reshape(-1, 1))
+    X, y = prepare_lstm_data(scaled_data, lookback=lookback)
+    if model is None:
+        model = kr.Sequential()
+        model.add(kr.LSTM(params["units"], return_sequences=False, input_shape=(lookback, 1)))
+        model.add(kr.Dense(1))
+    callbacks = []
+    if on_epoch is not None:
+        callbacks.append(kr.tf.keras.callbacks.LambdaCallback(
+            on_epoch_end=lambda epoch, logs: on_epoch(epoch + 1, epochs)))
+    validation = None
+    if params["patience"]:
+        n_val = max(1, len(X) // 10)
+        validation = make_lstm_dataset(X[-n_val:], y[-n_val:], batch_size=params["batch_size"], shuffle=False)
+        X, y = X[:-n_val], y[:-n_val]
+        callbacks.append(kr.tf.keras.callbacks.EarlyStopping(
+            monitor='val_loss', patience=params["patience"], restore_best_weights=True))
+    # Fresh optimizer: loaded models carry state bound to their original variables
+    model.compile(optimizer=kr.tf.keras.optimizers.Adam(learning_rate=params["learning_rate"]), loss='mean_squared_error')
+    model.fit(make_lstm_dataset(X, y, batch_size=params["batch_size"]), validation_data=validation,
+              epochs=epochs, shuffle=False, verbose=0, callbacks=callbacks)
+    return model, scaler
+
+# ----------------------------------------------------------
+# MODEL ARTIFACTS
+# ----------------------------------------------------------
+# Every trained model set is a content-addressed store entry keyed by its
+# input data, time base, hyperparameters, warm-start parent and the stacks
+# used; the manifest only says which entry is live for each series.
+STORE = ArtifactStore(MODEL_STORE_DIR)
+
+STORE_LOOKUPS = counter("model_store_lookups_total", "Model set lookups in the artifact store by build_models",
+                        ("result",))
+MODEL_LOAD_SECONDS = histogram("forecast_model_load_seconds", "Time to load a model set from the artifact store",
+                               buckets=LOAD_BUCKETS)
+ROW_CACHE = counter("forecast_row_cache_total", "horizon_forecast lookups served from the per-hour matrix (hit) "
+                    "or computed (miss)", ("series", "result"))
+
+def series_name(is_solar=False):
+    return "solar" if is_solar else "load"
+
+def models_key(digest, is_solar=False, start_hour=0, baseline_hours=None, config=None, parent=None, epochs=None):
+    """Store key from a precomputed data digest (artifact_store.data_digest)."""
+    return artifact_key("forecast-models", MODEL_FORMAT, series_name(is_solar), digest, int(start_hour),
+                        int(baseline_hours), config or model_config(is_solar), parent, epochs,
+                        PROPHET_AVAILABLE, LSTM_AVAILABLE)
+
+def _atomic_write(path, write):
+    """Runs write(tmp_path), then renames over `path` so readers never see a partial file."""
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.tmp{os.getpid()}{ext}"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def read_manifest():
+    try:
+        with open(MODEL_MANIFEST_FILE, 'r') as fin:
+            return json.load(fin)
+    except (OSError, ValueError):
+        return {}
+
+def manifest_entry(is_solar=False):
+    return read_manifest().get(series_name(is_solar))
+
+def live_keys():
+    """Store keys the manifest points at; never evicted."""
+    return {entry.get('artifact') for entry in read_manifest().values()}
+
+@contextlib.contextmanager
+def _manifest_lock():
+    """Exclusive inter-process lock around a manifest read-modify-write."""
+    with open(MODEL_MANIFEST_LOCK, 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def publish_models(key, is_solar=False):
+    """Makes store entry `key` the live model set for its series (manifest swap)."""
+    name = series_name(is_solar)
+    with _manifest_lock():
+        manifest = read_manifest()
+        entry = {'artifact': key, 'version': manifest.get(name, {}).get('version', 0) + 1,
+                 'published_at': time.time()}
+        manifest[name] = entry
+        def _write(tmp):
+            with open(tmp, 'w') as fout:
+                json.dump(manifest, fout, indent=1)
+        _atomic_write(MODEL_MANIFEST_FILE, _write)
+    return entry
+
+def load_kernel(path):
+    """Loads an exported NumPy LSTM kernel or fallback lag model from .npz."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            is_lag = 'lags' in data.files
+        return LagLeastSquares.load(path) if is_lag else NumpyLSTM.load(path)
+    except Exception:
+        return None
+
+def load_artifact(key):
+    """Serving view of a store entry: baseline curve, inference kernel and meta. None if absent."""
+    opened = STORE.open(key) if key else None
+    if opened is None:
+        return None
+    path, meta = opened
+    with MODEL_LOAD_SECONDS.time():
+        kernel = load_kernel(os.path.join(path, "kernel.npz"))
+        if kernel is None:
+            return None
+        baseline = np.load(os.path.join(path, "baseline.npy"))
+    return SimpleNamespace(key=key, path=path, meta=meta, kernel=kernel, baseline=baseline)
+
+def model_labels(baseline_model=None, lstm_model=None):
+    """Chart labels for the 'prophet' and 'lstm' forecast slots."""
+    return {'prophet': getattr(baseline_model, 'label', "PROPHET (Baseline)"),
+            'lstm': getattr(lstm_model, 'label', "LSTM (Deep Learning)")}
+
+def evaluate_models(df_values, baseline=None, lstm_model=None, scaler=None, start_hour=0):
+    """Hold-out metrics on the last 20% of `df_values` (hour 0 = start_hour)."""
+    split_idx = int(len(df_values) * 0.8)
+    y_true = np.asarray(df_values[split_idx:], dtype=float)
+    metrics = {"prophet_rmse": 0, "prophet_mae": 0, "lstm_rmse": 0, "lstm_mae": 0}
+    if baseline is not None:
+        y_pred = baseline[start_hour + split_idx:start_hour + len(df_values)]
+        err = y_pred[:len(y_true)] - y_true[:len(y_pred)]
+        metrics['prophet_rmse'] = float(np.sqrt(np.mean(err ** 2)))
+        metrics['prophet_mae'] = float(np.mean(np.abs(err)))
+    if lstm_model is not None:
+        # Hold-out metrics only need the test split, not the whole year
+        err = lstm_forecast_slice(lstm_model, scaler, df_values, split_idx, len(df_values)) - y_true
+        metrics['lstm_rmse'] = float(np.sqrt(np.mean(err ** 2)))
+        metrics['lstm_mae'] = float(np.mean(np.abs(err)))
+    return metrics
+
+def build_models(df_values, is_solar=False, start_hour=0, baseline_hours=None, parent=None,
+                 epochs=None, progress=None, digest=None, source_digest=None):
+    """
+    Returns the store key of the model set fitted on `df_values` (hour 0 =
+    start_hour). A warm store hit returns immediately; otherwise Prophet and
+    the LSTM are fitted and written as one atomic store entry holding:
+      baseline.npy   Prophet curve over [0, baseline_hours) (default: the
+                     data plus FORECAST_HORIZON), so serving
+                     never needs to import Prophet
+      kernel.npz     NumPy LSTM kernel with its scaler
+      prophet.json   the fitted Prophet model
+    `parent` is the key of a published set whose LSTM is fine-tuned (keeping
+    its scaler) instead of trained from scratch. Hyperparameters come from
+    model_config(); missing stacks are replaced by the NumPy fallbacks
+    (SeasonalProfile, LagLeastSquares). `progress(stage, fraction)` reports
+    coarse progress.
+
+    The meta records `source_digest`, the digest of the replay source the
+    chain of sets started from: given explicitly, else inherited from the
+    parent, else the digest of df_values itself. Serving rejects sets whose
+    source digest is not its own (ForecastService._adopt).
+    """
+    df_values = np.asarray(df_values, dtype=float)
+    baseline_hours = int(baseline_hours or start_hour + len(df_values) + FORECAST_HORIZON)
+    config = model_config(is_solar)
+    digest = digest or data_digest(df_values)
+    opened = STORE.open(parent) if parent else None
+    source_digest = source_digest or (opened[1].get('source_digest') if opened else None) or digest
+    key = models_key(digest, is_solar, start_hour, baseline_hours, config, parent, epochs)
+    if STORE.has(key):
+        STORE_LOOKUPS.labels("hit").inc()
+        return key
+    STORE_LOOKUPS.labels("miss").inc()
+    report = progress or (lambda stage, fraction: None)
+    fitted = {}
+
+    if PROPHET_AVAILABLE:
+        report("prophet", 0.0)
+        prophet_model = fit_prophet(df_values, start_hour=start_hour, config=config['prophet'])
+        fitted['prophet.json'] = prophet_stack().model_to_json(prophet_model)
+        baseline = prophet_model.predict(pd.DataFrame({'ds': hour_timestamps(0, baseline_hours)}))['yhat'].values
+        baseline_model = None
+    else:
+        baseline_model = SeasonalProfile(FORECAST_EPOCH).fit(df_values, start_hour)
+        baseline = baseline_model.predict_hours(np.arange(baseline_hours))
+
+    init = load_artifact(parent).kernel if parent and STORE.has(parent) else None
+    if LSTM_AVAILABLE and not isinstance(init, LagLeastSquares):
+        report("lstm", 0.3)
+        # Early stopping may end before `total`; the publish step reports the rest
+        on_epoch = lambda done, total: report("lstm", 0.3 + 0.6 * done / total)
+        if init is not None:
+            keras_model, sk_scaler = fit_lstm(df_values, scaler=init.scaler, model=init, epochs=epochs,
+                                              on_epoch=on_epoch, config=config['lstm'])
+        else:
+            keras_model, sk_scaler = fit_lstm(df_values, epochs=epochs, on_epoch=on_epoch, config=config['lstm'])
+        kernel = kernel_from_keras(keras_model, sk_scaler)
+    else:
+        kernel = LagLeastSquares().fit(df_values, scaler=init.scaler if init is not None else None)
+
+    report("publish", 0.95)
+    meta = {'series': series_name(is_solar), 'trained_hours': [int(start_hour), int(start_hour + len(df_values))],
+            'config': config, 'parent': parent, 'source_digest': source_digest,
+            'labels': model_labels(baseline_model, kernel),
+            'metrics': evaluate_models(df_values, baseline, kernel, kernel.scaler, start_hour),
+            'created_at': time.time()}
+
+    def _write(entry_dir):
+        np.save(os.path.join(entry_dir, "baseline.npy"), baseline)
+        if isinstance(kernel, LagLeastSquares):
+            kernel.save(os.path.join(entry_dir, "kernel.npz"))
+        else:
+            save_kernel(kernel, os.path.join(entry_dir, "kernel.npz"))
+        for name, text in fitted.items():
+            with open(os.path.join(entry_dir, name), 'w') as fout:
+                fout.write(text)
+    STORE.put(key, _write, meta, protect=live_keys())
+    return key
+
+def train_and_publish(df_values, is_solar=False, start_hour=0, baseline_hours=None,
+                      parent=None, epochs=None, progress=None, source_digest=None):
+    """build_models() followed by a manifest swap. Returns the manifest entry."""
+    key = build_models(df_values, is_solar, start_hour, baseline_hours, parent, epochs, progress,
+                       source_digest=source_digest)
+    return publish_models(key, is_solar)
+
+# ----------------------------------------------------------
+# ROLLING-ORIGIN FORECAST SERVICE
+# ----------------------------------------------------------
+class ForecastService:
+    """
+    Stateful next-horizon forecaster on the fixed FORECAST_EPOCH time base.
+
+    Observations are ingested one hour at a time as the simulation advances;
+    forecast(origin) only uses hours < origin. Per tick the Prophet baseline is
+    a slice of a curve precomputed at (re)train time plus an EWMA level
+    correction, and the LSTM rolls forward recursively from the last observed
+    window. Full refits happen every `retrain_every` ingested hours.
+
+    With a `worker` (training_worker.TrainingWorker) nothing is fitted in this
+    process: missing models and scheduled refits become background jobs, the
+    last published models keep serving, and a seasonal-naive forecast stands
+    in until the first model set appears in the manifest. Model sets come
+    from the artifact store, so a restart with unchanged data and config
+    loads instantly instead of retraining; a published set trained from a
+    different source (the CSV changed) is never adopted.
+    """
+    def __init__(self, values, n_hours, is_solar=False, horizon=FORECAST_HORIZON, retrain_every=168,
+                 train_window=24 * 7 * 8, bias_alpha=0.1, bias_decay=0.9, worker=None):
+        self.source = np.asarray(values, dtype=float)
+        self.n_hours = int(n_hours)
+        self.is_solar = is_solar
+        self.horizon = horizon
+        self.retrain_every = retrain_every
+        self.train_window = train_window
+        self.bias_alpha = bias_alpha
+        self.bias_decay = bias_decay
+        self.worker = worker
+        self.name = series_name(is_solar)
+        self.config = model_config(is_solar)
+        # Digest computed once; every store lookup for the source reuses it
+        self.digest = data_digest(self.source)
+
+        self.observed = np.full(self.n_hours, np.nan)
+        self.next_hour = 0
+        self.hours_since_train = 0
+        self.retrain_count = 0
+        self.bias = 0.0
+        self.version = 0
+        self.artifact_key = None
+        self._manifest_mtime = None
+        self._cache_key = None
+        self._cache = None
+        # Per-origin primary forecasts for the controllers, one row per hour,
+        # valid while the row's stamp matches the model version
+        self._rows = np.full((self.n_hours, self.horizon), np.nan)
+        self._row_version = np.full(self.n_hours, -1)
+        self._row_hits, self._row_misses = ROW_CACHE.labels(self.name, "hit"), ROW_CACHE.labels(self.name, "miss")
+        self._lock = threading.RLock()
+
+        self.lstm_model = None
+        self.scaler = None
+        self.metrics = {}
+        self.baseline = None
+        self.labels = model_labels()
+        self.config_current = True
+        full_key = models_key(self.digest, is_solar, 0, self.baseline_hours, self.config)
+        if worker is None:
+            self._adopt(load_artifact(build_models(self.source, is_solar, 0, self.baseline_hours, digest=self.digest)))
+        elif self.refresh() and self.config_current:
+            pass
+        elif STORE.has(full_key):
+            # Warm store hit for this exact data and config: publish it, no training
+            self._adopt(load_artifact(full_key))
+            publish_models(full_key, is_solar)
+        else:
+            # Nothing usable published (or config changed): keep serving what
+            # is loaded, or the seasonal-naive fallback, while the worker builds
+            self._submit(self.source, start_hour=0, parent=None)
+
+    # --- Published models ---
+    @property
+    def ready(self):
+        return self.baseline is not None or self.lstm_model is not None
+
+    @property
+    def baseline_hours(self):
+        return self.n_hours + self.horizon
+
+    def _submit(self, values, start_hour, parent):
+        return self.worker.submit(self.name, values, is_solar=self.is_solar, start_hour=start_hour,
+                                  baseline_hours=self.baseline_hours, parent=parent,
+                                  epochs=1 if parent else None, source_digest=self.digest)
+
+    def _adopt(self, art):
+        """Swaps in a loaded store entry (see load_artifact)."""
+        if art is None or len(art.baseline) < self.baseline_hours:
+            return False # Evicted, or built for a shorter time base
+        if art.meta.get('source_digest') != self.digest:
+            return False # Trained from other replay data
+        with self._lock:
+            self.baseline = art.baseline
+            self.lstm_model, self.scaler = art.kernel, art.kernel.scaler
+            self.metrics = art.meta.get('metrics', {})
+            self.labels = art.meta.get('labels', self.labels)
+            self.config_current = art.meta.get('config') == self.config
+            self.artifact_key = art.key
+            self.bias = 0.0
+            self.version += 1
+            self._cache_key = None
+        return True
+
+    def refresh(self):
+        """
+        Swaps in a newly published model set if the manifest moved. Cheap when
+        nothing changed (one stat call). Returns True when models are loaded.
+        """
+        try:
+            mtime = os.stat(MODEL_MANIFEST_FILE).st_mtime_ns
+        except OSError:
+            return self.ready
+        if mtime == self._manifest_mtime:
+            return self.ready
+        self._manifest_mtime = mtime
+        entry = read_manifest().get(self.name)
+        if entry is not None and entry.get('artifact') != self.artifact_key:
+            self._adopt(load_artifact(entry.get('artifact')))
+        return self.ready
+
+    # --- State updates ---
+    def _value_at(self, hour):
+        """Observed value for an hour, falling back to the replay source."""
+        if 0 <= hour < self.n_hours and not np.isnan(self.observed[hour]):
+            return self.observed[hour]
+        return self.source[hour % len(self.source)]
+
+    def observe(self, hour, value):
+        with self._lock:
+            self._ingest(hour, value)
+            self._maybe_retrain()
+
+    def _ingest(self, hour, value):
+        self.observed[hour] = value
+        if self.baseline is not None:
+            resid = value - self.baseline[hour]
+            self.bias += self.bias_alpha * (resid - self.bias)
+        self.next_hour = max(self.next_hour, hour + 1)
+        self.hours_since_train += 1
+        self._cache_key = None
+
+    def _maybe_retrain(self):
+        if self.hours_since_train >= self.retrain_every:
+            self.retrain(self.next_hour)
+
+    def advance_to(self, origin):
+        """
+        Ingests the replayed hours in [next_hour, origin) from the source.
+        Origins behind the newest observation (other sessions, a wrapped
+        timeline) ingest nothing: their history is already in the buffer.
+        A catch-up spanning many hours triggers at most one retrain, and the
+        very first catch-up does not count toward the schedule.
+        """
+        if self.worker is not None:
+            self.refresh()
+        with self._lock:
+            first_sync = self.next_hour == 0 and self.retrain_count == 0
+            for hour in range(self.next_hour, origin):
+                self._ingest(hour, self.source[hour % len(self.source)])
+            if first_sync:
+                self.hours_since_train = 0
+            self._maybe_retrain()
+
+    def retrain(self, origin):
+        """
+        Scheduled full refit on the trailing train_window hours before origin,
+        fine-tuning the current LSTM. With a worker this only queues the job;
+        the refit is picked up by refresh() once published.
+        """
+        with self._lock:
+            start = origin - self.train_window
+            hist = np.array([self._value_at(h) for h in range(start, origin)])
+            self.hours_since_train = 0
+            self.retrain_count += 1
+            if self.worker is not None:
+                if start >= 0:
+                    self._submit(hist, start_hour=start, parent=self.artifact_key)
+                return
+            key = build_models(hist, self.is_solar, start, self.baseline_hours, parent=self.artifact_key, epochs=1,
+                               source_digest=self.digest)
+            self._adopt(load_artifact(key))
+
+    # --- Inference ---
+    def _lstm_rollout(self, origin):
+        lb = self.lstm_model.lookback
+        recent = np.array([self._value_at(h) for h in range(origin - lb, origin)])
+        window = self.scaler.transform(recent.reshape(-1, 1)).ravel()
+        path = self.lstm_model.rollout(window, self.horizon)
+        return self.scaler.inverse_transform(path.reshape(-1, 1)).ravel()
+
+    def forecast(self, origin, cache=True):
+        """
+        Next-horizon forecast issued at `origin`. Returns a dict with 'ds',
+        'prophet' and 'lstm' arrays (None for an unavailable model) and the
+        always-available 'naive' seasonal (same hour yesterday) fallback.
+        Memoized per (origin, model version); cache=False computes without
+        touching the memo.
+        """
+        with self._lock:
+            key = (origin, self.version, self.next_hour)
+            if self._cache_key == key:
+                return self._cache
+            hours = np.arange(origin, origin + self.horizon)
+            result = {'ds': hour_timestamps(origin, self.horizon), 'prophet': None, 'lstm': None,
+                      'naive': np.array([self._value_at(h - 24 * (1 + (h - origin) // 24)) for h in hours])}
+            if self.baseline is not None:
+                decay = self.bias_decay ** np.arange(1, self.horizon + 1)
+                result['prophet'] = self.baseline[np.minimum(hours, len(self.baseline) - 1)] + self.bias * decay
+            if self.lstm_model is not None:
+                result['lstm'] = self._lstm_rollout(origin)
+            if self.is_solar:
+                for k in ('prophet', 'lstm'):
+                    if result[k] is not None: result[k] = np.maximum(result[k], 0.0)
+            if cache:
+                self._cache_key, self._cache = key, result
+            return result
+
+    def horizon_forecast(self, origin, cache=True):
+        """
+        Primary next-horizon forecast (LSTM, else Prophet, else seasonal naive)
+        as one row of a per-hour matrix. Each origin hour is computed once per
+        model version and then served from the matrix, so every session and
+        controller asking for the same hour shares one rollout.
+
+        cache=False serves a row already in the matrix but leaves a missing one
+        out of it (and out of the forecast memo): for look-aheads off the live
+        run, whose rows must not stand in for the ones the run issues later.
+        """
+        with self._lock:
+            if not 0 <= origin < self.n_hours:
+                return self._primary(self.forecast(origin, cache))
+            if self._row_version[origin] != self.version and not cache:
+                return self._primary(self.forecast(origin, cache=False))
+            if self._row_version[origin] != self.version:
+                self._row_misses.inc()
+                self._rows[origin] = self._primary(self.forecast(origin))
+                self._row_version[origin] = self.version
+            else:
+                self._row_hits.inc()
+            return self._rows[origin]
+
+    def horizon_residuals(self, origin, window=24 * 7, min_rows=24):
+        """
+        (rows, horizon) errors (actual - forecast) of the matrix rows issued in
+        the trailing `window` hours whose whole horizon is observed by
+        `origin`. Until `min_rows` such rows exist, the seasonal-naive errors
+        over the same window stand in (wider, so conservative).
+        """
+        with self._lock:
+            lo = max(0, origin - window)
+            origins = np.arange(lo, max(lo, origin - self.horizon + 1))
+            if len(origins) == 0:
+                return np.empty((0, self.horizon))
+            hours = origins[:, np.newaxis] + np.arange(self.horizon)
+            actual = self._values_at(hours)
+            done = origins[self._row_version[origins] >= 0] if origin <= self.n_hours else origins[:0]
+            if len(done) >= min_rows:
+                return actual[done - lo] - self._rows[done]
+            steps = np.arange(self.horizon)
+            return actual - self._values_at(hours - 24 * (1 + steps // 24))
+
+    def _values_at(self, hours):
+        """Vectorized _value_at for an array of hours."""
+        vals = self.source[hours % len(self.source)]
+        inside = (hours >= 0) & (hours < self.n_hours)
+        obs = np.where(inside, self.observed[np.clip(hours, 0, self.n_hours - 1)], np.nan)
+        return np.where(np.isnan(obs), vals, obs)
+
+    @staticmethod
+    def _primary(fc):
+        for k in ('lstm', 'prophet', 'naive'):
+            if fc[k] is not None:
+                return fc[k]
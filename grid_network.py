@@ -0,0 +1,455 @@
+"""
+GRID NETWORK MODEL
+Static topology of the AZU feeder system (bus coordinates, line segments,
+transformer nodes) plus every structure derived from it: the electrical
+distance map and the spatial-penetration solar site plan.
+
+The derived structures are bundled into one immutable GridNetwork that is
+built once per process and shared by every dashboard session.
+"""
+import random
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
+import numpy as np
+
+# ----------------------------------------------------------
+# RAW TOPOLOGY DATA (from OpenDSS Buscoords.dss / Line.dss)
+# ----------------------------------------------------------
+BUS_COORDS_RAW = """
+bus1, 10.52, 13.6
+bus1001, 10.19, 13.04
+bus1002, 8.9, 14.11
+bus1003, 8.9, 13.36
+bus1004, 7.77, 14.11
+bus1005, 6.4, 14.11
+bus1006, 5.15, 14.11
+bus1007, 5.15, 12.98
+bus1008, 3.71, 14.11
+bus1009, 2.4, 14.11
+bus1010, 1.4, 14.11
+bus1011, 2.4, 12.98
+bus1012, 2.4, 12.11
+bus1013, 2.4, 11.23
+bus1014, 3.85, 11.23
+bus1015, 4.85, 11.23
+bus1016, 2.4, 10.48
+bus1017, 2.4, 9.73
+bus2001, 10.52, 12.23
+bus2002, 9.56, 7.58
+bus2003, 8.3, 7.58
+bus2004, 7.07, 7.58
+bus2005, 5.77, 7.58
+bus2006, 4.54, 7.58
+bus2007, 4.55, 8.25
+bus2008, 3.66, 8.25
+bus2009, 4.55, 8.93
+bus2010, 3.68, 7.58
+bus2011, 2.71, 7.58
+bus2012, 2.32, 7.1
+bus2013, 2.31, 6.44
+bus2014, 2.31, 5.68
+bus2015, 1.41, 5.68
+bus2016, 2.31, 4.97
+bus2017, 2.31, 4.24
+bus2018, 2.31, 3.51
+bus2019, 3.23, 6.45
+bus2020, 3.23, 5.85
+bus2021, 4.04, 6.44
+bus2022, 4.04, 5.72
+bus2023, 4.04, 4.99
+bus2024, 4.04, 4.26
+bus2025, 4.04, 3.53
+bus2026, 4.8, 6.45
+bus2027, 5.59, 6.45
+bus2028, 5.59, 5.88
+bus2029, 5.58, 5.31
+bus2030, 5.58, 4.73
+bus2031, 5.58, 4.16
+bus2032, 6.61, 6.45
+bus2033, 7.6, 6.45
+bus2034, 7.6, 5.79
+bus2035, 8.46, 6.44
+bus2036, 9.3, 6.45
+bus2037, 10.21, 6.45
+bus2038, 10.21, 5.84
+bus2039, 10.21, 4.98
+bus2040, 11.07, 4.98
+bus2041, 11.88, 4.98
+bus2042, 10.21, 4.39
+bus2043, 10.21, 3.63
+bus2044, 8.76, 3.63
+bus2045, 8.76, 4.29
+bus2046, 8.76, 5
+bus2047, 7.84, 4.29
+bus2048, 6.92, 4.29
+bus2049, 7.87, 3.63
+bus2050, 7.01, 3.63
+bus2051, 6.16, 3.62
+bus2052, 6.16, 2.81
+bus2053, 8.76, 2.1
+bus2054, 7.78, 2.1
+bus2055, 6.84, 2.1
+bus2056, 5.86, 2.1
+bus2057, 8.76, 1.4
+bus2058, 9.9, 1.4
+bus2059, 7.72, 1.4
+bus2060, 6.76, 1.4
+bus3001, 10.83, 13.02
+bus3002, 12.5, 12.16
+bus3003, 12.5, 12.85
+bus3004, 12.5, 13.43
+bus3005, 13.36, 12.85
+bus3006, 13.36, 13.91
+bus3007, 13.36, 14.71
+bus3008, 14.62, 11.41
+bus3009, 14.61, 12.04
+bus3010, 14.62, 12.7
+bus3011, 14.61, 13.36
+bus3012, 14.62, 14.02
+bus3013, 14.61, 10.77
+bus3014, 14.62, 10.06
+bus3015, 15.79, 11.41
+bus3016, 15.8, 10.75
+bus3017, 15.8, 10.1
+bus3018, 15.8, 12.07
+bus3019, 15.8, 12.72
+bus3020, 15.8, 13.38
+bus3021, 15.8, 14.03
+bus3022, 16.99, 11.41
+bus3023, 16.99, 10.76
+bus3024, 16.99, 10.12
+bus3025, 16.99, 9.47
+bus3026, 16.99, 12.06
+bus3027, 16.99, 12.72
+bus3028, 16.99, 13.38
+bus3029, 16.99, 14.03
+bus3030, 18.26, 11.41
+bus3031, 18.26, 10.91
+bus3032, 18.26, 10.4
+bus3033, 18.26, 9.9
+bus3034, 18.26, 9.39
+bus3035, 18.25, 12.05
+bus3036, 18.27, 12.68
+bus3037, 18.25, 13.32
+bus3038, 18.25, 13.95
+bus3039, 18.26, 14.59
+bus3040, 19.51, 11.41
+bus3041, 19.51, 10.87
+bus3042, 19.51, 10.33
+bus3043, 19.51, 9.79
+bus3044, 19.51, 12.03
+bus3045, 19.51, 12.63
+bus3046, 20.88, 11.41
+bus3047, 20.88, 12.16
+bus3048, 21.17, 10.92
+bus3049, 22, 10.92
+bus3050, 22.82, 10.92
+bus3051, 23.64, 10.92
+bus3052, 24.46, 10.91
+bus3053, 19.51, 14.79
+bus3054, 19.51, 14.19
+bus3055, 21.01, 14.79
+bus3056, 21.5, 15.2
+bus3057, 22.22, 15.2
+bus3058, 22.93, 15.2
+bus3059, 23.65, 15.2
+bus3060, 24.37, 15.2
+bus3061, 25.09, 15.2
+bus3062, 21.53, 14.13
+bus3063, 22.24, 14.13
+bus3064, 22.95, 14.14
+bus3065, 23.66, 14.13
+bus3066, 24.38, 14.13
+bus3067, 25.09, 14.13
+bus3068, 18.26, 8.82
+bus3069, 16.65, 8.82
+bus3070, 16.65, 8.27
+bus3071, 16.65, 7.71
+bus3072, 16.65, 7.16
+bus3073, 15.76, 8.82
+bus3074, 14.98, 8.82
+bus3075, 19.05, 8.82
+bus3076, 19.97, 8.82
+bus3077, 20.73, 8.82
+bus3078, 21.49, 8.82
+bus3079, 19.97, 8.07
+bus3080, 19.97, 7.42
+bus3081, 19.21, 7.42
+bus3082, 19.97, 6.79
+bus3083, 19.1, 6.79
+bus3084, 18.23, 6.79
+bus3085, 17.36, 6.79
+bus3086, 16.49, 6.79
+bus3087, 15.62, 6.79
+bus3088, 14.75, 6.79
+bus3089, 13.88, 6.79
+bus3090, 13.01, 6.79
+bus3091, 12.14, 6.79
+bus3092, 22.05, 6.79
+bus3093, 22.07, 7.3
+bus3094, 22.04, 7.81
+bus3095, 22.05, 8.32
+bus3096, 22.05, 8.83
+bus3097, 22.05, 9.34
+bus3098, 22.05, 6.13
+bus3099, 22.05, 5.56
+bus3100, 23.09, 6.8
+bus3101, 23.86, 6.8
+bus3102, 24.53, 6.8
+bus3103, 25.12, 6.8
+bus3104, 23.09, 7.52
+bus3105, 23.08, 8.08
+bus3106, 23.09, 8.67
+bus3107, 19.98, 5.54
+bus3108, 18.97, 5.54
+bus3109, 18.07, 5.54
+bus3110, 16.97, 5.54
+bus3111, 15.97, 5.54
+bus3112, 15.07, 5.54
+bus3113, 18.63, 4.76
+bus3114, 18.63, 4.15
+bus3115, 18.63, 3.53
+bus3116, 17.55, 4.75
+bus3117, 16.55, 4.76
+bus3118, 21.36, 4.03
+bus3119, 22.77, 4.03
+bus3120, 22.77, 4.69
+bus3121, 22.78, 5.34
+bus3122, 22.78, 5.96
+bus3123, 23.64, 4.04
+bus3124, 24.42, 4.04
+bus3125, 25.17, 4.04
+bus3126, 25.97, 4.04
+bus3127, 25.97, 4.58
+bus3128, 25.97, 5.12
+bus3129, 25.97, 5.66
+bus3130, 25.97, 6.2
+bus3131, 25.97, 6.75
+bus3132, 21.35, 3.22
+bus3133, 21.36, 2.41
+bus3134, 22.53, 2.41
+bus3135, 23.57, 2.41
+bus3136, 24.53, 2.41
+bus3137, 21.37, 1.79
+bus3138, 21.37, 1.16
+bus3139, 21.36, 0.53
+bus3140, 17.61, 2.5
+bus3141, 18.42, 2.48
+bus3142, 19.23, 2.48
+bus3143, 20.03, 2.49
+bus3144, 18.31, 1.11
+bus3145, 18.99, 1.11
+bus3146, 19.67, 1.11
+bus3147, 20.35, 1.11
+bus3148, 16.87, 2.48
+bus3149, 16.13, 2.48
+bus3150, 15.4, 2.48
+bus3151, 14.66, 2.48
+bus3152, 13.92, 2.48
+bus3153, 13.18, 2.48
+bus3154, 12.44, 2.49
+bus3155, 11.7, 2.49
+bus3156, 17.64, 1.11
+bus3157, 16.9, 1.11
+bus3158, 16.17, 1.11
+bus3159, 15.43, 1.11
+bus3160, 14.7, 1.11
+bus3161, 13.97, 1.11
+bus3162, 13.23, 1.11
+"""
+
+EDGE_LIST_RAW = [
+    ("bus1", "bus1001"), ("bus1001", "bus1002"), ("bus1002", "bus1003"), ("bus1002", "bus1004"),
+    ("bus1004", "bus1005"), ("bus1005", "bus1006"), ("bus1006", "bus1007"), ("bus1006", "bus1008"),
+    ("bus1008", "bus1009"), ("bus1009", "bus1010"), ("bus1009", "bus1011"), ("bus1011", "bus1012"),
+    ("bus1012", "bus1013"), ("bus1013", "bus1014"), ("bus1014", "bus1015"), ("bus1013", "bus1016"),
+    ("bus1016", "bus1017"), 
+    ("bus1", "bus2001"), ("bus2001", "bus2002"), ("bus2002", "bus2003"), ("bus2003", "bus2004"),
+    ("bus2004", "bus2005"), ("bus2005", "bus2006"), ("bus2006", "bus2007"), ("bus2007", "bus2008"),
+    ("bus2007", "bus2009"), ("bus2006", "bus2010"), ("bus2010", "bus2011"), ("bus2011", "bus2012"),
+    ("bus2013", "bus2014"), ("bus2014", "bus2015"), ("bus2014", "bus2016"), ("bus2016", "bus2017"),
+    ("bus2017", "bus2018"), ("bus2013", "bus2019"), ("bus2019", "bus2020"), ("bus2019", "bus2021"),
+    ("bus2021", "bus2022"), ("bus2022", "bus2023"), ("bus2023", "bus2024"), ("bus2024", "bus2025"),
+    ("bus2026", "bus2027"), ("bus2027", "bus2028"), ("bus2028", "bus2029"), ("bus2029", "bus2030"),
+    ("bus2030", "bus2031"), ("bus2027", "bus2032"), ("bus2032", "bus2033"), ("bus2033", "bus2034"),
+    ("bus2033", "bus2035"), ("bus2035", "bus2036"), ("bus2036", "bus2037"), ("bus2037", "bus2038"),
+    ("bus2038", "bus2039"), ("bus2039", "bus2040"), ("bus2040", "bus2041"), ("bus2039", "bus2042"),
+    ("bus2042", "bus2043"), ("bus2043", "bus2044"), ("bus2044", "bus2045"), ("bus2045", "bus2046"),
+    ("bus2045", "bus2047"), ("bus2047", "bus2048"), ("bus2044", "bus2049"), ("bus2049", "bus2050"),
+    ("bus2050", "bus2051"), ("bus2051", "bus2052"), ("bus2044", "bus2053"), ("bus2053", "bus2054"),
+    ("bus2054", "bus2055"), ("bus2055", "bus2056"), ("bus2053", "bus2057"), ("bus2057", "bus2058"),
+    ("bus2057", "bus2059"), ("bus2059", "bus2060"),
+    ("bus1", "bus3001"), ("bus3001", "bus3003"), ("bus3003", "bus3002"), ("bus3003", "bus3004"),
+    ("bus3003", "bus3005"), ("bus3005", "bus3006"), ("bus3006", "bus3007"), ("bus3005", "bus3008"),
+    ("bus3008", "bus3009"), ("bus3009", "bus3010"), ("bus3010", "bus3011"), ("bus3011", "bus3012"),
+    ("bus3008", "bus3013"), ("bus3013", "bus3014"), ("bus3008", "bus3015"), ("bus3015", "bus3016"),
+    ("bus3016", "bus3017"), ("bus3015", "bus3018"), ("bus3018", "bus3019"), ("bus3019", "bus3020"),
+    ("bus3020", "bus3021"), ("bus3015", "bus3022"), ("bus3022", "bus3023"), ("bus3023", "bus3024"),
+    ("bus3024", "bus3025"), ("bus3022", "bus3026"), ("bus3026", "bus3027"), ("bus3027", "bus3028"),
+    ("bus3028", "bus3029"), ("bus3022", "bus3030"), ("bus3030", "bus3035"), ("bus3035", "bus3036"),
+    ("bus3036", "bus3037"), ("bus3037", "bus3038"), ("bus3038", "bus3039"), ("bus3039", "bus3053"),
+    ("bus3053", "bus3054"), ("bus3053", "bus3055"), ("bus3055", "bus3056"), ("bus3056", "bus3057"),
+    ("bus3057", "bus3058"), ("bus3058", "bus3059"), ("bus3059", "bus3060"), ("bus3060", "bus3061"),
+    ("bus3055", "bus3062"), ("bus3062", "bus3063"), ("bus3063", "bus3064"), ("bus3064", "bus3065"),
+    ("bus3065", "bus3066"), ("bus3066", "bus3067"), ("bus3030", "bus3040"), ("bus3040", "bus3044"),
+    ("bus3044", "bus3045"), ("bus3040", "bus3041"), ("bus3041", "bus3042"), ("bus3042", "bus3043"),
+    ("bus3040", "bus3046"), ("bus3046", "bus3047"), ("bus3046", "bus3048"), ("bus3048", "bus3049"),
+    ("bus3049", "bus3050"), ("bus3050", "bus3051"), ("bus3051", "bus3052"), ("bus3030", "bus3031"),
+    ("bus3031", "bus3032"), ("bus3032", "bus3033"), ("bus3033", "bus3034"), ("bus3034", "bus3068"),
+    ("bus3068", "bus3069"), ("bus3069", "bus3070"), ("bus3070", "bus3071"), ("bus3071", "bus3072"),
+    ("bus3069", "bus3073"), ("bus3073", "bus3074"), ("bus3068", "bus3075"), ("bus3076", "bus3077"),
+    ("bus3077", "bus3078"), ("bus3076", "bus3079"), ("bus3079", "bus3080"), ("bus3080", "bus3081"),
+    ("bus3080", "bus3082"), ("bus3082", "bus3083"), ("bus3083", "bus3084"), ("bus3084", "bus3085"),
+    ("bus3085", "bus3086"), ("bus3086", "bus3087"), ("bus3087", "bus3088"), ("bus3088", "bus3089"),
+    ("bus3089", "bus3090"), ("bus3090", "bus3091"), ("bus3092", "bus3098"), ("bus3098", "bus3099"),
+    ("bus3092", "bus3100"), ("bus3100", "bus3101"), ("bus3101", "bus3102"), ("bus3102", "bus3103"),
+    ("bus3100", "bus3104"), ("bus3104", "bus3105"), ("bus3105", "bus3106"), ("bus3082", "bus3107"),
+    ("bus3107", "bus3108"), ("bus3108", "bus3109"), ("bus3109", "bus3110"), ("bus3110", "bus3111"),
+    ("bus3111", "bus3112"), ("bus3107", "bus3113"), ("bus3113", "bus3114"), ("bus3114", "bus3115"),
+    ("bus3113", "bus3116"), ("bus3116", "bus3117"), ("bus3107", "bus3118"), ("bus3118", "bus3119"),
+    ("bus3119", "bus3120"), ("bus3120", "bus3121"), ("bus3121", "bus3122"), ("bus3119", "bus3123"),
+    ("bus3123", "bus3124"), ("bus3124", "bus3125"), ("bus3125", "bus3126"), ("bus3126", "bus3127"),
+    ("bus3127", "bus3128"), ("bus3128", "bus3129"), ("bus3129", "bus3130"), ("bus3130", "bus3131"),
+    ("bus3118", "bus3132"), ("bus3132", "bus3133"), ("bus3133", "bus3134"), ("bus3134", "bus3135"),
+    ("bus3135", "bus3136"), ("bus3133", "bus3137"), ("bus3137", "bus3138"), ("bus3138", "bus3139"),
+    ("bus3107", "bus3140"), ("bus3140", "bus3141"), ("bus3141", "bus3142"), ("bus3142", "bus3143"),
+    ("bus3140", "bus3148"), ("bus3148", "bus3149"), ("bus3149", "bus3150"), ("bus3150", "bus3151"),
+    ("bus3151", "bus3152"), ("bus3152", "bus3153"), ("bus3153", "bus3154"), ("bus3154", "bus3155"),
+    ("bus3140", "bus3156"), ("bus3156", "bus3144"), ("bus3144", "bus3145"), ("bus3145", "bus3146"),
+    ("bus3146", "bus3147"), ("bus3156", "bus3157"), ("bus3157", "bus3158"), ("bus3158", "bus3159"),
+    ("bus3159", "bus3160"), ("bus3160", "bus3161"), ("bus3161", "bus3162")
+]
+
+TRANSFORMER_NODES = ["bus1003", "bus1004", "bus1005", "bus1006", "bus1007", "bus1008", 
+                     "bus1009", "bus1010", "bus1011", "bus1012", "bus1013", "bus1014",
+                     "bus2002", "bus2003", "bus2005", "bus2008", "bus2009", "bus2010"]
+
+# *** WEAK GRID PHYSICS: Scale distances by 5x to simulate Rural Feeder ***
+RURAL_DISTANCE_SCALE = 5.0
+
+# Spatial penetration plan: 70% of eligible buses are "Potential Solar Sites",
+# 80% Residential / 20% Commercial. Seeded so every process builds the same plan.
+SOLAR_SITE_SEED = 42
+SOLAR_SITE_FRACTION = 0.7
+RESIDENTIAL_SHARE = 0.8
+RESIDENTIAL_KW = 60.0   # 10 kW Residential (Iowa Standard)
+COMMERCIAL_KW = 250.0   # 50 kW Commercial
+
+# Buses are numbered per feeder: bus1xxx = Feeder A, bus2xxx = B, bus3xxx = C;
+# bus1 is the substation source bus.
+FEEDERS = ("A", "B", "C")
+SUBSTATION = "SUB"
+
+
+def feeder_of(bus_name):
+    """Feeder letter of a topology bus name ('bus2005' -> 'B'), SUBSTATION otherwise."""
+    digits = bus_name[3:]
+    if len(digits) == 4 and digits.isdigit() and "1" <= digits[0] <= str(len(FEEDERS)):
+        return FEEDERS[int(digits[0]) - 1]
+    return SUBSTATION
+
+
+def normalize_bus_name(col):
+    """'Bus 2002' / 'Bus1003' -> 'bus2002' / 'bus1003' (topology naming)."""
+    return str(col).strip().lower().replace(" ", "")
+
+
+def parse_bus_coords(dss_content):
+    coords = {}
+    lines = dss_content.split('\n')
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('//') or line.startswith('['): continue
+        parts = line.replace(',', ' ').split()
+        if len(parts) >= 3:
+            try:
+                b_name = parts[0].lower()
+                x = float(parts[1])
+                y = float(parts[2])
+                coords[b_name] = (x, y)
+            except: pass
+    return coords
+
+
+def _frozen_array(values):
+    arr = np.asarray(values, dtype=float)
+    arr.flags.writeable = False
+    return arr
+
+
+@dataclass(frozen=True)
+class GridNetwork:
+    """Immutable, process-wide view of the feeder topology."""
+    bus_coords: Mapping[str, Tuple[float, float]]
+    bus_list: Tuple[str, ...]
+    edges: Tuple[Tuple[str, str], ...]
+    transformer_nodes: frozenset
+    dist_map: Mapping[str, float]
+    solar_sites: Tuple[str, ...]
+    solar_capacity: Mapping[str, float]
+    bus_feeder: Tuple[str, ...]   # feeder of each bus, aligned with bus_list
+    # Cumulative capacity of the first k solar sites (index k), so the active
+    # fleet size for any penetration level is a single lookup.
+    solar_capacity_cumsum: np.ndarray
+    # Pre-built polyline coordinates for the topology plot (None = line break)
+    edge_x: Tuple
+    edge_y: Tuple
+
+    def active_site_count(self, penetration_pct):
+        return int(len(self.solar_sites) * penetration_pct / 100.0)
+
+    def active_solar_capacity(self, penetration_pct):
+        return float(self.solar_capacity_cumsum[self.active_site_count(penetration_pct)])
+
+
+def build_grid_network(coords_raw=BUS_COORDS_RAW, edge_list=EDGE_LIST_RAW, transformer_nodes=TRANSFORMER_NODES):
+    """Parses the raw topology and derives all static network structures."""
+    bus_dict = parse_bus_coords(coords_raw)
+    bus_list = tuple(bus_dict.keys())
+
+    source_x, source_y = bus_dict['bus1']
+    d_map = {}
+    for b_name, (bx, by) in bus_dict.items():
+        dist = np.sqrt((bx - source_x)**2 + (by - source_y)**2)
+        d_map[b_name] = float(dist * RURAL_DISTANCE_SCALE)
+
+    # Local RNG: same plan as the old global random.seed(42) without
+    # reseeding the interpreter-wide generator on every rerun.
+    rng = random.Random(SOLAR_SITE_SEED)
+    eligible = [b for b in bus_list if b not in transformer_nodes and b != "bus1"]
+    solar_sites = tuple(rng.sample(eligible, k=int(len(bus_list) * SOLAR_SITE_FRACTION)))
+    solar_capacity = {}
+    for site in solar_sites:
+        solar_capacity[site] = RESIDENTIAL_KW if rng.random() < RESIDENTIAL_SHARE else COMMERCIAL_KW
+    cumsum = np.concatenate(([0.0], np.cumsum([solar_capacity[s] for s in solar_sites])))
+
+    edge_x, edge_y = [], []
+    for u, v in edge_list:
+        if u in bus_dict and v in bus_dict:
+            x0, y0 = bus_dict[u]
+            x1, y1 = bus_dict[v]
+            edge_x.extend((x0, x1, None))
+            edge_y.extend((y0, y1, None))
+
+    return GridNetwork(
+        bus_coords=MappingProxyType(bus_dict),
+        bus_list=bus_list,
+        edges=tuple(tuple(e) for e in edge_list),
+        transformer_nodes=frozenset(transformer_nodes),
+        dist_map=MappingProxyType(d_map),
+        solar_sites=solar_sites,
+        solar_capacity=MappingProxyType(solar_capacity),
+        bus_feeder=tuple(feeder_of(b) for b in bus_list),
+        solar_capacity_cumsum=_frozen_array(cumsum),
+        edge_x=tuple(edge_x),
+        edge_y=tuple(edge_y),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_grid_network():
+    """Module singleton for headless callers (benchmarks, batch tools)."""
+    return build_grid_network()
@@ -0,0 +1,1032 @@
+"""
+GRID PHYSICS CORE
+The twin's per-tick physics without any Streamlit dependency: swing equation
+and transformer thermal model, PV / BESS / smart-inverter models, the
+voltage-drop profile, WLS state estimation and protection (recloser, IEC
+relay curve, sequence components).
+
+Every function that reads or changes simulation state takes the mutable
+`state` (a GridState) explicitly. tick() advances the whole grid by one step
+and leaves everything a view needs on the state (totals, the monitored
+feeder panel, per-bus voltages and flows), so the shared engine thread
+(sim_engine.py) can publish it as one snapshot and dashboard sessions only
+render.
+"""
+import cmath
+import datetime
+from dataclasses import dataclass
+from typing import Mapping
+
+import numpy as np
+
+from grid_network import FEEDERS, GridNetwork, normalize_bus_name
+from mpc_controller import BESS_CAPACITY_KWH, BESS_MAX_POWER, VOLTAGE_SENSITIVITY_CONST
+
+# SYSTEM PARAMETERS
+NOMINAL_FREQ = 50.0
+TRANSFORMER_RATING_KVA = 10000.0
+TRANSFORMER_TAU = 20.0
+SOURCE_IMPEDANCE = 0.05 + 0.1j
+
+# *** WEAK GRID PHYSICS: High Impedance to allow Voltage Instability ***
+LINE_IMPEDANCE_PER_UNIT_DIST = 0.05 + 0.05j
+
+# SWING EQUATION CONSTANTS
+INERTIA_H = 5.0
+DAMPING_D = 1.0
+SYSTEM_BASE_MVA = 10.0
+
+# PV MODEL
+NOCT = 45.0  # Nominal Operating Cell Temperature
+TEMP_COEFF = -0.0041 # -0.41% / deg C
+STC_TEMP = 25.0
+CLOUD_SHADING_FACTOR = 0.3
+
+A_OPERATOR = cmath.rect(1.0, np.deg2rad(120))
+A2_OPERATOR = A_OPERATOR * A_OPERATOR
+
+FAULT_LIBRARY = {
+    "L-G (Line-to-Ground)":   {"Zf": 0.0, "type": "LG", "color": "#ff9100", "icon": "⚡"},
+    "L-L (Line-to-Line)":     {"Zf": 0.01, "type": "LL", "color": "#ff5500", "icon": "🔥"},
+    "L-L-G (2-Line-Ground)":  {"Zf": 0.0, "type": "LLG", "color": "#ff0000", "icon": "💥"},
+    "L-L-L (3-Phase Bolted)": {"Zf": 0.0, "type": "LLL", "color": "#ff0055", "icon": "☠️"}
+}
+
+PLOT_HISTORY = 50
+
+# Compact mode: plot histories keep at least a week of hourly points and the
+# audit log its last COMPACT_AUDIT events. Trimming happens once a list holds
+# twice that, so it is amortized and a history's length still only drops at
+# a trim (telemetry_codec reads a shorter history as a reset).
+COMPACT_HISTORY = 168
+COMPACT_AUDIT = 500
+HISTORY_FIELDS = ("history_tap", "history_cap", "history_se_meas", "history_se_est", "history_se_j",
+                  "solar_p_history", "solar_q_history", "solar_v_history", "solar_irr_history",
+                  "solar_temp_history", "global_v_history", "global_pf_history", "global_j_history")
+
+
+# ----------------------------------------------------------
+# STATE & PLANT
+# ----------------------------------------------------------
+class GridState:
+    """Mutable simulation state (the former per-session physics variables)."""
+    def __init__(self, fault_bus="", monitored_bus="", seed=None):
+        self.idx = 0
+        # Every random draw of the simulation (SCADA noise, PV jitter,
+        # synthetic loads) comes from this generator, so a run replays
+        # exactly from a checkpoint whatever other threads draw meanwhile
+        self.rng = np.random.default_rng(seed)
+        self.run_simulation = False
+        self.speed = 1.0
+
+        # SWING EQUATION STATE VECTORS
+        self.grid_freq = 50.0
+        self.rotor_angle = 0.0
+        self.mech_power = 5000.0
+        self.transformer_thermal = 40.0
+
+        self.fault_active = False
+        self.fault_bus = fault_bus
+        self.fault_type = "L-G (Line-to-Ground)"
+        self.recloser_state = "CLOSED"
+        self.recloser_timer = 0.0
+        self.relay_trip = False
+        self.relay_accumulator = 0.0
+
+        self.capacitor_bank_kvAr = 0.0
+        self.apfc_auto_mode = False
+        self.tap_position = 1.0
+        self.auto_tap_mode = False
+        self.tap_moves_count = 0
+
+        self.mpc_active = False
+        self.mpc_bess_power_cmd = 0.0
+        self.mpc_curtailment = 0.0
+        self.mpc_stochastic = False
+        self.fdi_attack = False
+        self.cloud_shading = False
+        self.bess_soc = 50.0
+        self.bess_active = False
+        self.spatial_penetration_pct = 10
+        self.enable_smart_inverter = False
+
+        self.room_temp = 28.0
+        self.hvac_on = False
+        self.hvac_setpoint = 24.0
+        self.hvac_load_kw = 0.0
+
+        self.prev_p = 0.0
+        self.prev_q = 0.0
+        self.prev_feeder_p = 0.0
+        # Feeder panel (AVR / APFC / relay / SE) runs on this bus
+        self.monitored_bus = monitored_bus
+        self.audit_log = []
+        # Cap the histories and audit log (long shifts; see trim_histories)
+        self.compact_histories = False
+        # Bumped whenever the histories are replaced rather than appended to
+        # (restart, timeline seek), so delta streams resend them whole
+        self.history_epoch = 0
+        self.reset_histories()
+
+        # Per-tick outputs for the views (see tick)
+        self.p_load_total = 0.0
+        self.total_pv_gen = 0.0
+        self.p_bess = 0.0
+        self.bess_mode = "OFFLINE"
+        self.p_grid_net = 0.0
+        self.q_val = 0.0
+        self.delta_p = 0.0
+        self.delta_q = 0.0
+        self.feeder = {}
+        self.bus_v = self.bus_i = self.bus_p = self.bus_q = self.bus_pv = None
+        # Per-feeder totals of the bus arrays, aligned with grid_network.FEEDERS
+        self.feeder_load = self.feeder_load_q = self.feeder_pv = None
+
+    def reset_histories(self):
+        self.history_tap = [1.0] * PLOT_HISTORY
+        self.history_cap = [0.0] * 24
+        self.history_se_meas = [1.0] * PLOT_HISTORY
+        self.history_se_est = [1.0] * PLOT_HISTORY
+        self.history_se_j = [0.0] * PLOT_HISTORY
+        self.solar_p_history = [0.0] * PLOT_HISTORY
+        self.solar_q_history = [0.0] * PLOT_HISTORY
+        self.solar_v_history = [1.0] * PLOT_HISTORY
+        self.solar_irr_history = [0.0] * PLOT_HISTORY
+        self.solar_temp_history = [25.0] * PLOT_HISTORY
+        self.global_v_history = [1.0] * PLOT_HISTORY
+        self.global_pf_history = [0.95] * PLOT_HISTORY
+        self.global_j_history = [0.0] * PLOT_HISTORY
+
+
+@dataclass(frozen=True)
+class Plant:
+    """Static inputs of the simulation: topology, replay data, per-bus lookups."""
+    network: GridNetwork
+    total_p: np.ndarray                # (hours,) feeder head active power
+    total_q: np.ndarray                # (hours,) feeder head reactive power
+    feeder_p: Mapping[str, np.ndarray] # metered bus -> (hours,) kW
+    feeder_q: Mapping[str, np.ndarray] # metered bus -> (hours,) kVAR (measured, or P at the fixed ratio)
+    solar_profile: np.ndarray          # irradiance (0-1), wraps
+    # Aligned with network.bus_list
+    bus_dist: np.ndarray               # electrical distance, floored like the voltage model
+    bus_metered: np.ndarray            # bool: bus has a metered column
+    bus_meter_rows: np.ndarray         # (hours, buses) metered P (0 where unmetered)
+    bus_meter_q: np.ndarray            # (hours, buses) metered Q (0 where unmetered)
+    bus_base_load: np.ndarray          # synthetic base load for unmetered buses
+    bus_feeder_idx: np.ndarray         # position in FEEDERS, len(FEEDERS) for the substation
+    bus_is_xfmr: np.ndarray
+    bus_site_rank: np.ndarray          # position in network.solar_sites, or len(sites)
+    site_capacity: np.ndarray          # (sites,) kW, in network.solar_sites order
+    # (hours, FEEDERS) metered load per feeder, for history views
+    feeder_hourly_p: np.ndarray
+    feeder_hourly_q: np.ndarray
+
+
+def build_plant(network, total_p, total_q, feeder_p, solar_profile, feeder_q=None):
+    """
+    Bundles the replay data with per-bus arrays for vectorized solves.
+    feeder_p / feeder_q: {column name: values} (feeder_data.FeederData.columns);
+    a bus is metered when its name ('Bus 2002' or 'bus2002') is a P column, and
+    metered buses without a Q column draw Q at 0.4 x P. The tables are laid out
+    hour-major so a tick reads one contiguous row however many buses are metered.
+    """
+    buses = network.bus_list
+    feeder_p = {normalize_bus_name(k): np.asarray(v, dtype=float) for k, v in feeder_p.items()}
+    feeder_q = {normalize_bus_name(k): np.asarray(v, dtype=float) for k, v in (feeder_q or {}).items()}
+    n_hours = len(total_p)
+    hours = np.arange(n_hours)
+    meter_rows = np.zeros((n_hours, len(buses)))
+    meter_q = np.zeros((n_hours, len(buses)))
+    metered = np.zeros(len(buses), dtype=bool)
+    for j, bus in enumerate(buses):
+        col = feeder_p.get(bus)
+        if col is None:
+            continue
+        meter_rows[:, j] = col[hours % len(col)]
+        q_col = feeder_q.get(bus)
+        meter_q[:, j] = q_col[hours % len(q_col)] if q_col is not None else meter_rows[:, j] * 0.4
+        metered[j] = True
+    feeder_idx = np.array([FEEDERS.index(f) if f in FEEDERS else len(FEEDERS) for f in network.bus_feeder],
+                          dtype=np.intp)
+    membership = (feeder_idx[:, None] == np.arange(len(FEEDERS))).astype(float)
+    hourly_p, hourly_q = meter_rows @ membership, meter_q @ membership
+    for arr in (meter_rows, meter_q, hourly_p, hourly_q):
+        arr.flags.writeable = False
+    dist = np.array([network.dist_map.get(b, 1.0) for b in buses])
+    rank = {b: k for k, b in enumerate(network.solar_sites)}
+    return Plant(
+        network=network,
+        total_p=np.asarray(total_p, dtype=float),
+        total_q=np.asarray(total_q, dtype=float),
+        # Column views of the tables: one copy of the data, trimmed to the topology's buses
+        feeder_p={b: meter_rows[:, j] for j, b in enumerate(buses) if metered[j]},
+        feeder_q={b: meter_q[:, j] for j, b in enumerate(buses) if metered[j]},
+        solar_profile=np.asarray(solar_profile, dtype=float),
+        bus_dist=np.where(dist < 0.1, 0.5, dist),
+        bus_metered=metered,
+        bus_meter_rows=meter_rows,
+        bus_meter_q=meter_q,
+        bus_base_load=np.array([80.0 if "30" in b else 50.0 for b in buses]),
+        bus_feeder_idx=feeder_idx,
+        bus_is_xfmr=np.array([b in network.transformer_nodes for b in buses]),
+        bus_site_rank=np.array([rank.get(b, len(network.solar_sites)) for b in buses]),
+        site_capacity=np.array([network.solar_capacity[s] for s in network.solar_sites]),
+        feeder_hourly_p=hourly_p,
+        feeder_hourly_q=hourly_q,
+    )
+
+
+def log_event(state, event, e_type, details):
+    state.audit_log.append({
+        "Timestamp": datetime.datetime.now().strftime("%H:%M:%S.%f")[:-3],
+        "Event": event,
+        "Type": e_type,
+        "Details": details
+    })
+
+
+def restart(state):
+    """Operator hard reboot: clock, protection, machine and plot state back to defaults."""
+    state.idx = 0
+    state.relay_trip = False
+    state.fault_active = False
+    state.recloser_state = "CLOSED"
+    state.transformer_thermal = 40.0
+    state.grid_freq = 50.0
+    state.rotor_angle = 0.0
+    state.mech_power = 5000.0
+    state.fdi_attack = False
+    state.bess_soc = 50.0
+    state.enable_smart_inverter = False
+    state.tap_moves_count = 0
+    state.reset_histories()
+    state.history_epoch += 1
+    state.audit_log = []
+    log_event(state, "System", "Reset", "Hard Reboot Initiated")
+
+
+# ----------------------------------------------------------
+# PROTECTION & SEQUENCE COMPONENTS
+# ----------------------------------------------------------
+def calculate_iec_trip_time(current_pu, tms=0.5):
+    if current_pu <= 1.0: return None
+    k = 0.14
+    alpha = 0.02
+    denominator = (current_pu ** alpha) - 1
+    if abs(denominator) < 1e-5: return 9999.0
+    return tms * (k / denominator)
+
+def compute_symmetrical_components_physics(fault_type, V_prefault=1.0, Z1=0.2, Z2=0.2, Z0=0.6, Zf=0.0):
+    if fault_type == "L-G (Line-to-Ground)":
+        denom = Z1 + Z2 + Z0 + 3*Zf
+        if denom == 0: denom = 0.001
+        I_seq = V_prefault / denom
+        return I_seq, I_seq, I_seq
+    elif fault_type == "L-L (Line-to-Line)":
+        denom = Z1 + Z2 + Zf
+        if denom == 0: denom = 0.001
+        I1 = V_prefault / denom
+        return abs(I1), abs(I1), 0.0
+    elif fault_type == "L-L-G (2-Line-Ground)":
+        denom = Z1 + ((Z2 * Z0) / (Z2 + Z0))
+        if denom == 0: denom = 0.001
+        I1 = V_prefault / denom
+        I2 = abs(I1 * (Z0 / (Z2 + Z0)))
+        I0 = abs(I1 * (Z2 / (Z2 + Z0)))
+        return abs(I1), I2, I0
+    elif fault_type == "L-L-L (3-Phase Bolted)":
+        denom = Z1 + Zf
+        if denom == 0: denom = 0.001
+        I1 = V_prefault / denom
+        return I1, 0.0, 0.0
+    return 0.0, 0.0, 0.0
+
+def convert_seq_to_phase(I0, I1, I2):
+    i0_c = complex(I0, 0)
+    i1_c = complex(I1, 0)
+    i2_c = complex(I2, 0)
+    ia = i0_c + i1_c + i2_c
+    ib = i0_c + (A2_OPERATOR * i1_c) + (A_OPERATOR * i2_c)
+    ic = i0_c + (A_OPERATOR * i1_c) + (A2_OPERATOR * i2_c)
+    return abs(ia), np.degrees(cmath.phase(ia)), abs(ib), np.degrees(cmath.phase(ib)), abs(ic), np.degrees(cmath.phase(ic))
+
+def recloser_logic(state):
+    rec = state.recloser_state
+    if state.fault_active:
+        if rec == "CLOSED":
+            state.recloser_state = "TRIPPED"
+            state.relay_trip = True
+            state.recloser_timer = 0
+            log_event(state, "Protection", "Trip", "Recloser: Instantaneous Trip")
+        elif rec == "TRIPPED":
+            state.recloser_state = "WAITING"
+        elif rec == "WAITING":
+            state.recloser_timer += 1
+            if state.recloser_timer > 5:
+                state.recloser_state = "RECLOSE"
+        elif rec == "RECLOSE":
+            state.relay_trip = False
+            if state.fault_active:
+                log_event(state, "Protection", "Reclose", "Reclose Attempt Failed - Fault Persistent")
+                state.recloser_state = "LOCKOUT"
+                state.relay_trip = True
+            else:
+                log_event(state, "Protection", "Reclose", "Reclose Successful")
+                state.recloser_state = "CLOSED"
+        elif rec == "LOCKOUT":
+            state.relay_trip = True
+
+
+# ----------------------------------------------------------
+# NETWORK PHYSICS
+# ----------------------------------------------------------
+def calculate_voltage_profile(plant, bus_name, p_load_kw, q_load_kvar, tap_pos, p_gen_kw=0.0, q_gen_kvar=0.0):
+    """
+    AGGRESSIVE PHYSICS: Calculates Voltage Drop/Rise with high sensitivity.
+    """
+    # 1. Get Distance (simulate long feeders)
+    dist = plant.network.dist_map.get(bus_name, 1.0)
+    if dist < 0.1: dist = 0.5 # Minimum distance to ensure impedance
+
+    # 2. Net Power (Generation is NEGATIVE load)
+    p_net = p_load_kw - p_gen_kw
+    q_net = q_load_kvar - q_gen_kvar
+
+    # 3. Weak Grid Impedance: Z_total = Unit_Z * Distance
+    r_line = LINE_IMPEDANCE_PER_UNIT_DIST.real * dist
+    x_line = LINE_IMPEDANCE_PER_UNIT_DIST.imag * dist
+
+    # 4. Voltage Drop Approximation (The "K-Factor" Approach)
+    # V_drop ~= (P*R + Q*X) / V_base; negative P (Solar > Load) -> Voltage RISE.
+    voltage_deviation = (p_net * r_line + q_net * x_line) / VOLTAGE_SENSITIVITY_CONST
+
+    # 5. Tap Changer Effect: the tap position directly scales the source voltage
+    v_final = tap_pos - voltage_deviation
+    return abs(v_final)
+
+def update_grid_physics(state, current_p, current_q):
+    """2ND ORDER SWING EQUATION + GOVERNOR CONTROL"""
+    H_const = INERTIA_H
+    f0 = NOMINAL_FREQ
+    M = 2 * H_const / (2 * np.pi * f0)
+    D = DAMPING_D
+    curr_freq = state.grid_freq
+    curr_delta = state.rotor_angle
+    curr_Pm = state.mech_power
+
+    Pe_pu = current_p / (SYSTEM_BASE_MVA * 1000.0)
+    governor_response = (50.0 - curr_freq) * 0.5
+    curr_Pm += governor_response * 100.0
+    Pm_pu = curr_Pm / (SYSTEM_BASE_MVA * 1000.0)
+
+    w_dev = 2 * np.pi * (curr_freq - 50.0)
+    accel = (Pm_pu - Pe_pu - (D * w_dev)) / M
+    dt = 0.05
+
+    df_dt = accel / (2 * np.pi)
+    new_freq = curr_freq + (df_dt * dt)
+    new_delta = curr_delta + (2 * np.pi * (new_freq - 50.0) * dt)
+
+    state.grid_freq = new_freq
+    state.rotor_angle = new_delta
+    state.mech_power = curr_Pm
+
+    # Thermal
+    s_load = np.sqrt(current_p**2 + current_q**2)
+    loading_pct = s_load / TRANSFORMER_RATING_KVA
+    t_ambient = state.room_temp
+    t_rise_max = 65.0
+    t_ultimate = t_ambient + (t_rise_max * (loading_pct ** 2))
+    tau = TRANSFORMER_TAU
+    state.transformer_thermal += (1.0 / tau) * (t_ultimate - state.transformer_thermal)
+
+    return state.grid_freq, state.transformer_thermal
+
+def apply_scada_noise(val, sigma=0.015, rng=None):
+    """Measurement noise; the simulation passes its state.rng, displays may use the global RNG."""
+    return val + (np.random if rng is None else rng).normal(0, sigma)
+
+
+# --- REAL GAUSS-NEWTON WLS STATE ESTIMATOR ---
+class StateEstimator:
+    def __init__(self, R_line, X_line):
+        self.R = R_line
+        self.X = X_line
+
+    def solve(self, z, V_source=1.0):
+        # Initial State Guess (Flat Start)
+        x = np.array([1.0, 0.0]) # [V, delta]
+
+        # Weights (Inverse of Variance): we trust Voltage more than Power
+        W = np.diag([10000.0, 100.0, 100.0])
+
+        max_iter = 10
+        tol = 1e-4
+
+        for i in range(max_iter):
+            V, delta = x[0], x[1]
+
+            # 1. Measurement Function h(x)
+            V_c = cmath.rect(V, delta)
+            V_s = complex(V_source, 0)
+            Z = complex(self.R, self.X)
+            I_c = (V_s - V_c) / Z
+            S_c = V_c * I_c.conjugate()
+
+            h_val = np.array([
+                V,          # V_meas
+                S_c.real,   # P_meas
+                S_c.imag    # Q_meas
+            ])
+
+            # 2. Residual
+            r = z - h_val
+
+            # Check convergence
+            if np.max(np.abs(r)) < tol:
+                break
+
+            # 3. Jacobian H = dh/dx
+            epsilon = 1e-5
+
+            # Perturb V
+            V_p = V + epsilon
+            V_c_p = cmath.rect(V_p, delta)
+            I_c_p = (V_s - V_c_p) / Z
+            S_c_p = V_c_p * I_c_p.conjugate()
+            h_p_V = np.array([V_p, S_c_p.real, S_c_p.imag])
+            col_V = (h_p_V - h_val) / epsilon
+
+            # Perturb Delta
+            d_p = delta + epsilon
+            V_c_d = cmath.rect(V, d_p)
+            I_c_d = (V_s - V_c_d) / Z
+            S_c_d = V_c_d * I_c_d.conjugate()
+            h_p_d = np.array([V, S_c_d.real, S_c_d.imag])
+            col_d = (h_p_d - h_val) / epsilon
+
+            H = np.column_stack((col_V, col_d))
+
+            # 4. Gain Matrix G = H^T W H
+            G = H.T @ W @ H
+
+            # 5. Solve Step: dx = G^-1 H^T W r
+            rhs = H.T @ W @ r
+            try:
+                dx = np.linalg.solve(G, rhs)
+                x = x + dx
+            except:
+                break # Singular matrix protection
+
+        # Chi-Square Calculation (Cost Function)
+        J = np.dot(r.T, np.dot(W, r))
+        return x[0], J
+
+def wls_estimate_batch(R, X, z, V_source=1.0, max_iter=10, tol=1e-4):
+    """
+    StateEstimator.solve for many buses at once: R, X are (n,) line
+    impedances, z is (n, 3) [V pu, P MW, Q MVAr]. Same flat start, weights,
+    finite-difference Jacobian and stopping rule per bus; returns (est_v, J).
+    """
+    R, X = np.asarray(R, dtype=float), np.asarray(X, dtype=float)
+    z = np.asarray(z, dtype=float)
+    n = len(z)
+    w = np.array([10000.0, 100.0, 100.0])
+    Z = R + 1j * X
+    V_s = complex(V_source, 0)
+    V, delta = np.ones(n), np.zeros(n)
+    r_final = np.zeros((n, 3))
+    active = np.ones(n, dtype=bool)
+    epsilon = 1e-5
+
+    def h(V, delta):
+        V_c = V * np.exp(1j * delta)
+        S_c = V_c * np.conj((V_s - V_c) / Z[active])
+        return np.column_stack((V, S_c.real, S_c.imag))
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        Va, da = V[active], delta[active]
+        h_val = h(Va, da)
+        r = z[active] - h_val
+        r_final[active] = r
+        done = np.max(np.abs(r), axis=1) < tol
+        col_V = (h(Va + epsilon, da) - h_val) / epsilon
+        col_d = (h(Va, da + epsilon) - h_val) / epsilon
+        # G = H^T W H and rhs = H^T W r for every bus (2x2 systems)
+        g11 = (col_V * w * col_V).sum(1)
+        g12 = (col_V * w * col_d).sum(1)
+        g22 = (col_d * w * col_d).sum(1)
+        b1 = (col_V * w * r).sum(1)
+        b2 = (col_d * w * r).sum(1)
+        det = g11 * g22 - g12 * g12
+        # Converged buses stop here; singular ones stop like the scalar solver's except
+        step = ~done & (det != 0)
+        safe = np.where(step, det, 1.0)
+        idx = np.flatnonzero(active)
+        V[idx[step]] += ((g22 * b1 - g12 * b2) / safe)[step]
+        delta[idx[step]] += ((g11 * b2 - g12 * b1) / safe)[step]
+        active[idx[~step]] = False
+
+    J = (r_final * w * r_final).sum(1)
+    return V, J
+
+
+def run_wls_state_estimation(state, plant, measured_v_pu, measured_p_kw, measured_q_kvar, bus_name):
+    dist = plant.network.dist_map.get(bus_name, 1.0)
+    if dist < 1e-6: dist = 1e-6
+    R_total = LINE_IMPEDANCE_PER_UNIT_DIST.real * dist
+    X_total = LINE_IMPEDANCE_PER_UNIT_DIST.imag * dist
+
+    # --- CYBER ATTACK LOGIC (BAD DATA INJECTION) ---
+    if state.fdi_attack:
+        measured_v_pu += 0.15 # Inject false bias
+
+    se = StateEstimator(R_total, X_total)
+    z = np.array([measured_v_pu, measured_p_kw / 1000.0, measured_q_kvar / 1000.0])
+    est_v, chi_sq = se.solve(z, V_source=state.tap_position)
+    residual = abs(measured_v_pu - est_v)
+    return est_v, residual, chi_sq
+
+
+# ----------------------------------------------------------
+# SOLAR, BESS & SMART INVERTER LOGIC
+# ----------------------------------------------------------
+def get_solar_contribution(plant, idx):
+    """
+    Returns irradiance (0-1) from the uploaded solar data.
+    """
+    if plant.solar_profile is not None and len(plant.solar_profile) > 0:
+        return plant.solar_profile[idx % len(plant.solar_profile)]
+    # Fallback to bell curve if no profile was loaded
+    h = (idx % 24)
+    if h < 6 or h >= 19: return 0.0
+    elif 6 <= h < 10: return 0.25 * (h - 5)
+    elif 10 <= h < 15: return 1.0
+    elif 15 <= h < 19: return 1.0 - (0.25 * (h - 15))
+    return 0.0
+
+def _pv_cell_model(irradiance, ambient_temp):
+    t_cell = ambient_temp + ((NOCT - 20.0) / 0.8) * irradiance
+    temp_loss_factor = np.clip(1.0 + (TEMP_COEFF * (t_cell - STC_TEMP)), 0.5, 1.2)
+    return t_cell, temp_loss_factor
+
+def calculate_pv_physics(state, plant, bus_name, idx, curtailment_factor=0.0, rng=None):
+    """
+    PV output of one bus: (kW, cell temp, irradiance). Only the active part of
+    the solar site plan (spatial penetration) generates; 'curtailment_factor'
+    (0.0 to 1.0) is the MPC's proactive power cut. Noise comes from `rng`
+    (default: the run's state.rng).
+    """
+    net = plant.network
+    if bus_name not in net.solar_sites[:net.active_site_count(state.spatial_penetration_pct)]:
+        return 0.0, state.room_temp, 0.0
+    capacity = net.solar_capacity.get(bus_name, 10.0)
+    irradiance = get_solar_contribution(plant, idx) # "Suns"
+    if state.cloud_shading:
+        irradiance *= CLOUD_SHADING_FACTOR # 70% Drop
+    t_cell, temp_loss_factor = _pv_cell_model(irradiance, state.room_temp)
+    p_gen_final = capacity * irradiance * temp_loss_factor * (1.0 - curtailment_factor)
+    noise = (state.rng if rng is None else rng).uniform(0.98, 1.02)
+    return p_gen_final * noise, t_cell, irradiance
+
+def pv_fleet_output(state, plant, idx, curtailment_factor=0.0, rng=None):
+    """(active sites,) PV output in solar-site order: calculate_pv_physics for the whole fleet at once."""
+    k = plant.network.active_site_count(state.spatial_penetration_pct)
+    irradiance = get_solar_contribution(plant, idx)
+    if state.cloud_shading:
+        irradiance *= CLOUD_SHADING_FACTOR
+    _, temp_loss_factor = _pv_cell_model(irradiance, state.room_temp)
+    p_gen = plant.site_capacity[:k] * (irradiance * temp_loss_factor * (1.0 - curtailment_factor))
+    return p_gen * (state.rng if rng is None else rng).uniform(0.98, 1.02, size=k)
+
+def pv_fleet_potential(state, plant, idx):
+    """Noise-free, uncurtailed output of the active PV fleet (kW): what curtailment is measured against."""
+    k = plant.network.active_site_count(state.spatial_penetration_pct)
+    irradiance = get_solar_contribution(plant, idx)
+    if state.cloud_shading:
+        irradiance *= CLOUD_SHADING_FACTOR
+    _, temp_loss_factor = _pv_cell_model(irradiance, state.room_temp)
+    return float(plant.site_capacity[:k].sum() * irradiance * temp_loss_factor)
+
+def smart_inverter_logic(v_pu, p_available_kw, capacity_kw):
+    """
+    IEEE 1547 compliant Smart Inverter Functions
+    """
+    p_out = p_available_kw
+    q_out = 0.0
+    status = []
+
+    # Volt-Watt
+    if v_pu > 1.05:
+        curtail_factor = max(0.0, 1.0 - (v_pu - 1.05) * 10) # Slope
+        p_out *= curtail_factor
+        status.append(f"VW-Curtail: {int((1-curtail_factor)*100)}%")
+
+    # Volt-VAR
+    if v_pu > 1.02:
+        # Absorb Inductive (Negative Q) to lower voltage
+        q_req = -1.0 * capacity_kw * (v_pu - 1.02) * 5
+        q_out = max(q_req, -0.44 * capacity_kw) # Cap at 0.44 pf
+        status.append("VV-Absorbing")
+    elif v_pu < 0.98:
+        # Inject Capacitive (Positive Q) to raise voltage
+        q_req = capacity_kw * (0.98 - v_pu) * 5
+        q_out = min(q_req, 0.44 * capacity_kw)
+        status.append("VV-Injecting")
+
+    return p_out, q_out, ", ".join(status)
+
+def bess_dispatch_logic(state, net_load_kw):
+    if not state.bess_active:
+        return 0.0, "OFFLINE"
+
+    # --- MPC OVERRIDE ---
+    if state.mpc_active:
+        cmd = state.mpc_bess_power_cmd
+        soc = state.bess_soc
+        if cmd < 0 and soc >= 98.0: cmd = 0.0 # Safety top-off
+        if cmd > 0 and soc <= 5.0: cmd = 0.0  # Safety bottom-out
+
+        status = "MPC CONTROL"
+        if cmd < -1.0: status = "MPC CHARGING"
+        elif cmd > 1.0: status = "MPC DISCHARGING"
+        return cmd, status
+
+    # --- IMPROVED RULE BASED LOGIC ---
+    soc = state.bess_soc
+    p_cmd = 0.0
+    status = "IDLE"
+
+    # Dynamic Thresholds (Assumes 5000kW is "Average")
+    PEAK_THRESHOLD = 5200.0
+    EXCESS_SOLAR_THRESHOLD = 2000.0 # If load drops below this, we likely have high solar
+
+    # 1. Charging Logic (Solar Soak)
+    # Charge if net load is negative (Reverse flow) OR very low (Surplus gen)
+    if net_load_kw < EXCESS_SOLAR_THRESHOLD:
+        if soc < 95.0:
+            # Charge harder if we have reverse flow (negative load)
+            target_charge = 1500.0 if net_load_kw > 0 else 3000.0
+            p_cmd = -min(target_charge, BESS_MAX_POWER)
+            status = "CHARGING (Solar Soak)"
+        else:
+            status = "IDLE (Fully Charged)"
+
+    # 2. Discharging Logic (Peak Shaving)
+    elif net_load_kw > PEAK_THRESHOLD:
+        if soc > 20.0:
+            # Only discharge what is needed to bring load down to threshold
+            needed = net_load_kw - PEAK_THRESHOLD
+            p_cmd = min(needed, BESS_MAX_POWER)
+            status = f"DISCHARGING (Shaving {p_cmd:.0f}kW)"
+        else:
+            status = "IDLE (Low Battery)"
+
+    return p_cmd, status
+
+def hvac_step(state):
+    """Zone temperature and HVAC compressor load (thermostat with 1 degree deadband)."""
+    ambient_temp = 35.0
+    insulation_factor = 0.05
+    cooling_power_per_degree = 0.4
+    temp_diff = max(0, state.room_temp - state.hvac_setpoint)
+    impact_kw = temp_diff * 1.5 if state.hvac_on else 0.0
+    if state.hvac_on:
+        state.room_temp -= cooling_power_per_degree
+        state.hvac_load_kw = 15.0 + impact_kw
+    else:
+        if state.room_temp < ambient_temp:
+            state.room_temp += insulation_factor
+        state.hvac_load_kw = 0.0
+    if state.room_temp > (state.hvac_setpoint + 1.0): state.hvac_on = True
+    elif state.room_temp < (state.hvac_setpoint - 1.0): state.hvac_on = False
+
+
+# ----------------------------------------------------------
+# PER-TICK SOLVES
+# ----------------------------------------------------------
+def solve_network(state, plant, idx, site_pv, rng=None):
+    """
+    Per-bus load, PV, voltage and current for every bus at once (the topology
+    view), plus their per-feeder totals. Unmetered buses get the synthetic
+    daily load (noise from `rng`, default state.rng); PV comes from the fleet
+    output of this tick.
+    """
+    n = len(plant.network.bus_list)
+    row = idx % len(plant.bus_meter_rows)
+    p_kw = np.where(plant.bus_metered, plant.bus_meter_rows[row],
+                    plant.bus_base_load + 10 * np.sin(idx * 0.1) + (state.rng if rng is None else rng).uniform(-2, 2, size=n))
+    q_kvar = np.where(plant.bus_metered, plant.bus_meter_q[row], p_kw * 0.3)
+    padded = np.append(site_pv, np.zeros(len(plant.site_capacity) - len(site_pv) + 1))
+    pv_out = padded[np.minimum(plant.bus_site_rank, len(padded) - 1)]
+
+    r_line = LINE_IMPEDANCE_PER_UNIT_DIST.real * plant.bus_dist
+    x_line = LINE_IMPEDANCE_PER_UNIT_DIST.imag * plant.bus_dist
+    p_net = p_kw - pv_out
+    v_pu = np.abs(state.tap_position - (p_net * r_line + q_kvar * x_line) / VOLTAGE_SENSITIVITY_CONST)
+    i_amps = np.where(plant.bus_is_xfmr, 0.0, np.sqrt(p_net**2 + q_kvar**2) / (0.208 * 1.732))
+    k = len(FEEDERS)
+    feeder_load, feeder_load_q, feeder_pv = (
+        np.bincount(plant.bus_feeder_idx, weights=w, minlength=k + 1)[:k] for w in (p_kw, q_kvar, pv_out))
+    for arr in (p_kw, q_kvar, pv_out, v_pu, i_amps, feeder_load, feeder_load_q, feeder_pv):
+        arr.flags.writeable = False
+    state.bus_p, state.bus_q, state.bus_pv, state.bus_v, state.bus_i = p_kw, q_kvar, pv_out, v_pu, i_amps
+    state.feeder_load, state.feeder_load_q, state.feeder_pv = feeder_load, feeder_load_q, feeder_pv
+
+def _feeder_sources(state, plant, bus, idx, rng):
+    """Load and PV of one bus with the smart inverter's response, and its voltage at the present tap."""
+    net = plant.network
+    col = plant.feeder_p.get(bus)
+    raw_p = col[idx % len(col)] if col is not None else 45.0 + rng.uniform(-5, 5)
+    display_p = raw_p
+    display_q = plant.feeder_q[bus][idx % len(col)] if col is not None else raw_p * 0.4
+
+    active_site_count = net.active_site_count(state.spatial_penetration_pct)
+    pv_output, cell_temp, irradiance = calculate_pv_physics(state, plant, bus, idx, rng=rng)
+    has_pv = pv_output > 0 or bus in net.solar_sites[:active_site_count]
+
+    # Initial Voltage Calc for Smart Logic
+    v_pre = calculate_voltage_profile(plant, bus, display_p, display_q, state.tap_position, p_gen_kw=pv_output)
+    smart_p, smart_q, smart_status = pv_output, 0.0, "Passive (Grid Following)"
+
+    # Bypass Smart Inverter unless Enabled
+    if has_pv:
+        if state.enable_smart_inverter:
+            capacity = net.solar_capacity.get(bus, 10.0)
+            smart_p, smart_q, smart_status = smart_inverter_logic(v_pre, pv_output, capacity)
+        else:
+            smart_status = "DISABLED (Instability Test Mode)"
+
+    # Final Voltage with Smart Inverter Actions (Includes Reverse Flow Logic)
+    voltage_pu_phys = calculate_voltage_profile(plant, bus, display_p, display_q, state.tap_position, p_gen_kw=smart_p, q_gen_kvar=smart_q)
+    avr_status = "IDLE"
+    if state.mpc_active and not state.relay_trip:
+        avr_status = "🤖 MPC OPTIMIZING..."
+        # Local visual results of the global MPC commands
+        pv_output_new, _, _ = calculate_pv_physics(state, plant, bus, idx, state.mpc_curtailment, rng=rng)
+        voltage_pu_phys = calculate_voltage_profile(plant, bus, display_p, display_q, state.tap_position, p_gen_kw=pv_output_new, q_gen_kvar=smart_q)
+    return dict(
+        bus=bus, display_p=display_p, display_q=display_q, active_site_count=active_site_count, has_pv=has_pv,
+        pv_output=pv_output, cell_temp=cell_temp, irradiance=irradiance, smart_p=smart_p, smart_q=smart_q,
+        smart_status=smart_status, voltage_pu_phys=voltage_pu_phys, avr_status=avr_status,
+    )
+
+def _avr_step(state, plant, src):
+    """Rule-based tap changer (only when the MPC is off): one 0.5% step toward 0.96-1.04 pu."""
+    if state.mpc_active or not state.auto_tap_mode or state.relay_trip:
+        return
+    step_change = 0.005 # 0.5% Step
+    v = src["voltage_pu_phys"]
+    if v > 1.04 and state.tap_position > 0.90:
+        state.tap_position -= step_change
+        src["avr_status"] = "LOWERING TAPS 🔻"
+    elif v < 0.96 and state.tap_position < 1.10:
+        state.tap_position += step_change
+        src["avr_status"] = "RAISING TAPS 🔺"
+    else:
+        return
+    state.tap_moves_count += 1
+    src["voltage_pu_phys"] = calculate_voltage_profile(plant, src["bus"], src["display_p"], src["display_q"],
+                                                       state.tap_position, p_gen_kw=src["smart_p"],
+                                                       q_gen_kvar=src["smart_q"])
+
+def _relay_step(state, bus):
+    """Advances the relay's IEC trip curve while a fault sits on `bus`, else lets it decay."""
+    if not (state.fault_active and state.fault_bus == bus):
+        state.relay_accumulator = max(0, state.relay_accumulator - 5.0)
+    elif not state.relay_trip:
+        f_data = FAULT_LIBRARY[state.fault_type]
+        i1, i2, i0 = compute_symmetrical_components_physics(state.fault_type, V_prefault=1.0, Zf=f_data["Zf"])
+        Ia, _, Ib, _, Ic, _ = convert_seq_to_phase(i0, i1, i2)
+        trip_time = calculate_iec_trip_time(max(Ia, Ib, Ic))
+        if trip_time:
+            state.relay_accumulator += (state.speed / trip_time) * 100
+
+def _feeder_view(state, plant, src, prev_display_p, rng):
+    """Measurements, state estimate, protection readout and power factor of the panel in `src`."""
+    bus = src["bus"]
+    display_p, display_q = src["display_p"], src["display_q"]
+    smart_p, smart_q = src["smart_p"], src["smart_q"]
+    voltage_pu_phys = src["voltage_pu_phys"]
+
+    # --- TECHNICAL IMPACTS ANALYSIS ---
+    reverse_flow = smart_p > display_p
+    net_p_flow = display_p - smart_p
+    xfmr_limit = 200.0
+    xfmr_loading = abs(net_p_flow) / xfmr_limit * 100
+
+    measured_v = apply_scada_noise(voltage_pu_phys, 0.01, rng)
+    measured_p = apply_scada_noise(net_p_flow, 1.0, rng)
+    measured_q = apply_scada_noise(display_q - smart_q, 1.0, rng)
+    estimated_v, se_resid, se_chi = run_wls_state_estimation(state, plant, measured_v, measured_p, measured_q, bus)
+
+    is_local_fault = False
+    relay_msg = "MONITORING"
+    i0, i1, i2 = 0.0, 0.0, 0.0
+    Ia, Ib, Ic = 0.8, 0.8, 0.8 # approx PU
+    Id, Ibd, Icd = 0, -120, 120 # angles
+
+    if state.fault_active and state.fault_bus == bus:
+        if state.relay_trip:
+            display_p, display_q = 0.0, 0.0
+            relay_msg = "❌ TRIP"
+            is_local_fault = True
+            Ia, Ib, Ic = 0, 0, 0
+            voltage_pu_phys = 0.0
+            measured_v = 0.0
+            estimated_v = 0.0
+        else:
+            f_data = FAULT_LIBRARY[state.fault_type]
+            i1, i2, i0 = compute_symmetrical_components_physics(state.fault_type, V_prefault=1.0, Zf=f_data["Zf"])
+            Ia, Id, Ib, Ibd, Ic, Icd = convert_seq_to_phase(i0, i1, i2)
+            if calculate_iec_trip_time(max(Ia, Ib, Ic)):
+                relay_msg = f"⚠️ TRIP CURVE: {min(100, int(state.relay_accumulator))}%"
+            else: relay_msg = "FAULT DETECTED"
+            voltage_pu_phys *= 0.3
+            measured_v = apply_scada_noise(voltage_pu_phys, rng=rng)
+            estimated_v = run_wls_state_estimation(state, plant, measured_v, measured_p, measured_q, bus)[0]
+    else:
+        i1 = (display_p - smart_p) / 100.0 # Current reflects net power
+        i2 = i1 * 0.05
+        i0 = i1 * 0.02
+        Ia = Ib = Ic = abs(i1)
+        # Phase shift if reverse flow
+        if reverse_flow:
+            Id += 180
+            Ibd += 180
+            Icd += 180
+
+    pf_denom = np.sqrt((display_p - smart_p)**2 + (display_q - state.capacitor_bank_kvAr)**2)
+    pf_final = (display_p - smart_p) / pf_denom if pf_denom > 0 else 1.0
+
+    return dict(
+        src, display_p=display_p, display_q=display_q, delta_feeder=display_p - prev_display_p,
+        voltage_pu_phys=voltage_pu_phys, reverse_flow=reverse_flow, net_p_flow=net_p_flow,
+        xfmr_loading=xfmr_loading, measured_v=measured_v, estimated_v=estimated_v, se_resid=se_resid,
+        se_chi=se_chi, is_local_fault=is_local_fault, relay_msg=relay_msg,
+        i0=i0, i1=i1, i2=i2, Ia=Ia, Ib=Ib, Ic=Ic, Id=Id, Ibd=Ibd, Icd=Icd, pf_final=pf_final,
+    )
+
+def feeder_solve(state, plant, bus, idx, rng=None):
+    """
+    Panel values of one bus at the present set-points (tap, capacitor bank,
+    relay state): PV + smart inverter, SE with FDI, fault readout. Changes no
+    state; noise comes from `rng` (default: a generator seeded by the hour,
+    so the run's state.rng only advances with ticks).
+    """
+    rng = np.random.default_rng(idx) if rng is None else rng
+    src = _feeder_sources(state, plant, bus, idx, rng)
+    panel = state.feeder if state.feeder.get("bus") == bus else None
+    # Delta against the previous hour, as the tick computed it
+    prev_display_p = panel["display_p"] - panel["delta_feeder"] if panel else state.prev_feeder_p
+    return _feeder_view(state, plant, src, prev_display_p, rng)
+
+def feeder_step(state, plant, bus, idx):
+    """
+    One tick of the feeder-level physics and local controllers for one bus:
+    feeder_solve's quantities with the AVR tap changer, the relay trip curve
+    and the APFC capacitor bank acting on them. Updates the feeder plot
+    histories and returns the panel values.
+    """
+    src = _feeder_sources(state, plant, bus, idx, state.rng)
+    _avr_step(state, plant, src)
+    _relay_step(state, bus)
+    view = _feeder_view(state, plant, src, state.prev_feeder_p, state.rng)
+    state.prev_feeder_p = view["display_p"]
+
+    # -- UPDATE PLOT BUFFERS --
+    state.history_tap.append(state.tap_position)
+    state.history_cap.append(state.capacitor_bank_kvAr)
+    state.history_se_meas.append(view["measured_v"])
+    state.history_se_est.append(view["estimated_v"])
+    state.history_se_j.append(view["se_chi"])
+    state.solar_p_history.append(view["smart_p"])
+    state.solar_q_history.append(view["smart_q"])
+    state.solar_v_history.append(view["voltage_pu_phys"])
+    state.solar_irr_history.append(view["irradiance"])
+    state.solar_temp_history.append(view["cell_temp"])
+
+    if state.apfc_auto_mode and not view["is_local_fault"] and not state.relay_trip:
+        if view["pf_final"] < 0.95:
+            state.capacitor_bank_kvAr += 25.0
+        elif view["pf_final"] > 0.99 and state.capacitor_bank_kvAr > 0:
+            state.capacitor_bank_kvAr -= 25.0
+    state.capacitor_bank_kvAr = max(0.0, min(200.0, state.capacitor_bank_kvAr))
+    return view
+
+def _no_lap(stage):
+    pass
+
+def tick(state, plant, mpc_planner=None, profiler=None):
+    """
+    Advances the whole grid by one time step (master tick): load, PV fleet,
+    MPC, BESS, protection, swing equation, HVAC, the monitored feeder panel
+    and the per-bus network solve. This runs regardless of what any view
+    has open.
+
+    mpc_planner(state, idx, p_load_total) -> (tap, bess_kw, curtailment) is
+    consulted when the MPC agent is active. profiler (tick_profiler.TickProfiler,
+    already begun) gets a lap after each stage.
+    """
+    lap = profiler.lap if profiler is not None else _no_lap
+    # 1. Advance Time
+    state.idx = (state.idx + 1) % len(plant.total_p)
+    idx = state.idx
+
+    # 2. Global Load & Solar Calculation
+    p_load_total = plant.total_p[idx] + state.hvac_load_kw
+    site_pv = pv_fleet_output(state, plant, idx, state.mpc_curtailment)
+    total_pv_gen = float(site_pv.sum())
+    lap("load_pv")
+
+    # --- RUN MPC AI GLOBALLY ---
+    if state.mpc_active and not state.relay_trip and mpc_planner is not None:
+        opt_tap, opt_bess, opt_curt = mpc_planner(state, idx, p_load_total)
+        if opt_tap != state.tap_position:
+            state.tap_position = opt_tap
+            state.tap_moves_count += 1
+        state.mpc_bess_power_cmd = opt_bess
+        state.mpc_curtailment = opt_curt
+    elif not state.mpc_active:
+        state.mpc_curtailment = 0.0 # Reset if AI is disabled
+    lap("mpc")
+
+    # 3. BESS Logic (Runs after MPC to catch immediate commands)
+    p_bess, bess_mode = bess_dispatch_logic(state, p_load_total - total_pv_gen)
+    if state.bess_active and p_bess != 0:
+        energy_kwh = p_bess * 1.0
+        delta_soc = -(energy_kwh / BESS_CAPACITY_KWH) * 100
+        state.bess_soc = max(0.0, min(100.0, state.bess_soc + delta_soc))
+    lap("bess")
+
+    # 4. Global Grid Physics (Frequency, Inertia)
+    p_grid_net = p_load_total - total_pv_gen - p_bess
+    q_val = plant.total_q[idx] + (state.hvac_load_kw * 0.6)
+
+    recloser_logic(state)
+    lap("protection")
+    update_grid_physics(state, p_grid_net, q_val)
+
+    _set_totals(state, p_load_total, total_pv_gen, p_bess, bess_mode, p_grid_net, q_val, state.prev_p, state.prev_q)
+
+    # 5. Update Global History Buffers
+    g_avg_voltage = state.tap_position - (p_grid_net / VOLTAGE_SENSITIVITY_CONST)
+    state.global_v_history.append(g_avg_voltage)
+    state.global_pf_history.append(0.95)
+    state.global_j_history.append(0.02)
+    lap("swing")
+
+    # 6. Zone HVAC, the monitored feeder and every bus
+    hvac_step(state)
+    lap("hvac")
+    if state.monitored_bus:
+        state.feeder = feeder_step(state, plant, state.monitored_bus, idx)
+    lap("feeder")
+    solve_network(state, plant, idx, site_pv)
+    lap("network")
+    trim_histories(state)
+
+def trim_histories(state):
+    """Compact mode: cuts the plot histories and the audit log back to their caps."""
+    if not state.compact_histories:
+        return
+    for name in HISTORY_FIELDS:
+        hist = getattr(state, name)
+        if len(hist) >= 2 * COMPACT_HISTORY:
+            del hist[:-COMPACT_HISTORY]
+    if len(state.audit_log) >= 2 * COMPACT_AUDIT:
+        del state.audit_log[:-COMPACT_AUDIT]
+
+def refresh(state, plant):
+    """
+    Re-solves the views at the current hour from the present set-points,
+    e.g. after an operator command while paused. Leaves the clock, the
+    machine dynamics, the local controllers (tap, capacitor bank, relay
+    curve), the plot histories and the run's RNG alone; deltas stay
+    relative to the previous hour.
+    """
+    idx = state.idx
+    # View noise from its own generator: only ticks advance state.rng
+    rng = np.random.default_rng(idx)
+    p_load_total = plant.total_p[idx] + state.hvac_load_kw
+    site_pv = pv_fleet_output(state, plant, idx, state.mpc_curtailment, rng=rng)
+    total_pv_gen = float(site_pv.sum())
+    p_bess, bess_mode = bess_dispatch_logic(state, p_load_total - total_pv_gen)
+    p_grid_net = p_load_total - total_pv_gen - p_bess
+    q_val = plant.total_q[idx] + (state.hvac_load_kw * 0.6)
+    _set_totals(state, p_load_total, total_pv_gen, p_bess, bess_mode, p_grid_net, q_val,
+                state.p_grid_net - state.delta_p, state.q_val - state.delta_q)
+    if state.monitored_bus:
+        state.feeder = feeder_solve(state, plant, state.monitored_bus, idx, rng)
+    solve_network(state, plant, idx, site_pv, rng)
+    trim_histories(state)
+
+def _set_totals(state, p_load_total, total_pv_gen, p_bess, bess_mode, p_grid_net, q_val, prev_p, prev_q):
+    state.p_load_total, state.total_pv_gen = p_load_total, total_pv_gen
+    state.p_bess, state.bess_mode = p_bess, bess_mode
+    state.p_grid_net, state.q_val = p_grid_net, q_val
+    state.delta_p, state.delta_q = p_grid_net - prev_p, q_val - prev_q
+    state.prev_p = p_grid_net
+    state.prev_q = q_val
@@ -0,0 +1,127 @@
+"""
+HEADLESS SIMULATION RUN
+Advances the grid physics as fast as it computes (no dashboard, no engine
+thread, no tick cadence) and streams every tick into a result directory
+through result_sink.ResultSink. One pass over the historical data is a full
+year (8760 hourly ticks).
+
+Run from the repository root:
+    python headless.py --hours 8760 --out results/year --penetration 50 --bess
+    python headless.py --hours 720 --out results/month --format arrow --fault bus1003@200+6
+    python headless.py --hours 8760 --out results/mpc --penetration 80 --bess --mpc
+
+Then, e.g.:
+    from result_sink import read_results
+    ticks, buses = read_results("results/year")
+"""
+import argparse
+import time
+
+import numpy as np
+
+import grid_physics
+from mpc_controller import plan_dispatch
+from result_sink import BATCH_TICKS, FORMATS, ResultSink, read_results
+from sim_engine import SETTABLE, load_plant
+
+
+def lookahead_planner(plant, horizon=6):
+    """
+    MPC planner for runs without the dashboard's forecast services: plans on
+    the replay data for hours [idx, idx + horizon), the window the
+    dashboard's forecast rows cover, i.e. a perfect forecast (the "perfect"
+    mode of benchmarks/bench_mpc_forecast.py). Deterministic MPC only;
+    mpc_stochastic has no effect here.
+    """
+    n = len(plant.total_p)
+
+    def planner(state, idx, p_load_total):
+        hours = np.arange(idx, idx + horizon) % n
+        irradiance = np.array([grid_physics.get_solar_contribution(plant, h) for h in hours])
+        capacity = plant.network.active_solar_capacity(state.spatial_penetration_pct)
+        return plan_dispatch(plant.total_p[hours], irradiance, state.tap_position, state.bess_soc, capacity,
+                             cloud_shading=state.cloud_shading)
+    return planner
+
+
+def run_headless(plant, hours, settings=None, sink=None, faults=(), state=None, mpc_planner=None, seed=None):
+    """
+    Runs `hours` ticks on a fresh (or the given) GridState. settings are
+    operator set-points (sim_engine.SETTABLE); faults is a sequence of
+    (tick, bus, fault_type) injected before that tick, or (tick, bus,
+    fault_type, clear_tick) to have the operator clear it again before
+    clear_tick. mpc_planner is consulted while mpc_active is set (see
+    lookahead_planner). seed seeds a fresh state's RNG (noise and synthetic
+    loads), so the same seed repeats the run.
+    """
+    bus0 = plant.network.bus_list[0]
+    state = state or grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0, seed=seed)
+    settings = dict(settings or {})
+    unknown = set(settings) - SETTABLE
+    if unknown:
+        raise ValueError(f"not operator-settable: {sorted(unknown)}")
+    for key, value in settings.items():
+        setattr(state, key, value)
+    state.run_simulation = True
+    pending = sorted(faults, key=lambda f: f[0])
+    clears = sorted(f[3] for f in pending if len(f) > 3 and f[3] is not None)
+    for k in range(hours):
+        while clears and clears[0] <= k:
+            clears.pop(0)
+            state.fault_active = state.relay_trip = False
+            state.recloser_state = "CLOSED"
+            grid_physics.log_event(state, "Restoration", "Manual", "Fault Cleared by Operator")
+        while pending and pending[0][0] <= k:
+            _, bus, fault_type = pending.pop(0)[:3]
+            state.fault_active, state.fault_bus, state.fault_type = True, bus, fault_type
+            grid_physics.log_event(state, "Contingency", "Fault", f"Injected: {fault_type}")
+        grid_physics.tick(state, plant, mpc_planner)
+        if sink is not None:
+            # Straight from the state: no per-tick snapshot copy
+            sink.record(state)
+    return state
+
+
+def parse_fault(spec):
+    """'BUS@TICK' (permanent) or 'BUS@TICK+HOURS' (cleared HOURS later) -> run_headless fault tuple."""
+    bus, _, at = spec.partition("@")
+    at, _, duration = at.partition("+")
+    tick = int(at or 0)
+    return tick, bus, "L-G (Line-to-Ground)", tick + int(duration) if duration else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=int, default=8760)
+    parser.add_argument("--out", default="results/run")
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--batch-ticks", type=int, default=BATCH_TICKS)
+    parser.add_argument("--penetration", type=int, default=10, help="Solar penetration slider (%%)")
+    parser.add_argument("--bess", action="store_true", help="BESS buffer active")
+    parser.add_argument("--smart-inverter", action="store_true")
+    parser.add_argument("--cloud", action="store_true", help="Cloud shading")
+    parser.add_argument("--auto-tap", action="store_true")
+    parser.add_argument("--mpc", action="store_true", help="MPC agent on, planning on the replay data's look-ahead")
+    parser.add_argument("--fault", action="append", default=[], metavar="BUS@TICK[+HOURS]",
+                        help="Inject an L-G fault at BUS before tick TICK, cleared HOURS later if given (repeatable)")
+    args = parser.parse_args()
+
+    plant = load_plant()
+    settings = dict(spatial_penetration_pct=args.penetration, bess_active=args.bess, cloud_shading=args.cloud,
+                    enable_smart_inverter=args.smart_inverter, auto_tap_mode=args.auto_tap, mpc_active=args.mpc)
+    t0 = time.perf_counter()
+    with ResultSink(args.out, plant.network, args.format, args.batch_ticks) as sink:
+        state = run_headless(plant, args.hours, settings, sink, [parse_fault(f) for f in args.fault],
+                             mpc_planner=lookahead_planner(plant) if args.mpc else None)
+        run_s = time.perf_counter() - t0
+    total_s = time.perf_counter() - t0
+
+    ticks, buses = read_results(args.out)
+    print(f"{args.hours} ticks in {run_s:.1f}s ({run_s / args.hours * 1e3:.2f} ms/tick), "
+          f"files closed after {total_s:.1f}s; record() waited {sink.stall_ms:.0f} ms on the writer")
+    print(f"{sink.paths['ticks']}: {len(ticks)} rows; {sink.paths['buses']}: {len(buses)} rows")
+    print(f"final hour {state.idx}, BESS SOC {state.bess_soc:.1f}%, {len(state.audit_log)} events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+PURE-NUMPY LSTM INFERENCE KERNEL
+Exports a trained Keras LSTM(units) + Dense(1) forecaster (and its MinMax
+scaler) to a compact .npz, and runs the forward pass in vectorized NumPy so
+dashboard processes can serve forecasts without importing TensorFlow.
+"""
+import os
+
+import numpy as np
+
+SUPPORTED_ACTIVATIONS = ("sigmoid", "hard_sigmoid", "tanh")
+
+
+def _sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1.0) # Overflow-free logistic
+
+
+def _hard_sigmoid(x):
+    return np.clip(x / 6.0 + 0.5, 0.0, 1.0) # Keras 3 (relu6(x + 3) / 6); tf.keras 2 used 0.2 * x + 0.5
+
+
+_ACTIVATIONS = {"sigmoid": _sigmoid, "hard_sigmoid": _hard_sigmoid, "tanh": np.tanh}
+
+
+class MinMaxParams:
+    """Minimal MinMaxScaler stand-in (transform / inverse_transform only)."""
+    def __init__(self, scale, min_):
+        self.scale_ = np.asarray(scale, dtype=float)
+        self.min_ = np.asarray(min_, dtype=float)
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        return cls(scaler.scale_, scaler.min_)
+
+    def transform(self, X):
+        return np.asarray(X, dtype=float) * self.scale_ + self.min_
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=float) - self.min_) / self.scale_
+
+
+class NumpyLSTM:
+    """
+    Single-layer LSTM + Dense forward pass (Keras gate order i, f, c, o).
+    predict_on_batch mirrors the Keras call, so it is a drop-in for inference.
+    """
+    def __init__(self, kernel, recurrent_kernel, bias, dense_w, dense_b, lookback,
+                 activation="tanh", recurrent_activation="sigmoid", scaler=None):
+        self.W = np.asarray(kernel, dtype=np.float32)
+        self.U = np.asarray(recurrent_kernel, dtype=np.float32)
+        self.b = np.asarray(bias, dtype=np.float32)
+        self.Wd = np.asarray(dense_w, dtype=np.float32)
+        self.bd = np.asarray(dense_b, dtype=np.float32)
+        self.units = self.U.shape[0]
+        self.lookback = int(lookback)
+        self.activation = activation
+        self.recurrent_activation = recurrent_activation
+        self._act = _ACTIVATIONS[activation]
+        self._rec_act = _ACTIVATIONS[recurrent_activation]
+        self.scaler = scaler
+        # Fast path for the Keras defaults: weights pre-scaled so one tanh covers
+        # all four gates, since sigmoid(x) = 0.5 * tanh(x / 2) + 0.5 (i, f, o).
+        self._fast = activation == "tanh" and recurrent_activation == "sigmoid"
+        col = np.full(4 * self.units, 0.5, dtype=np.float32)
+        col[2*self.units:3*self.units] = 1.0
+        self._fused = (self.W * col, self.U * col, self.b * col)
+
+    def predict_on_batch(self, X):
+        """(batch, lookback, features) scaled windows -> (batch, 1) scaled outputs."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 2: X = X[..., np.newaxis]
+        n, steps, _ = X.shape
+        u = self.units
+        fast = self._fast
+        W, U, b = self._fused if fast else (self.W, self.U, self.b)
+        # Input projections for every timestep in one matmul
+        xw = X @ W + b
+        h = np.zeros((n, u), dtype=np.float32)
+        c = np.zeros((n, u), dtype=np.float32)
+        for t in range(steps):
+            z = xw[:, t] + h @ U
+            if fast:
+                a = np.tanh(z)
+                a[:, :2*u] = 0.5 * a[:, :2*u] + 0.5
+                a[:, 3*u:] = 0.5 * a[:, 3*u:] + 0.5
+                i, f, g, o = a[:, :u], a[:, u:2*u], a[:, 2*u:3*u], a[:, 3*u:]
+            else:
+                i = self._rec_act(z[:, :u])
+                f = self._rec_act(z[:, u:2*u])
+                g = self._act(z[:, 2*u:3*u])
+                o = self._rec_act(z[:, 3*u:])
+            c = f * c + i * g
+            h = o * np.tanh(c) if fast else o * self._act(c)
+        return h @ self.Wd + self.bd
+
+    def rollout(self, window, steps):
+        """Recursive multi-step forecast from one scaled lookback window."""
+        buf = np.empty(self.lookback + steps, dtype=np.float32)
+        buf[:self.lookback] = np.asarray(window, dtype=np.float32).ravel()[-self.lookback:]
+        for k in range(steps):
+            buf[self.lookback + k] = self.predict_on_batch(buf[k:k + self.lookback].reshape(1, -1, 1))[0, 0]
+        return buf[self.lookback:]
+
+    def get_keras_weights(self):
+        return [self.W, self.U, self.b, self.Wd, self.bd]
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            scaler = MinMaxParams(z["scaler_scale"], z["scaler_min"]) if "scaler_scale" in z else None
+            return cls(z["kernel"], z["recurrent_kernel"], z["bias"], z["dense_w"], z["dense_b"],
+                       int(z["lookback"]), str(z["activation"]), str(z["recurrent_activation"]), scaler)
+
+
+def kernel_from_keras(model, scaler=None):
+    """Extracts LSTM + Dense weights from a trained Keras Sequential model."""
+    lstm_layer, dense_layer = model.layers[0], model.layers[-1]
+    cfg = lstm_layer.get_config()
+    for key in ("activation", "recurrent_activation"):
+        if cfg.get(key) not in SUPPORTED_ACTIVATIONS:
+            raise ValueError(f"Unsupported LSTM {key}: {cfg.get(key)}")
+    if not cfg.get("use_bias", True) or cfg.get("return_sequences") or cfg.get("go_backwards"):
+        raise ValueError("Only a forward, biased, last-step LSTM layer can be exported")
+    kernel, recurrent_kernel, bias = lstm_layer.get_weights()
+    dense_w, dense_b = dense_layer.get_weights()
+    lookback = model.inputs[0].shape[1]
+    if scaler is not None and not isinstance(scaler, MinMaxParams):
+        scaler = MinMaxParams.from_sklearn(scaler)
+    return NumpyLSTM(kernel, recurrent_kernel, bias, dense_w, dense_b, lookback,
+                     cfg["activation"], cfg["recurrent_activation"], scaler)
+
+
+def save_kernel(kernel, path):
+    """Writes the kernel as compressed float32 .npz (atomic replace)."""
+    arrays = dict(kernel=kernel.W, recurrent_kernel=kernel.U, bias=kernel.b, dense_w=kernel.Wd, dense_b=kernel.bd,
+                  lookback=np.int32(kernel.lookback), activation=np.str_(kernel.activation),
+                  recurrent_activation=np.str_(kernel.recurrent_activation))
+    if kernel.scaler is not None:
+        arrays.update(scaler_scale=kernel.scaler.scale_, scaler_min=kernel.scaler.min_)
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def export_lstm_npz(model, scaler, path):
+    """Keras model + fitted scaler -> .npz. Returns the NumPy kernel."""
+    kernel = kernel_from_keras(model, scaler)
+    save_kernel(kernel, path)
+    return kernel
@@ -0,0 +1,275 @@
+"""
+MEMORY ACCOUNTING
+Per-key deep byte sizes of what a dashboard server keeps alive, sampled over
+time: the engine's grid state field by field (plot histories, audit log,
+per-bus arrays), its snapshot, timeline and profiler, the cached resources
+shared by every session (network, plant, forecast services, replay data) and
+each session's st.session_state. Keys whose size grew at every one of the
+last GROWTH_SAMPLES samples, by at least GROWTH_MIN_BYTES overall, are flagged
+as growing; with the process RSS and session count of each sample this gives
+a server sizing estimate for N operators.
+
+Sizes are deep: containers count their elements, objects their __dict__,
+NumPy arrays their buffer and pandas objects memory_usage(deep=True). One
+sample shares a single seen-set, so an object reachable from several keys is
+charged to the first one (engine before caches before sessions). Modules,
+classes and functions are not followed.
+
+Headless soak (headless.run_headless flat out, a sample every --every ticks):
+    python memory_audit.py --hours 4000 --every 250
+    python memory_audit.py --hours 4000 --every 250 --compact
+"""
+import argparse
+import collections
+import sys
+import threading
+import time
+import types
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from metrics import gauge, resident_memory_bytes
+
+SAMPLE_S = 60.0
+WINDOW = 240                  # samples kept (4 h at one a minute)
+GROWTH_SAMPLES = 10
+GROWTH_MIN_BYTES = 4096          # ignores jitter; appends grow a list every sample
+
+_OPAQUE = (types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, type,
+           threading.Thread)
+_SCALARS = (int, float, complex, bool, str, bytes, type(None))
+
+
+def deep_sizeof(obj, seen=None):
+    """Bytes reachable from obj that are not in `seen` (updated in place)."""
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, _OPAQUE):
+            continue
+        seen.add(id(o))
+        if isinstance(o, _SCALARS):
+            total += sys.getsizeof(o)
+        elif isinstance(o, np.ndarray):
+            total += sys.getsizeof(o)
+            if o.base is not None:
+                stack.append(o.base)
+        elif isinstance(o, (pd.DataFrame, pd.Series, pd.Index)):
+            usage = o.memory_usage(deep=True)
+            total += int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+        elif isinstance(o, (dict, types.MappingProxyType)):
+            total += sys.getsizeof(o)
+            for k, v in tuple(o.items()):
+                stack.append(k)
+                stack.append(v)
+        elif isinstance(o, (list, tuple, set, frozenset, collections.deque)):
+            total += sys.getsizeof(o)
+            stack.extend(tuple(o))
+        else:
+            total += sys.getsizeof(o)
+            if hasattr(o, "__dict__"):
+                stack.append(vars(o))
+            for slot in getattr(type(o), "__slots__", ()):
+                if hasattr(o, slot):
+                    stack.append(getattr(o, slot))
+    return total
+
+
+def object_fields(obj):
+    """{field: value} of an object that the engine thread may be mutating meanwhile."""
+    for _ in range(3):
+        try:
+            return dict(vars(obj))
+        except RuntimeError:
+            continue
+    return {}
+
+
+@dataclass(frozen=True)
+class Sample:
+    at: float
+    sizes: dict           # (group, key) -> bytes
+    rss: int
+    sessions: int
+
+
+class MemoryAudit:
+    """
+    `sources()` returns {group: {key: object}} for everything that changes
+    over the run; track() adds long-lived objects once. sample() measures
+    both; start() samples every `interval` seconds on a daemon thread.
+    """
+    def __init__(self, sources=None, interval=SAMPLE_S, window=WINDOW):
+        self.sources = sources or (lambda: {})
+        self.interval = interval
+        self.samples = collections.deque(maxlen=window)
+        self.sample_ms = 0.0
+        self._tracked = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def track(self, group, key, obj):
+        self._tracked.setdefault(group, {})[key] = obj
+
+    def add_sources(self, sources):
+        """
+        Merges another sources() in, for objects built after the audit (the
+        engine); its groups are measured first.
+        """
+        previous = self.sources
+        self.sources = lambda: {**sources(), **previous()}
+
+    def sample(self, sessions=0):
+        t0 = time.perf_counter()
+        groups = self.sources()
+        for group, objs in self._tracked.items():
+            groups.setdefault(group, {}).update(objs)
+        seen = set()
+        sizes = {(group, key): deep_sizeof(obj, seen) for group, objs in groups.items() for key, obj in objs.items()}
+        with self._lock:
+            self.samples.append(Sample(time.time(), sizes, resident_memory_bytes() or 0, int(sessions)))
+        self.sample_ms = (time.perf_counter() - t0) * 1e3
+        return sizes
+
+    # --- Background sampling ---
+    def start(self, sessions=lambda: 0):
+        if self._thread is not None:
+            return self
+        def loop():
+            while not self._stop.wait(self.interval if self.samples else 1.0):
+                try:
+                    self.sample(sessions())
+                except Exception:
+                    # A bad sample must never kill the sampler
+                    pass
+        self._thread = threading.Thread(target=loop, name="memory-audit", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    # --- Reading ---
+    def _samples(self):
+        with self._lock:
+            return tuple(self.samples)
+
+    def report(self, growth_samples=GROWTH_SAMPLES, min_growth=GROWTH_MIN_BYTES):
+        """Rows of group, key, bytes, change over the window, bytes per hour and the growth flag; largest first."""
+        samples = self._samples()
+        if not samples:
+            return []
+        rows = []
+        for group, key in samples[-1].sizes:
+            series = [(s.at, s.sizes[(group, key)]) for s in samples if (group, key) in s.sizes]
+            t = np.array([at for at, _ in series])
+            b = np.array([size for _, size in series], dtype=float)
+            recent = b[-growth_samples:]
+            growing = (len(recent) >= growth_samples and bool(np.all(np.diff(recent) > 0))
+                       and recent[-1] - recent[0] >= min_growth)
+            per_hour = float(np.polyfit(t - t[0], b, 1)[0] * 3600.0) if len(b) > 1 and t[-1] > t[0] else 0.0
+            rows.append(dict(group=group, key=key, bytes=int(b[-1]), change=int(b[-1] - b[0]),
+                             per_hour=per_hour, growing=growing))
+        rows.sort(key=lambda r: -r["bytes"])
+        return rows
+
+    def totals(self):
+        """{group: bytes} of the latest sample."""
+        samples = self._samples()
+        out = collections.Counter()
+        for (group, _), size in (samples[-1].sizes.items() if samples else ()):
+            out[group] += size
+        return dict(out)
+
+    def sizing(self, operators):
+        """
+        Estimated RSS for `operators` concurrent sessions. Per-session memory is
+        the RSS slope against the session count when samples saw at least two
+        different counts (it then includes Streamlit's own per-session state),
+        else the measured session-state bytes per session (a lower bound).
+        """
+        samples = self._samples()
+        if not samples:
+            return None
+        last = samples[-1]
+        counts = np.array([s.sessions for s in samples])
+        session_bytes = sum(size for (group, _), size in last.sizes.items() if group == "session")
+        per_session, basis = session_bytes / max(last.sessions, 1), "session state (lower bound)"
+        if len(set(counts.tolist())) > 1:
+            slope = np.polyfit(counts, [s.rss for s in samples], 1)[0]
+            if slope > per_session:
+                per_session, basis = float(slope), "RSS vs sessions"
+        return dict(operators=operators, rss_now=last.rss, sessions_now=last.sessions, per_session=per_session,
+                    basis=basis, estimate=last.rss + (operators - last.sessions) * per_session)
+
+    def export_metrics(self):
+        gauge("memory_key_bytes", "Deep size of each audited key at the latest memory sample",
+              ("group", "key")).set_function(
+            lambda: {(g, k): size for (g, k), size in (self._samples()[-1].sizes.items() if self.samples else ())})
+        gauge("memory_growing_keys", "Audited keys that grew at every recent sample").set_function(
+            lambda: sum(r["growing"] for r in self.report()))
+        return self
+
+
+def engine_sources(engine):
+    """sources() for a sim_engine.SimulationEngine: state fields, snapshot, timeline, profiler."""
+    def sources():
+        fields = {f"state.{k}": v for k, v in object_fields(engine.state).items()}
+        fields.update(snapshot=engine.snapshot(), timeline=engine.timeline, profiler=engine.profiler)
+        return {"engine": fields}
+    return sources
+
+
+class _SoakSampler:
+    """run_headless sink that samples every `every` ticks."""
+    def __init__(self, audit, every):
+        self.audit, self.every, self.ticks = audit, every, 0
+
+    def record(self, state):
+        self.ticks += 1
+        if self.ticks % self.every == 0:
+            self.audit.sample()
+
+
+def _mb(n):
+    return f"{n / 2 ** 20:8.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=int, default=4000, help="Ticks to run")
+    parser.add_argument("--every", type=int, default=250, help="Ticks between samples")
+    parser.add_argument("--compact", action="store_true", help="Run with compact histories")
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    import grid_physics
+    from headless import run_headless
+    from sim_engine import load_plant, take_snapshot
+
+    plant = load_plant()
+    bus0 = plant.network.bus_list[0]
+    state = grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0)
+    audit = MemoryAudit(lambda: {"engine": {**{f"state.{k}": v for k, v in vars(state).items()},
+                                            "snapshot": take_snapshot(state)}})
+    audit.track("cache", "plant", plant)
+    t0 = time.perf_counter()
+    run_headless(plant, args.hours, dict(compact_histories=args.compact, bess_active=True, auto_tap_mode=True),
+                 _SoakSampler(audit, args.every), state=state)
+    print(f"{args.hours} ticks in {time.perf_counter() - t0:.1f}s, {len(audit.samples)} samples "
+          f"(last took {audit.sample_ms:.0f} ms), compact={args.compact}\n")
+    print(f"{'group':<7} {'key':<28} {'MB':>8} {'change MB':>9} {'growing':>7}")
+    for row in audit.report(growth_samples=min(GROWTH_SAMPLES, len(audit.samples)))[:args.top]:
+        print(f"{row['group']:<7} {row['key']:<28} {_mb(row['bytes'])} {_mb(row['change']):>9} "
+              f"{'YES' if row['growing'] else '':>7}")
+    print("\n" + ", ".join(f"{g} {_mb(b).strip()} MB" for g, b in audit.totals().items())
+          + f", RSS {_mb(audit.samples[-1].rss).strip()} MB")
+
+
+if __name__ == "__main__":
+    main()
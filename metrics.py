@@ -0,0 +1,316 @@
+"""
+METRICS REGISTRY
+Process-wide counters, gauges and histograms served in the Prometheus text
+exposition format (version 0.0.4), so a local Prometheus (or curl) can scrape
+the digital twin: tick latency and rate, sessions, queue depths, model load
+times, cache hit rates and memory use.
+
+Hot paths only ever update a metric that already exists: Counter.inc,
+Gauge.set and Histogram.observe are a lock and a few float operations (about
+1 us for an observe). Anything that is cheaper to read when scraped than to
+keep current (queue depths, profiler percentiles, memory) is a gauge with a
+function, evaluated on scrape instead of per tick.
+
+Metrics are created through counter()/gauge()/histogram() on the module-level
+REGISTRY; creating one that exists returns it, so modules may be re-imported
+(Streamlit reruns) without duplicates. serve() exposes GET /metrics on its own
+daemon thread; telemetry_server.py also serves it on its port.
+
+    curl -s http://127.0.0.1:9108/metrics
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = 9108
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a sub-millisecond tick up to a multi-second stall
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Seconds; model loads range from a store hit to a full inline fit
+LOAD_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _value(v):
+    v = float(v)
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    if v.is_integer() and abs(v) < 1e15:
+        return str(int(v))
+    return repr(v)
+
+
+def _escape(text):
+    return str(text).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *values, **kw):
+        """The child metric for one label combination (created on first use)."""
+        if kw:
+            values = tuple(kw[n] for n in self.labelnames)
+        values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def _child(self):
+        return type(self)(self.name, self.doc)
+
+    def _series(self):
+        """[(label values, child)]; an unlabelled metric is its own only child."""
+        if self.labelnames:
+            return sorted(self._children.items())
+        return [((), self)]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {_escape(self.doc)}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._series():
+            lines.extend(child._samples(self.labelnames, values))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, doc, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self.value = 0.0
+        self._fn = None
+
+    def inc(self, amount=1.0):
+        if amount < 0:
+            raise ValueError("counters only go up")
+        with self._lock:
+            self.value += amount
+
+    def set_function(self, fn):
+        """Reads the total from fn() on every scrape (a count kept elsewhere)."""
+        self._fn = fn
+
+    def _samples(self, names, values):
+        value = self.value
+        if self._fn is not None:
+            try:
+                value = self._fn()
+            except Exception:
+                return []
+        return [f"{self.name}{_labels(names, values)} {_value(value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, doc, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self.value = 0.0
+        self._fn = None
+
+    def set(self, value):
+        self.value = float(value)
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def set_function(self, fn):
+        """
+        Evaluates fn() on every scrape instead of storing a value. On a
+        labelled gauge fn returns {label values tuple: value} for all series.
+        """
+        self._fn = fn
+
+    def _series(self):
+        if self._fn is None or not self.labelnames:
+            return super()._series()
+        try:
+            values = self._fn()
+        except Exception:
+            return []
+        out = []
+        for key, value in sorted(values.items()):
+            child = Gauge(self.name, self.doc)
+            child.value = value
+            out.append((key if isinstance(key, tuple) else (key,), child))
+        return out
+
+    def _samples(self, names, values):
+        value = self.value
+        if self._fn is not None and not self.labelnames:
+            try:
+                value = self._fn()
+            except Exception:
+                return []
+            if value is None:
+                return []
+        return [f"{self.name}{_labels(names, values)} {_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def _child(self):
+        return Histogram(self.name, self.doc, buckets=self.buckets)
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager that observes the duration of its block in seconds."""
+        return _Timer(self)
+
+    def _samples(self, names, values):
+        with self._lock:
+            counts, total, count = list(self._counts), self.sum, self.count
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets + (math.inf,), counts):
+            cumulative += n
+            lines.append(f"{self.name}_bucket{_labels(names, values, [('le', _value(bound))])} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(names, values)} {_value(total)}")
+        lines.append(f"{self.name}_count{_labels(names, values)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.t0)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, cls, name, doc, labelnames=(), **kw):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, doc, labelnames, **kw)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"metric {name} already registered as a {metric.kind}")
+            return metric
+
+    def render(self):
+        """The whole registry in the Prometheus text format."""
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, doc, labelnames=()):
+    return REGISTRY.get_or_create(Counter, name, doc, labelnames)
+
+
+def gauge(name, doc, labelnames=()):
+    return REGISTRY.get_or_create(Gauge, name, doc, labelnames)
+
+
+def histogram(name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.get_or_create(Histogram, name, doc, labelnames, buckets=buckets)
+
+
+# ----------------------------------------------------------
+# PROCESS METRICS
+# ----------------------------------------------------------
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_STARTED = time.time()
+
+
+def resident_memory_bytes():
+    """RSS from /proc (Linux); elsewhere the peak RSS from getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kB on Linux and bytes on macOS
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+gauge("process_resident_memory_bytes", "Resident memory size in bytes").set_function(resident_memory_bytes)
+counter("process_cpu_seconds_total", "Process CPU time (user + system) in seconds").set_function(time.process_time)
+gauge("process_start_time_seconds", "Process start time since the epoch in seconds").set(_STARTED)
+gauge("python_threads", "Live Python threads").set_function(threading.active_count)
+
+
+# ----------------------------------------------------------
+# HTTP ENDPOINT
+# ----------------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404, "try /metrics")
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=METRICS_PORT, registry=REGISTRY):
+    """Serves GET /metrics on a daemon thread; returns the server (server_address has the port)."""
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
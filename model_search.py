@@ -0,0 +1,222 @@
+"""
+HYPERPARAMETER SEARCH FOR THE FORECASTING MODELS
+Grid search over Prophet and LSTM hyperparameters for the load and solar
+series. Trials run concurrently on a bounded process pool (one trial per
+worker, one math thread per worker). LSTM trials train with Keras early
+stopping on a validation tail; each trial is scored on the hold-out split
+with 24h rollouts from daily origins, and records accuracy, training time
+and per-forecast inference latency.
+
+Finished trials are cached in model_search_trials.jsonl, keyed by a hash of
+series data, family and parameters, so an interrupted or widened search only
+runs the new trials. --apply writes the winners to model_config.json, which
+forecasting.model_config() overlays on the defaults; the dashboard's
+background worker rebuilds published models whose config no longer matches.
+
+Run from the repository root:
+    python model_search.py --series load --family lstm --workers 4
+    python model_search.py --series load solar --max-infer-ms 5 --apply
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import forecasting
+
+LOAD_CSV = "Historical_Data/Total_P&Q.csv"
+SOLAR_CSV = "Historical_Data/Solardata.csv"
+SOLAR_SCALE_KW = 5000.0
+TRIALS_FILE = "model_search_trials.jsonl"
+
+SEARCH_SPACE = {
+    "prophet": {
+        "changepoint_prior_scale": [0.01, 0.05, 0.5],
+        "seasonality_mode": ["additive", "multiplicative"],
+        "weekly_seasonality": [True, False],
+    },
+    "lstm": {
+        "units": [32, 50, 64],
+        "lookback": [24, 48],
+        "learning_rate": [0.001, 0.003],
+    },
+}
+LSTM_MAX_EPOCHS = 20
+LSTM_PATIENCE = 2   # epochs without val_loss improvement before a trial stops
+
+
+def load_series(name):
+    if name == "solar":
+        vals = pd.read_csv(SOLAR_CSV).iloc[:, 0].values.astype(float)
+        return vals / vals.max() * SOLAR_SCALE_KW
+    return pd.read_csv(LOAD_CSV)["Total_Active_Power"].values.astype(float)
+
+
+def grid(family):
+    space = SEARCH_SPACE[family]
+    return [dict(zip(space, combo)) for combo in itertools.product(*space.values())]
+
+
+def trial_key(series, family, params, digest, split, horizon, budget):
+    blob = json.dumps([series, family, params, digest, split, horizon, budget], sort_keys=True)
+    return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+
+def _init_worker():
+    # One math thread per worker; the pool provides the parallelism
+    for var in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[var] = "1"
+
+
+def _rollout_errors(kernel, values, origins, horizon):
+    sc = kernel.scaler
+    errors = np.empty((len(origins), horizon))
+    lat = np.empty(len(origins))
+    for i, origin in enumerate(origins):
+        t = time.perf_counter()
+        window = sc.transform(values[origin - kernel.lookback:origin].reshape(-1, 1)).ravel()
+        pred = sc.inverse_transform(kernel.rollout(window, horizon).reshape(-1, 1)).ravel()
+        lat[i] = (time.perf_counter() - t) * 1e3
+        errors[i] = pred - values[origin:origin + horizon]
+    return errors, lat
+
+
+def run_trial(key, series, family, params, values, split, horizon, budget):
+    """Fits on values[:split] and scores 24h forecasts from daily hold-out origins."""
+    from lstm_numpy import kernel_from_keras
+    record = {"key": key, "series": series, "family": family, "params": params, "budget": budget}
+    origins = np.arange(split, len(values) - horizon + 1, 24)
+    try:
+        t0 = time.perf_counter()
+        if family == "prophet":
+            model = forecasting.fit_prophet(values[:split], config=params)
+            record["train_s"] = time.perf_counter() - t0
+            t = time.perf_counter()
+            curve = model.predict(pd.DataFrame({'ds': forecasting.hour_timestamps(split, len(values) - split)}))['yhat'].values
+            record["infer_ms"] = (time.perf_counter() - t) * 1e3 / len(origins)   # amortised per forecast
+            errors = np.stack([curve[o - split:o - split + horizon] for o in origins]) - \
+                     np.stack([values[o:o + horizon] for o in origins])
+        else:
+            cfg = dict(params, **budget)
+            keras_model, scaler = forecasting.fit_lstm(values[:split], config=cfg)
+            record["train_s"] = time.perf_counter() - t0
+            record["epochs_run"] = len(keras_model.history.epoch)
+            kernel = kernel_from_keras(keras_model, scaler)
+            errors, lat = _rollout_errors(kernel, values, origins, horizon)
+            record["infer_ms"] = float(np.percentile(lat, 50))
+        record["rmse"] = float(np.sqrt(np.mean(errors ** 2)))
+        record["mae"] = float(np.mean(np.abs(errors)))
+        record["rmse_1h"] = float(np.sqrt(np.mean(errors[:, 0] ** 2)))
+        record["status"] = "ok"
+    except Exception as exc:
+        record["status"] = f"failed: {exc}"
+    return record
+
+
+def load_trials(path=TRIALS_FILE):
+    trials = {}
+    if os.path.exists(path):
+        with open(path) as fin:
+            for line in fin:
+                rec = json.loads(line)
+                trials[rec["key"]] = rec
+    return trials
+
+
+def best_trials(trials, max_infer_ms=None):
+    """Lowest hold-out RMSE per (series, family) among trials within the latency budget."""
+    best = {}
+    for rec in trials:
+        if rec["status"] != "ok" or (max_infer_ms is not None and rec["infer_ms"] > max_infer_ms):
+            continue
+        slot = (rec["series"], rec["family"])
+        if slot not in best or rec["rmse"] < best[slot]["rmse"]:
+            best[slot] = rec
+    return best
+
+
+def apply_config(best, path=forecasting.MODEL_CONFIG_FILE):
+    """Merges winning params into the model config file (atomic replace)."""
+    try:
+        with open(path) as fin:
+            config = json.load(fin)
+    except (OSError, ValueError):
+        config = {}
+    for (series, family), rec in best.items():
+        params = dict(rec["params"])
+        if family == "lstm":
+            params.update(rec["budget"])
+        config.setdefault(series, {})[family] = params
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fout:
+        json.dump(config, fout, indent=1)
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", nargs="+", choices=("load", "solar"), default=["load"])
+    parser.add_argument("--family", nargs="+", choices=tuple(SEARCH_SPACE), default=list(SEARCH_SPACE))
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--train-frac", type=float, default=0.8)
+    parser.add_argument("--max-epochs", type=int, default=LSTM_MAX_EPOCHS, help="LSTM epoch cap per trial")
+    parser.add_argument("--patience", type=int, default=LSTM_PATIENCE, help="LSTM early-stopping patience")
+    parser.add_argument("--max-infer-ms", type=float, default=None, help="Latency budget per forecast")
+    parser.add_argument("--apply", action="store_true", help=f"Write winners to {forecasting.MODEL_CONFIG_FILE}")
+    args = parser.parse_args()
+
+    families = [f for f in args.family if (forecasting.PROPHET_AVAILABLE if f == "prophet" else forecasting.LSTM_AVAILABLE)]
+    for f in set(args.family) - set(families):
+        print(f"skipping {f}: dependency not installed")
+
+    budget = {"epochs": args.max_epochs, "patience": args.patience}
+    cache = load_trials()
+    tasks, results = [], []
+    for series in args.series:
+        values = load_series(series)
+        split = int(len(values) * args.train_frac)
+        digest = hashlib.sha1(values.tobytes()).hexdigest()[:16]
+        for family in families:
+            for params in grid(family):
+                trial_budget = budget if family == "lstm" else None
+                key = trial_key(series, family, params, digest, split, args.horizon, trial_budget)
+                if key in cache:
+                    results.append(cache[key])
+                else:
+                    tasks.append((key, series, family, params, values, split, args.horizon, trial_budget))
+    print(f"{len(tasks)} new trials, {len(results)} cached, {args.workers} workers")
+
+    t0 = time.perf_counter()
+    if tasks:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context("spawn"),
+                                 initializer=_init_worker) as pool, open(TRIALS_FILE, "a") as log:
+            futures = [pool.submit(run_trial, *task) for task in tasks]
+            for fut in as_completed(futures):
+                rec = fut.result()
+                log.write(json.dumps(rec) + "\n")
+                log.flush()   # each finished trial survives an interrupted search
+                results.append(rec)
+                print(f"  {rec['series']:<5} {rec['family']:<7} {json.dumps(rec['params'])}: "
+                      + (f"rmse {rec['rmse']:.1f}  train {rec['train_s']:.1f}s  infer {rec['infer_ms']:.2f}ms"
+                         if rec["status"] == "ok" else rec["status"]))
+    print(f"search wall time {time.perf_counter() - t0:.1f}s\n")
+
+    best = best_trials([r for r in results if r["series"] in args.series and r["family"] in families], args.max_infer_ms)
+    for (series, family), rec in sorted(best.items()):
+        print(f"best {series}/{family}: {json.dumps(rec['params'])}  rmse {rec['rmse']:.1f}  "
+              f"1h {rec['rmse_1h']:.1f}  train {rec['train_s']:.1f}s  infer {rec['infer_ms']:.2f}ms")
+    if args.apply and best:
+        apply_config(best)
+        print(f"\nwrote {forecasting.MODEL_CONFIG_FILE}")
+
+
+if __name__ == "__main__":
+    main()
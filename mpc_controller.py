@@ -0,0 +1,128 @@
+"""
+MPC CONTROLLER (HEURISTIC SOLVER)
+Receding-horizon dispatch of the tap changer, BESS and PV curtailment with
+strict voltage enforcement. The controller is pure: it plans on the load and
+irradiance look-ahead it is handed (the shared forecast services in the
+dashboard, actuals or forecasts in benchmarks/bench_mpc_forecast.py) and
+never reads the replay data itself.
+
+Each candidate (tap move, BESS set-point, curtailment level) is held over the
+horizon. All candidates are scored against all look-ahead scenarios in one
+candidates x scenarios x horizon array:
+
+  plan_dispatch             one deterministic look-ahead (a single scenario)
+  plan_dispatch_stochastic  K sampled scenarios (see sample_scenarios); picks
+                            the lowest expected cost among candidates whose
+                            voltage-violation probability is within `risk`
+"""
+import itertools
+
+import numpy as np
+
+# Plant constants shared with the dashboard physics
+BESS_CAPACITY_KWH = 10000.0
+BESS_MAX_POWER = 3000.0
+VOLTAGE_SENSITIVITY_CONST = 75000.0
+
+TAP_MOVES = (-0.01, 0.0, 0.01)
+BESS_MOVES = (-BESS_MAX_POWER, -BESS_MAX_POWER * 0.5, 0.0, BESS_MAX_POWER * 0.5, BESS_MAX_POWER)
+CURTAIL_OPTIONS = (0.0, 0.5, 1.0)
+CLOUD_SHADING_FACTOR = 0.3
+
+# Candidate table in the old nested-loop order, so ties resolve the same way
+CANDIDATES = np.array(list(itertools.product(TAP_MOVES, BESS_MOVES, CURTAIL_OPTIONS)))
+V_HARD_MIN, V_HARD_MAX = 0.955, 1.045
+
+MPC_SCENARIOS = 32
+MPC_RISK = 0.05   # tolerated probability of leaving 0.955-1.045 pu over the horizon
+
+
+def _score(load, irradiance, current_tap, current_soc, solar_capacity_kw, cloud_shading):
+    """
+    load, irradiance: (scenarios, horizon). Returns the candidate taps, a
+    (candidates,) mask of allowed tap moves, and (candidates, scenarios)
+    costs and violation flags.
+    """
+    load = np.atleast_2d(np.asarray(load, dtype=float))
+    solar = np.atleast_2d(np.asarray(irradiance, dtype=float)) * solar_capacity_kw
+    if cloud_shading:
+        solar = solar * CLOUD_SHADING_FACTOR
+    horizon = load.shape[1]
+    t_move, b_move, c_opt = CANDIDATES.T
+
+    taps = current_tap + t_move
+    allowed = (taps >= 0.90) & (taps <= 1.10)
+    if current_tap > 1.05: allowed &= t_move <= 0
+    if current_tap < 0.95: allowed &= t_move >= 0
+
+    # (candidates, horizon): SOC path depends on the set-point only
+    steps = np.arange(1, horizon + 1)
+    soc_path = current_soc - steps * (b_move[:, None] * 1.0 / BESS_CAPACITY_KWH) * 100
+    soc_cost = 50000.0 * np.count_nonzero((soc_path < 10.0) | (soc_path > 90.0), axis=1)
+    move_cost = 500.0 * (t_move != 0) + 50.0 * (b_move != 0) + c_opt * 2000.0
+
+    # (candidates, scenarios, horizon)
+    net_load = load[None] - solar[None] * (1.0 - c_opt)[:, None, None] - b_move[:, None, None]
+    v_pred = taps[:, None, None] - net_load / VOLTAGE_SENSITIVITY_CONST
+
+    cost = 10000 * np.sum((1.0 - v_pred)**2, axis=2)
+    cost -= 50.0 * np.count_nonzero((v_pred >= 0.99) & (v_pred <= 1.01), axis=2)
+    cost += (soc_cost + move_cost * horizon)[:, None]
+    violated = np.any((v_pred > V_HARD_MAX) | (v_pred < V_HARD_MIN), axis=2)
+    return taps, allowed, cost, violated
+
+
+def plan_dispatch(future_load, future_irradiance, current_tap, current_soc, solar_capacity_kw,
+                  cloud_shading=False):
+    """
+    Best (tap, bess_cmd_kw, curtailment) for the look-ahead.
+
+    future_load: (horizon,) expected feeder load in kW
+    future_irradiance: (horizon,) expected irradiance in suns (0-1)
+    Keeps the current tap and idles BESS/curtailment when no candidate
+    holds the voltage inside 0.955-1.045 pu over the whole horizon.
+    """
+    taps, allowed, cost, violated = _score(future_load, future_irradiance, current_tap, current_soc,
+                                           solar_capacity_kw, cloud_shading)
+    feasible = allowed & ~violated[:, 0]
+    if not feasible.any():
+        return current_tap, 0.0, 0.0
+    best = int(np.argmin(np.where(feasible, cost[:, 0], np.inf)))
+    return taps[best], CANDIDATES[best, 1], CANDIDATES[best, 2]
+
+
+def sample_scenarios(forecast, residuals, k=MPC_SCENARIOS, rng=None, lower=None):
+    """
+    (k, horizon) scenarios around a forecast by bootstrapping whole residual
+    rows (actual - forecast per horizon step), which keeps the error
+    correlation across steps. Without residuals the forecast is the only
+    scenario.
+    """
+    forecast = np.asarray(forecast, dtype=float)
+    if residuals is None or len(residuals) == 0:
+        return forecast[np.newaxis]
+    rng = rng or np.random.default_rng()
+    rows = rng.integers(len(residuals), size=k)
+    scenarios = forecast + residuals[rows, :len(forecast)]
+    return scenarios if lower is None else np.maximum(scenarios, lower)
+
+
+def plan_dispatch_stochastic(load_scenarios, irradiance_scenarios, current_tap, current_soc,
+                             solar_capacity_kw, cloud_shading=False, risk=MPC_RISK):
+    """
+    Best (tap, bess_cmd_kw, curtailment) by expected cost over the scenarios,
+    subject to P(voltage leaves 0.955-1.045 pu) <= risk. Load and irradiance
+    scenarios are paired row by row. If no candidate meets the risk bound the
+    one with the lowest violation probability wins (ties by expected cost).
+    """
+    taps, allowed, cost, violated = _score(load_scenarios, irradiance_scenarios, current_tap, current_soc,
+                                           solar_capacity_kw, cloud_shading)
+    expected = cost.mean(axis=1)
+    p_violation = violated.mean(axis=1)
+    feasible = allowed & (p_violation <= risk)
+    if feasible.any():
+        best = int(np.argmin(np.where(feasible, expected, np.inf)))
+    else:
+        order = np.lexsort((expected, np.where(allowed, p_violation, np.inf)))
+        best = int(order[0])
+    return taps[best], CANDIDATES[best, 1], CANDIDATES[best, 2]
@@ -0,0 +1,209 @@
+"""
+SIMULATION RESULT SINK
+Streams per-tick simulation results into columnar files, so long headless
+runs end with a dataset that can be queried (pandas, pyarrow, DuckDB, ...).
+
+record() copies one tick into preallocated fixed-size batch buffers; a full
+batch is handed to a background writer thread that converts it to Arrow and
+appends it to the files, so disk I/O and compression never run on the tick.
+Only if the writer falls max_pending batches behind does record() wait.
+
+A result directory holds two tables (Parquet, or Arrow IPC with fmt="arrow"):
+  ticks.parquet   one row per tick: clock, grid totals, BESS, frequency, tap,
+                  protection and fault state
+  buses.parquet   one row per bus per tick (long format): seq, hour, bus,
+                  feeder, v_pu, p_kw, q_kvar, pv_kw, i_a
+Every batch becomes one Parquet row group / one IPC record batch.
+
+pyarrow is optional for the rest of the twin and only needed here.
+"""
+import importlib.util
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+ARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+FORMATS = ("parquet", "arrow")   # also the file extensions
+
+BATCH_TICKS = 256
+MAX_PENDING = 4
+
+# (column, source attribute, numpy dtype); strings are kept as Python objects
+TICK_COLUMNS = (
+    ("seq", "seq", np.int64),
+    ("hour", "idx", np.int32),
+    ("published_at", "published_at", np.float64),
+    ("grid_freq_hz", "grid_freq", np.float64),
+    ("p_load_kw", "p_load_total", np.float64),
+    ("pv_kw", "total_pv_gen", np.float64),
+    ("p_net_kw", "p_grid_net", np.float64),
+    ("q_kvar", "q_val", np.float64),
+    ("bess_kw", "p_bess", np.float64),
+    ("bess_soc_pct", "bess_soc", np.float64),
+    ("bess_mode", "bess_mode", object),
+    ("tap_pu", "tap_position", np.float64),
+    ("curtailment", "mpc_curtailment", np.float64),
+    ("xfmr_temp_c", "transformer_thermal", np.float64),
+    ("penetration_pct", "spatial_penetration_pct", np.float64),
+    ("recloser", "recloser_state", object),
+    ("relay_trip", "relay_trip", np.bool_),
+    ("fault_active", "fault_active", np.bool_),
+    ("fault_bus", "fault_bus", object),
+)
+# (column, source attribute); one float32 value per bus per tick
+BUS_COLUMNS = (
+    ("v_pu", "bus_v"),
+    ("p_kw", "bus_p"),
+    ("q_kvar", "bus_q"),
+    ("pv_kw", "bus_pv"),
+    ("i_a", "bus_i"),
+)
+
+
+class ResultSink:
+    """
+    Buffered columnar writer for one run. Works as an engine listener
+    (engine.add_listener(sink.record)) or fed directly with a GridState;
+    snapshots carry seq/published_at, a bare state gets the sink's counter
+    and the wall clock instead.
+    """
+    def __init__(self, out_dir, network, fmt="parquet", batch_ticks=BATCH_TICKS, max_pending=MAX_PENDING,
+                 compression="zstd"):
+        if not ARROW_AVAILABLE:
+            raise RuntimeError("result_sink needs pyarrow (pip install pyarrow)")
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown result format '{fmt}'; expected {list(FORMATS)}")
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir, self.fmt, self.compression = out_dir, fmt, compression
+        self.paths = {table: os.path.join(out_dir, f"{table}.{fmt}") for table in ("ticks", "buses")}
+        self.bus_names = list(network.bus_list)
+        self.bus_feeders = list(network.bus_feeder)
+        self.batch_ticks = batch_ticks
+        self.ticks = 0
+        self.batches_written = 0
+        self.stall_ms = 0.0
+        self._batch = self._new_batch()
+        self._queue = queue.Queue(max_pending)
+        self._error = None
+        self._writer = threading.Thread(target=self._write_loop, name="result-sink-writer", daemon=True)
+        self._writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Tick side ---
+    def _new_batch(self):
+        n, n_bus = self.batch_ticks, len(self.bus_names)
+        return {
+            "n": 0,
+            "ticks": {col: np.empty(n, dtype=dtype) for col, _, dtype in TICK_COLUMNS},
+            "buses": {col: np.empty((n, n_bus), dtype=np.float32) for col, _ in BUS_COLUMNS},
+        }
+
+    def record(self, sim):
+        """Appends one tick (a Snapshot or a GridState)."""
+        if self._error is not None:
+            raise RuntimeError(f"result writer failed: {self._error!r}") from self._error
+        batch, row = self._batch, self._batch["n"]
+        self.ticks += 1
+        ticks = batch["ticks"]
+        for col, attr, _ in TICK_COLUMNS:
+            if attr == "seq":
+                ticks[col][row] = getattr(sim, "seq", self.ticks)
+            elif attr == "published_at":
+                ticks[col][row] = getattr(sim, "published_at", None) or time.time()
+            else:
+                ticks[col][row] = getattr(sim, attr)
+        for col, attr in BUS_COLUMNS:
+            batch["buses"][col][row] = getattr(sim, attr)
+        batch["n"] = row + 1
+        if batch["n"] == self.batch_ticks:
+            self._hand_off()
+
+    def _hand_off(self):
+        batch, self._batch = self._batch, self._new_batch()
+        t0 = time.perf_counter()
+        self._queue.put(batch)
+        self.stall_ms += (time.perf_counter() - t0) * 1e3
+
+    def close(self):
+        """Flushes the partial batch, waits for the writer and closes the files."""
+        if self._writer is None:
+            return
+        if self._batch["n"]:
+            self._hand_off()
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+        if self._error is not None:
+            raise RuntimeError(f"result writer failed: {self._error!r}") from self._error
+
+    # --- Writer thread ---
+    def _write_loop(self):
+        import pyarrow as pa
+
+        writers = {}
+        try:
+            bus_dict = pa.array(self.bus_names)
+            feeder_dict = pa.array(sorted(set(self.bus_feeders)))
+            bus_codes = np.arange(len(self.bus_names), dtype=np.int32)
+            feeder_codes = np.array([feeder_dict.to_pylist().index(f) for f in self.bus_feeders], dtype=np.int32)
+            while True:
+                batch = self._queue.get()
+                if batch is None:
+                    break
+                n, n_bus = batch["n"], len(self.bus_names)
+                ticks = {col: values[:n] for col, values in batch["ticks"].items()}
+                tick_table = pa.RecordBatch.from_pydict({col: pa.array(values) for col, values in ticks.items()})
+                bus_table = pa.RecordBatch.from_pydict({
+                    "seq": np.repeat(ticks["seq"], n_bus),
+                    "hour": np.repeat(ticks["hour"], n_bus),
+                    "bus": pa.DictionaryArray.from_arrays(np.tile(bus_codes, n), bus_dict),
+                    "feeder": pa.DictionaryArray.from_arrays(np.tile(feeder_codes, n), feeder_dict),
+                    **{col: values[:n].reshape(-1) for col, values in batch["buses"].items()},
+                })
+                for table, record_batch in (("ticks", tick_table), ("buses", bus_table)):
+                    if table not in writers:
+                        writers[table] = self._open(table, record_batch.schema)
+                    writers[table].write_batch(record_batch)
+                self.batches_written += 1
+        except Exception as exc:
+            self._error = exc
+            # Keep draining so record() never blocks on a dead writer
+            while self._queue.get() is not None:
+                pass
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+    def _open(self, table, schema):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self.paths[table]
+        if self.fmt == "parquet":
+            return pq.ParquetWriter(path, schema, compression=self.compression)
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        return pa.ipc.new_file(path, schema, options=options)
+
+
+def read_results(out_dir):
+    """(ticks, buses) DataFrames of a finished result directory."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    frames = []
+    for table in ("ticks", "buses"):
+        parquet = os.path.join(out_dir, f"{table}.parquet")
+        if os.path.exists(parquet):
+            frames.append(pq.read_table(parquet).to_pandas())
+        else:
+            with pa.memory_map(os.path.join(out_dir, f"{table}.arrow")) as source:
+                frames.append(pa.ipc.open_file(source).read_all().to_pandas())
+    return tuple(frames)
@@ -0,0 +1,404 @@
+"""
+SCADA INGESTION
+Asyncio ingestion of live field measurements over Modbus/TCP, as an
+alternative to replaying Historical_Data row by row.
+
+Field RTUs (or the bundled stand-in publisher) push scans with Modbus
+function 16, Write Multiple Registers. Each RTU is one unit id and owns a
+fixed block of BUSES_PER_RTU buses (bus_list order); one scan is one write
+starting at register 0:
+
+  registers 0-3         scan timestamp, float64 epoch seconds
+  then per bus (6 regs) V pu, P kW, Q kVAr as float32 (big-endian words)
+
+Pipeline:
+  connection handlers  parse and validate frames; a full ingest queue is
+                       answered with exception 06 (Server Device Busy) and
+                       the points are counted as dropped
+  aligner              files measurements into interval-wide time buckets
+                       (last value wins per bus); a bucket closes once the
+                       wall clock passes its end plus the allowed lateness,
+                       and measurements for closed buckets are counted late
+  on close             the aligned frame gets a batched WLS state estimate
+                       (grid_physics.wls_estimate_batch) and is appended to
+                       the TelemetryStore ring buffer
+
+Counters and the queue depth are exported through the metrics registry
+(metrics.py); `serve --metrics-port` exposes them for scraping.
+
+Run from the repository root:
+    python scada_ingest.py serve --port 5020 --metrics-port 9109
+    python scada_ingest.py publish --port 5020 --scan-hz 10 --late 0.02
+"""
+import argparse
+import asyncio
+import struct
+import time
+
+import numpy as np
+
+import grid_physics
+import metrics
+from grid_network import get_grid_network
+
+MODBUS_PORT = 5020            # 502 needs privileges; local stand-in default
+BUSES_PER_RTU = 16
+TS_REGS, REGS_PER_BUS = 4, 6
+FUNC_WRITE_MULTIPLE = 0x10
+EXC_ILLEGAL_FUNCTION, EXC_ILLEGAL_ADDRESS, EXC_ILLEGAL_VALUE, EXC_BUSY = 1, 2, 3, 6
+MBAP = struct.Struct(">HHHB")          # transaction, protocol (0), length, unit
+WRITE_HEAD = struct.Struct(">BHHB")    # function, start address, quantity, byte count
+
+INTERVAL_S = 1.0              # alignment bucket width
+LATENESS_S = 2.0              # how long a bucket stays open after it ends
+QUEUE_SCANS = 1024            # parsed scans waiting for the aligner
+STORE_FRAMES = 3600
+
+
+# ----------------------------------------------------------
+# MODBUS/TCP FRAMING
+# ----------------------------------------------------------
+def rtu_count(network):
+    return -(-len(network.bus_list) // BUSES_PER_RTU)
+
+
+def rtu_buses(network, unit):
+    """bus_list indices owned by RTU `unit` (1-based, like Modbus unit ids)."""
+    start = (unit - 1) * BUSES_PER_RTU
+    return np.arange(start, min(start + BUSES_PER_RTU, len(network.bus_list)))
+
+
+def encode_scan(transaction, unit, timestamp, v, p, q):
+    """Write Multiple Registers request carrying one RTU scan."""
+    values = np.column_stack((v, p, q)).astype(">f4").tobytes()
+    data = struct.pack(">d", timestamp) + values
+    pdu = WRITE_HEAD.pack(FUNC_WRITE_MULTIPLE, 0, len(data) // 2, len(data)) + data
+    return MBAP.pack(transaction, 0, len(pdu) + 1, unit) + pdu
+
+
+def write_response(transaction, unit, quantity):
+    return MBAP.pack(transaction, 0, 6, unit) + struct.pack(">BHH", FUNC_WRITE_MULTIPLE, 0, quantity)
+
+
+def exception_response(transaction, unit, function, code):
+    return MBAP.pack(transaction, 0, 3, unit) + struct.pack(">BB", function | 0x80, code)
+
+
+class ModbusError(ValueError):
+    def __init__(self, code, msg):
+        super().__init__(msg)
+        self.code = code
+
+
+def parse_scan(network, unit, pdu):
+    """(timestamp, bus indices, (n, 3) float32 [V, P, Q]) from a request PDU."""
+    if pdu[0] != FUNC_WRITE_MULTIPLE:
+        raise ModbusError(EXC_ILLEGAL_FUNCTION, f"function {pdu[0]} not supported")
+    _, start, quantity, nbytes = WRITE_HEAD.unpack_from(pdu)
+    buses = rtu_buses(network, unit) if 1 <= unit <= rtu_count(network) else ()
+    n = (quantity - TS_REGS) // REGS_PER_BUS
+    if start != 0 or len(buses) == 0 or not 0 < n <= len(buses) or quantity != TS_REGS + n * REGS_PER_BUS:
+        raise ModbusError(EXC_ILLEGAL_ADDRESS, f"unit {unit}: bad register range {start}+{quantity}")
+    if nbytes != 2 * quantity or len(pdu) != WRITE_HEAD.size + nbytes:
+        raise ModbusError(EXC_ILLEGAL_VALUE, "byte count does not match quantity")
+    timestamp = struct.unpack_from(">d", pdu, WRITE_HEAD.size)[0]
+    values = np.frombuffer(pdu, ">f4", 3 * n, WRITE_HEAD.size + 8).reshape(n, 3).astype(np.float32)
+    return timestamp, buses[:n], values
+
+
+# ----------------------------------------------------------
+# ALIGNMENT & STORE
+# ----------------------------------------------------------
+class TelemetryStore:
+    """Ring buffer of aligned frames: measured V/P/Q, estimated V and SE cost per bus."""
+    def __init__(self, n_bus, capacity=STORE_FRAMES):
+        self.capacity = capacity
+        self.t = np.full(capacity, np.nan)
+        self.meas = np.full((capacity, n_bus, 3), np.nan, dtype=np.float32)
+        self.est_v = np.full((capacity, n_bus), np.nan, dtype=np.float32)
+        self.se_j = np.full((capacity, n_bus), np.nan, dtype=np.float32)
+        self.count = 0
+
+    def append(self, t, meas, est_v, se_j):
+        k = self.count % self.capacity
+        self.t[k], self.meas[k], self.est_v[k], self.se_j[k] = t, meas, est_v, se_j
+        self.count += 1
+
+    def window(self, n=None):
+        """The last n frames (all retained frames by default), oldest first."""
+        kept = min(self.count, self.capacity)
+        n = kept if n is None else min(n, kept)
+        rows = (np.arange(self.count - n, self.count)) % self.capacity
+        return self.t[rows], self.meas[rows], self.est_v[rows], self.se_j[rows]
+
+    def latest(self):
+        if not self.count:
+            return None
+        t, meas, est_v, se_j = self.window(1)
+        return t[0], meas[0], est_v[0], se_j[0]
+
+
+class Aligner:
+    """Time buckets of width `interval`; a bucket holds the latest value per bus."""
+    def __init__(self, n_bus, interval=INTERVAL_S, lateness=LATENESS_S):
+        self.n_bus, self.interval, self.lateness = n_bus, interval, lateness
+        self.open = {}
+        self.closed_through = None    # highest bucket already closed
+        self.late_points = 0
+
+    def add(self, timestamp, buses, values):
+        bucket = int(timestamp // self.interval)
+        if self.closed_through is not None and bucket <= self.closed_through:
+            self.late_points += values.size
+            return
+        frame = self.open.get(bucket)
+        if frame is None:
+            frame = self.open[bucket] = np.full((self.n_bus, 3), np.nan, dtype=np.float32)
+        frame[buses] = values
+
+    def close_ready(self, now):
+        """[(bucket start time, (n_bus, 3) frame)] for every bucket past its lateness window."""
+        ready = sorted(b for b in self.open if (b + 1) * self.interval + self.lateness <= now)
+        if ready:
+            # Buckets only close in time order, so the newest one is the watermark
+            self.closed_through = ready[-1]
+        return [(b * self.interval, self.open.pop(b)) for b in ready]
+
+
+# ----------------------------------------------------------
+# INGESTION SERVER
+# ----------------------------------------------------------
+class ScadaIngest:
+    def __init__(self, network, host="127.0.0.1", port=MODBUS_PORT, interval=INTERVAL_S, lateness=LATENESS_S,
+                 queue_scans=QUEUE_SCANS, store=None, v_source=1.0):
+        self.network = network
+        self.host, self.port = host, port
+        self.aligner = Aligner(len(network.bus_list), interval, lateness)
+        self.store = store or TelemetryStore(len(network.bus_list))
+        self.v_source = v_source
+        dist = np.maximum([network.dist_map.get(b, 1.0) for b in network.bus_list], 1e-6)
+        self._R = grid_physics.LINE_IMPEDANCE_PER_UNIT_DIST.real * dist
+        self._X = grid_physics.LINE_IMPEDANCE_PER_UNIT_DIST.imag * dist
+        self._queue = asyncio.Queue(queue_scans)
+        self._server = None
+        self._tasks = []
+        self.scans = self.points = 0
+        self.dropped_points = 0
+        self.rejected_scans = 0
+        self.frames = 0
+        self.queue_high = 0
+        self.se_ms = 0.0
+        self._export_metrics()
+
+    def _export_metrics(self):
+        for name, doc, attr in (("scada_points_total", "Measurement points accepted", "points"),
+                                ("scada_dropped_points_total", "Points refused with Server Device Busy", "dropped_points"),
+                                ("scada_rejected_scans_total", "Malformed or invalid scans", "rejected_scans"),
+                                ("scada_frames_total", "Aligned frames state-estimated and stored", "frames")):
+            metrics.counter(name, doc).set_function(lambda attr=attr: getattr(self, attr))
+        metrics.counter("scada_late_points_total", "Points for buckets that had already closed").set_function(
+            lambda: self.aligner.late_points)
+        metrics.gauge("scada_queue_depth", "Parsed scans waiting for the aligner").set_function(self._queue.qsize)
+        metrics.gauge("scada_open_buckets", "Alignment buckets still open").set_function(lambda: len(self.aligner.open))
+        metrics.gauge("scada_se_seconds", "Duration of the last batched state estimate").set_function(
+            lambda: self.se_ms / 1e3)
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._tasks = [asyncio.ensure_future(self._align_loop()), asyncio.ensure_future(self._close_loop())]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+
+    def stats(self):
+        return {
+            "scans": self.scans, "points": self.points, "dropped_points": self.dropped_points,
+            "late_points": self.aligner.late_points, "rejected_scans": self.rejected_scans,
+            "frames": self.frames, "open_buckets": len(self.aligner.open),
+            "queue": self._queue.qsize(), "queue_high": self.queue_high, "last_se_ms": round(self.se_ms, 3),
+        }
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readexactly(MBAP.size)
+                transaction, protocol, length, unit = MBAP.unpack(head)
+                if protocol != 0 or length < 2:
+                    break
+                pdu = await reader.readexactly(length - 1)
+                try:
+                    timestamp, buses, values = parse_scan(self.network, unit, pdu)
+                except ModbusError as exc:
+                    self.rejected_scans += 1
+                    writer.write(exception_response(transaction, unit, pdu[0], exc.code))
+                    continue
+                except (struct.error, ValueError, IndexError):
+                    self.rejected_scans += 1
+                    writer.write(exception_response(transaction, unit, pdu[0] if pdu else 0, EXC_ILLEGAL_VALUE))
+                    continue
+                if self._queue.full():
+                    # Backpressure: the RTU gets "busy" and decides to retry or skip
+                    self.dropped_points += values.size
+                    writer.write(exception_response(transaction, unit, FUNC_WRITE_MULTIPLE, EXC_BUSY))
+                else:
+                    self._queue.put_nowait((timestamp, buses, values))
+                    self.queue_high = max(self.queue_high, self._queue.qsize())
+                    writer.write(write_response(transaction, unit, TS_REGS + len(buses) * REGS_PER_BUS))
+                    self.scans += 1
+                    self.points += values.size
+                # Stop reading this connection while its responses back up
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _align_loop(self):
+        while True:
+            scan = await self._queue.get()
+            self.aligner.add(*scan)
+            # Drain whatever else is already queued in one go
+            while not self._queue.empty():
+                self.aligner.add(*self._queue.get_nowait())
+
+    async def _close_loop(self):
+        interval = self.aligner.interval
+        while True:
+            await asyncio.sleep(interval / 4)
+            for t, meas in self.aligner.close_ready(time.time()):
+                self._publish_frame(t, meas)
+
+    def _publish_frame(self, t, meas):
+        t0 = time.perf_counter()
+        est_v = np.full(len(meas), np.nan, dtype=np.float32)
+        se_j = np.full(len(meas), np.nan, dtype=np.float32)
+        seen = ~np.isnan(meas).any(axis=1)
+        if seen.any():
+            z = meas[seen].astype(float) * np.array([1.0, 1e-3, 1e-3])
+            est_v[seen], se_j[seen] = grid_physics.wls_estimate_batch(self._R[seen], self._X[seen], z, self.v_source)
+        self.store.append(t, meas, est_v, se_j)
+        self.frames += 1
+        self.se_ms = (time.perf_counter() - t0) * 1e3
+
+
+# ----------------------------------------------------------
+# STAND-IN PUBLISHER
+# ----------------------------------------------------------
+async def run_publisher(network, host="127.0.0.1", port=MODBUS_PORT, scan_hz=10.0, seconds=10.0, late=0.0,
+                        lateness=LATENESS_S, plant=None, window=4, seed=0):
+    """
+    One Modbus/TCP connection per RTU, each writing a scan every 1/scan_hz s
+    with up to `window` requests in flight. Values come from the twin's own
+    network solve plus SCADA noise; a `late` fraction of scans is stamped
+    older than the lateness window to exercise late-data accounting.
+    """
+    rng = np.random.default_rng(seed)
+    bus0 = network.bus_list[0]
+    state = grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0)
+    if plant is not None:
+        grid_physics.refresh(state, plant)
+        base = np.column_stack((state.bus_v, state.bus_p, state.bus_q))
+    else:
+        n = len(network.bus_list)
+        base = np.column_stack((np.ones(n), np.full(n, 50.0), np.full(n, 20.0)))
+    totals = {"sent": 0, "acked": 0, "busy": 0, "errors": 0, "late_sent": 0}
+    ack_ms = []
+
+    async def rtu(unit):
+        reader, writer = await asyncio.open_connection(host, port)
+        buses = rtu_buses(network, unit)
+        in_flight = {}
+        slots = asyncio.Semaphore(window)
+
+        async def responses():
+            while True:
+                transaction, _, length, _ = MBAP.unpack(await reader.readexactly(MBAP.size))
+                body = await reader.readexactly(length - 1)
+                sent_at = in_flight.pop(transaction, None)
+                slots.release()
+                if body[0] & 0x80:
+                    totals["busy" if body[1] == EXC_BUSY else "errors"] += 1
+                else:
+                    totals["acked"] += 1
+                    if sent_at is not None:
+                        ack_ms.append((time.perf_counter() - sent_at) * 1e3)
+
+        receiver = asyncio.ensure_future(responses())
+        period, transaction = 1.0 / scan_hz, 0
+        next_at = time.monotonic() + rng.uniform(0, period)
+        end = time.monotonic() + seconds
+        try:
+            while time.monotonic() < end:
+                await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+                next_at += period
+                await slots.acquire()
+                stamp = time.time()
+                if late and rng.random() < late:
+                    stamp -= lateness + 2 * INTERVAL_S
+                    totals["late_sent"] += 1
+                noise = rng.normal(0.0, [0.002, 0.5, 0.2], size=(len(buses), 3))
+                meas = base[buses] * (1 + 0.01 * np.sin(stamp / 60.0)) + noise
+                transaction = (transaction + 1) & 0xFFFF
+                in_flight[transaction] = time.perf_counter()
+                writer.write(encode_scan(transaction, unit, stamp, *meas.T))
+                totals["sent"] += 1
+                await writer.drain()
+            # Let the last responses arrive
+            for _ in range(window):
+                await asyncio.wait_for(slots.acquire(), 2.0)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            receiver.cancel()
+            writer.close()
+
+    await asyncio.gather(*(rtu(unit) for unit in range(1, rtu_count(network) + 1)))
+    totals["ack_p50_ms"] = float(np.percentile(ack_ms, 50)) if ack_ms else float("nan")
+    totals["ack_p95_ms"] = float(np.percentile(ack_ms, 95)) if ack_ms else float("nan")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=("serve", "publish"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=MODBUS_PORT)
+    parser.add_argument("--interval", type=float, default=INTERVAL_S, help="Alignment bucket width (s)")
+    parser.add_argument("--lateness", type=float, default=LATENESS_S)
+    parser.add_argument("--scan-hz", type=float, default=10.0, help="Publisher: scans per second per RTU")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Publisher: run time")
+    parser.add_argument("--late", type=float, default=0.0, help="Publisher: fraction of scans sent late")
+    parser.add_argument("--metrics-port", type=int, help="Serve: also expose /metrics on this port")
+    args = parser.parse_args()
+    network = get_grid_network()
+
+    async def serve():
+        ingest = await ScadaIngest(network, args.host, args.port, args.interval, args.lateness).start()
+        print(f"modbus/tcp ingestion on {args.host}:{ingest.port}, {rtu_count(network)} RTUs "
+              f"x {BUSES_PER_RTU} buses, {args.interval}s buckets")
+        if args.metrics_port is not None:
+            metrics.serve(args.host, args.metrics_port)
+            print(f"metrics on http://{args.host}:{args.metrics_port}/metrics")
+        while True:
+            await asyncio.sleep(5.0)
+            print(ingest.stats())
+
+    async def publish():
+        from sim_engine import load_plant
+        totals = await run_publisher(network, args.host, args.port, args.scan_hz, args.seconds, args.late,
+                                     args.lateness, plant=load_plant())
+        print(totals)
+
+    try:
+        asyncio.run(serve() if args.mode == "serve" else publish())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
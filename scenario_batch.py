@@ -0,0 +1,204 @@
+"""
+SCENARIO BATCH RUNNER
+Runs every combination of a declarative scenario matrix through the headless
+simulation (headless.run_headless) on a process pool, one scenario per task
+and one worker per core, and writes a KPI table with one row per scenario:
+bus voltage extremes and violations, tap operations, MPC curtailment, BESS
+cycles, frequency nadir, transformer hot spot and protection trips.
+
+Matrix file (JSON); each key under "matrix" is an axis, every combination of
+their values is one scenario, "base" applies to all of them:
+    {
+      "hours": 8760,
+      "base": {"auto_tap_mode": true},
+      "matrix": {
+        "spatial_penetration_pct": [10, 50, 100],
+        "cloud_shading": [false, true],
+        "mpc_active": [false, true],
+        "bess_active": [false, true],
+        "fault": [null, "bus1003@4000+6", ["bus1003@200+6", "bus2030@5000"]]
+      }
+    }
+Axes are operator set-points (sim_engine.SETTABLE) or "fault", which takes
+headless --fault specs (BUS@TICK[+HOURS]; a list, or specs joined by ";",
+for several faults in one scenario). MPC scenarios plan with
+headless.lookahead_planner.
+
+Run from the repository root:
+    python scenario_batch.py scenarios.json --out results/sweep.csv
+    python scenario_batch.py --hours 720 --axis spatial_penetration_pct=10,50,100 --axis bess_active=false,true
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import grid_physics
+from headless import lookahead_planner, parse_fault, run_headless
+from sim_engine import SETTABLE, load_plant
+
+# ANSI C84.1 range A service voltage
+V_LIMITS = (0.95, 1.05)
+
+_PLANT = None
+
+
+class ScenarioKPIs:
+    """
+    Per-tick KPI accumulator; run_headless feeds it like a result sink
+    (record(state) after every tick). Ticks are hours, so kW sums are kWh.
+    """
+    def __init__(self, plant, v_limits=V_LIMITS):
+        self.plant = plant
+        self.v_lo, self.v_hi = v_limits
+        self.v_min, self.v_max = np.inf, -np.inf
+        self.violation_bus_hours = self.violation_hours = 0
+        self.freq_nadir, self.freq_peak = np.inf, -np.inf
+        self.thermal_peak = -np.inf
+        self.trips = 0
+        self.soc_throughput = 0.0
+        self.curtailed_kwh = self.pv_kwh = 0.0
+        self.import_peak_kw = -np.inf
+        self.reverse_flow_hours = 0
+        self._relay_trip = False
+        self._soc = None
+
+    def record(self, state):
+        v = state.bus_v
+        self.v_min = min(self.v_min, float(v.min()))
+        self.v_max = max(self.v_max, float(v.max()))
+        out = int(np.count_nonzero((v < self.v_lo) | (v > self.v_hi)))
+        self.violation_bus_hours += out
+        self.violation_hours += out > 0
+        self.freq_nadir = min(self.freq_nadir, state.grid_freq)
+        self.freq_peak = max(self.freq_peak, state.grid_freq)
+        self.thermal_peak = max(self.thermal_peak, state.transformer_thermal)
+        self.trips += state.relay_trip and not self._relay_trip
+        self._relay_trip = state.relay_trip
+        if self._soc is not None:
+            self.soc_throughput += abs(state.bess_soc - self._soc)
+        self._soc = state.bess_soc
+        if state.mpc_curtailment:
+            self.curtailed_kwh += state.mpc_curtailment * grid_physics.pv_fleet_potential(state, self.plant, state.idx)
+        self.pv_kwh += state.total_pv_gen
+        self.import_peak_kw = max(self.import_peak_kw, state.p_grid_net)
+        self.reverse_flow_hours += state.p_grid_net < 0
+
+    def summary(self, state):
+        return dict(
+            v_min_pu=self.v_min, v_max_pu=self.v_max, violation_hours=self.violation_hours,
+            violation_bus_hours=self.violation_bus_hours, tap_ops=state.tap_moves_count,
+            curtailed_mwh=self.curtailed_kwh / 1e3, pv_mwh=self.pv_kwh / 1e3,
+            # One full cycle is 0 -> 100 -> 0 %
+            soc_cycles=self.soc_throughput / 200.0, freq_nadir_hz=self.freq_nadir, freq_peak_hz=self.freq_peak,
+            thermal_peak_c=self.thermal_peak, trips=self.trips, import_peak_kw=self.import_peak_kw,
+            reverse_flow_hours=self.reverse_flow_hours,
+        )
+
+
+def expand(spec):
+    """Scenario dicts (id, settings, faults, hours) for every combination of the matrix axes."""
+    hours = int(spec.get("hours", 8760))
+    base = dict(spec.get("base", {}))
+    matrix = dict(spec.get("matrix", {}))
+    unknown = (set(base) | set(matrix)) - SETTABLE - {"fault"}
+    if unknown:
+        raise ValueError(f"not operator-settable: {sorted(unknown)}")
+    axes = list(matrix)
+    scenarios = []
+    for i, values in enumerate(itertools.product(*(matrix[a] for a in axes))):
+        settings = {**base, **dict(zip(axes, values))}
+        fault = settings.pop("fault", None)
+        faults = fault.split(";") if isinstance(fault, str) else list(fault or [])
+        scenarios.append(dict(scenario=i, axes=dict(zip(axes, values)), settings=settings,
+                              faults=[parse_fault(f) for f in faults], hours=hours))
+    return scenarios
+
+
+def _init_worker():
+    global _PLANT
+    _PLANT = load_plant()
+
+
+def run_scenario(scenario, seed=0):
+    """One KPI row. Runs in a pool worker (the plant is loaded once per worker)."""
+    plant = _PLANT if _PLANT is not None else load_plant()
+    kpis = ScenarioKPIs(plant)
+    planner = lookahead_planner(plant) if scenario["settings"].get("mpc_active") else None
+    t0 = time.perf_counter()
+    state = run_headless(plant, scenario["hours"], scenario["settings"], kpis, scenario["faults"],
+                         mpc_planner=planner, seed=seed + scenario["scenario"])
+    row = {"scenario": scenario["scenario"]}
+    row.update({k: json.dumps(v) if isinstance(v, list) else "none" if v is None else v
+                for k, v in scenario["axes"].items()})
+    row.update(kpis.summary(state))
+    row["run_s"] = time.perf_counter() - t0
+    return row
+
+
+def run_batch(scenarios, workers=None, seed=0, progress=None):
+    """KPI table (DataFrame, one row per scenario in matrix order)."""
+    rows = []
+    with ProcessPoolExecutor(workers or os.cpu_count(), initializer=_init_worker) as pool:
+        futures = [pool.submit(run_scenario, s, seed) for s in scenarios]
+        for future in as_completed(futures):
+            rows.append(future.result())
+            if progress is not None:
+                progress(rows[-1], len(rows), len(scenarios))
+    return pd.DataFrame(rows).sort_values("scenario").reset_index(drop=True)
+
+
+def _axis(text):
+    key, _, values = text.partition("=")
+    parsed = []
+    for value in values.split(","):
+        try:
+            parsed.append(json.loads(value))
+        except ValueError:
+            parsed.append(value)
+    return key, parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("matrix", nargs="?", help="Scenario matrix JSON file")
+    parser.add_argument("--axis", action="append", default=[], type=_axis, metavar="KEY=V1,V2,...",
+                        help="Add (or replace) a matrix axis (repeatable)")
+    parser.add_argument("--hours", type=int, help="Ticks per scenario (overrides the file)")
+    parser.add_argument("--workers", type=int, help="Pool size (default: one per core)")
+    parser.add_argument("--seed", type=int, default=0, help="Scenario i runs with NumPy seed SEED + i")
+    parser.add_argument("--out", default="results/scenarios.csv")
+    args = parser.parse_args()
+
+    spec = {}
+    if args.matrix:
+        with open(args.matrix) as f:
+            spec = json.load(f)
+    spec.setdefault("matrix", {}).update(dict(args.axis))
+    if args.hours is not None:
+        spec["hours"] = args.hours
+    scenarios = expand(spec)
+    workers = args.workers or os.cpu_count()
+    print(f"{len(scenarios)} scenarios x {scenarios[0]['hours']} hours on {workers} workers")
+
+    def progress(row, done, total):
+        print(f"  [{done}/{total}] scenario {row['scenario']} in {row['run_s']:.1f}s")
+
+    t0 = time.perf_counter()
+    table = run_batch(scenarios, workers, args.seed, progress)
+    wall = time.perf_counter() - t0
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    table.to_csv(args.out, index=False)
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.float_format", "{:.3f}".format):
+        print(table.drop(columns="run_s").to_string(index=False))
+    print(f"\n{wall:.1f}s wall for {table['run_s'].sum():.1f}s of scenario time "
+          f"({table['run_s'].sum() / wall:.1f}x); KPI table: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""
+SHARED SIMULATION ENGINE
+One process-wide simulation thread owns the grid state (grid_physics.GridState)
+and advances it once per tick, however many dashboard sessions are open. After
+every tick it publishes an immutable Snapshot; sessions only read the latest
+snapshot and render it, so per-session cost no longer includes any physics.
+
+Operator actions (toggles, set-points, fault injection, restart, moving the
+feeder panel) are commands on a queue. The engine thread applies them between
+ticks under the state lock, re-solves the views if the clock is paused, and
+republishes, so a session sees its own command take effect on its next rerun.
+
+Other consumers (telemetry_server.py) register a listener and are handed every
+new snapshot as it is published.
+
+The engine also keeps a timeline.Timeline of state checkpoints, so the
+"seek" command can jump to any hour with consistent dynamic state (with
+prefill=True a background thread keeps PREFILL_CHECKPOINTS checkpoints ready
+ahead of the live hour, topping them up as the run passes checkpoints and
+after every command that invalidates them), and a
+tick_profiler.TickProfiler with per-stage tick timings. A tick that takes
+longer than its `speed` budget is logged as an "Overrun" event. Tick latency,
+tick rate, overruns and the command queue depth are exported through the
+metrics registry (metrics.py).
+"""
+import collections
+import queue
+import threading
+import time
+import types
+
+import numpy as np
+import pandas as pd
+
+import grid_physics
+import metrics
+from feeder_data import load_feeder_data
+from grid_network import get_grid_network
+from tick_profiler import TickProfiler
+from timeline import CHECKPOINT_HOURS, Timeline
+
+# Replay data for headless engines (the dashboard loads its own copies)
+CSV_PATH = "Historical_Data/Total_P&Q.csv"
+SOLAR_CSV = "Historical_Data/solardata.csv"
+
+# State fields operators may set directly through the "set" command
+SETTABLE = frozenset({
+    "run_simulation", "speed", "cloud_shading", "mpc_active", "mpc_stochastic", "bess_active",
+    "spatial_penetration_pct", "enable_smart_inverter", "fdi_attack", "auto_tap_mode", "tap_position",
+    "apfc_auto_mode", "capacitor_bank_kvAr", "hvac_setpoint", "compact_histories",
+})
+
+# Commands _apply understands besides "set" and "seek"
+_COMMANDS = frozenset({"restart", "inject_fault", "clear_fault", "monitor_bus"})
+
+# Clock pacing and retention only: setting these does not change what the run computes
+_PACING = frozenset({"run_simulation", "speed", "compact_histories"})
+
+# At most one "Overrun" audit event per this many seconds (all are counted)
+OVERRUN_LOG_S = 30.0
+
+# Background prefill starts once commands have been quiet this long (slider drags invalidate repeatedly)
+PREFILL_DELAY_S = 2.0
+# Checkpoints the background prefill keeps ahead of the live hour (a week): with MPC on every prefilled
+# hour costs a forecast per series, and whatever lies beyond is reached by replaying from the last one
+PREFILL_CHECKPOINTS = 7
+
+_STOP = object()
+
+# Per-tick updates are one histogram observe and one deque append; the rest is read on scrape
+TICK_SECONDS = metrics.histogram("grid_engine_tick_seconds", "Wall time of one engine tick (physics, checkpoint, publish)")
+OVERRUNS = metrics.counter("grid_engine_overruns_total", "Ticks that took longer than their speed budget")
+RATE_WINDOW = 32
+
+
+class Snapshot(types.SimpleNamespace):
+    """Read-only view of the grid state after one tick."""
+    def __setattr__(self, name, value):
+        raise AttributeError("simulation snapshots are read-only; send a command to the engine")
+
+    __delattr__ = __setattr__
+
+
+def _frozen(value):
+    if isinstance(value, list):
+        return tuple(value)
+    if isinstance(value, dict):
+        return types.MappingProxyType(dict(value))
+    if isinstance(value, np.ndarray) and value.flags.writeable:
+        value = value.copy()
+        value.flags.writeable = False
+    return value
+
+
+def take_snapshot(state, seq=0, tick_ms=0.0):
+    # The RNG belongs to the engine thread; readers never draw from it
+    fields = {k: _frozen(v) for k, v in vars(state).items() if k != "rng"}
+    fields.update(seq=seq, tick_ms=tick_ms, published_at=time.time())
+    return Snapshot(**fields)
+
+
+def load_plant(csv_path=CSV_PATH, solar_csv=SOLAR_CSV, feeder_data=None):
+    """Plant from the historical data (all three feeders), for engines running without the dashboard."""
+    df_raw = pd.read_csv(csv_path)
+    solar = pd.read_csv(solar_csv).iloc[:, 0].values.astype(float)
+    feeders = feeder_data if feeder_data is not None else load_feeder_data()
+    return grid_physics.build_plant(get_grid_network(), df_raw["Total_Active_Power"].values,
+                                    df_raw["Total_Reac_Power"].values, feeders.columns("p"), solar / solar.max(),
+                                    feeder_q=feeders.columns("q"))
+
+
+class SimulationEngine:
+    """
+    Background owner of one GridState. start() launches the tick thread;
+    snapshot() is lock-free; execute() queues a command and waits until it
+    is applied. Without a running thread execute() applies commands inline,
+    which is how headless scripts drive the engine.
+    """
+    def __init__(self, plant, mpc_planner=None, state=None, checkpoint_every=CHECKPOINT_HOURS, prefill=False,
+                 prefill_planner=None):
+        self.plant = plant
+        self.mpc_planner = mpc_planner
+        # Plans the prefill's scratch run; must not feed or cache into what the live planner serves
+        self.prefill_planner = mpc_planner if prefill_planner is None else prefill_planner
+        self.prefill = prefill
+        bus0 = plant.network.bus_list[0] if plant.network.bus_list else ""
+        self.state = state or grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0)
+        self._lock = threading.Lock()
+        self._commands = queue.Queue()
+        self._thread = None
+        self._seq = 0
+        self._snapshot = None
+        self._listeners = []
+        self._stale_views = False
+        self.timeline = Timeline(checkpoint_every)
+        self._prefill_thread = None
+        self._prefill_wanted = threading.Event()
+        self._prefill_stop = threading.Event()
+        self.profiler = TickProfiler()
+        self._overrun_logged = 0.0
+        self._overruns_unlogged = 0
+        self._tick_times = collections.deque(maxlen=RATE_WINDOW)
+        self._export_metrics()
+        with self._lock:
+            grid_physics.refresh(self.state, plant)
+            self.timeline.record(self.state, force=True)
+            self._publish(0.0)
+
+    # --- Lifecycle ---
+    def start(self):
+        if self.alive:
+            return
+        self._thread = threading.Thread(target=self._run, name="grid-sim-engine", daemon=True)
+        self._thread.start()
+        if self.prefill and self._prefill_thread is None:
+            self._prefill_stop.clear()
+            self._prefill_wanted.set()
+            self._prefill_thread = threading.Thread(target=self._prefill_loop, name="grid-sim-prefill", daemon=True)
+            self._prefill_thread.start()
+
+    def stop(self, timeout=5.0):
+        prefill = self._prefill_thread
+        if prefill is not None:
+            self._prefill_stop.set()
+            self._prefill_wanted.set()
+            prefill.join(timeout)
+            self._prefill_thread = None
+        thread = self._thread
+        if thread is None:
+            return
+        self._commands.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # --- Reading ---
+    def snapshot(self):
+        return self._snapshot
+
+    def add_listener(self, fn):
+        """
+        fn(snapshot) runs on the engine thread after every publish, under the
+        state lock: it must only hand the snapshot off (e.g. call_soon_threadsafe).
+        """
+        self._listeners = self._listeners + [fn]
+
+    def remove_listener(self, fn):
+        self._listeners = [f for f in self._listeners if f != fn]
+
+    def _publish(self, tick_ms):
+        self._seq += 1
+        # A single reference swap: readers see the old or the new snapshot, never a mix
+        snap = self._snapshot = take_snapshot(self.state, self._seq, tick_ms)
+        for fn in self._listeners:
+            try:
+                fn(snap)
+            except Exception:
+                # A broken consumer must never stall the tick
+                self.remove_listener(fn)
+
+    def ticks_per_second(self):
+        """Measured tick rate over the last RATE_WINDOW ticks; 0 once the clock stops."""
+        times = tuple(self._tick_times)
+        if len(times) < 2 or not self.state.run_simulation:
+            return 0.0
+        return (len(times) - 1) / max(times[-1] - times[0], 1e-9)
+
+    def _export_metrics(self):
+        # Scrape-time views of this engine (the process has one; the latest engine is exported)
+        metrics.gauge("grid_engine_ticks_per_second", "Measured tick rate").set_function(self.ticks_per_second)
+        metrics.gauge("grid_engine_command_queue_depth", "Operator commands waiting for the engine thread"
+                      ).set_function(self._commands.qsize)
+        metrics.gauge("grid_engine_running", "1 while the simulation clock runs").set_function(
+            lambda: float(self.state.run_simulation))
+        metrics.gauge("grid_engine_sim_hour", "Simulation clock (hour of the replay year)").set_function(
+            lambda: self.state.idx)
+        metrics.gauge("grid_engine_listeners", "Snapshot listeners (telemetry servers)").set_function(
+            lambda: len(self._listeners))
+        metrics.gauge("grid_engine_timeline_checkpoints", "Checkpoints held for seeks").set_function(
+            lambda: len(self.timeline))
+        metrics.gauge("grid_engine_stage_p95_seconds", "95th percentile of each tick stage and page render "
+                      "over the profiler window", ("stage",)).set_function(
+            lambda: {(row["name"],): row["p95_ms"] / 1e3 for row in self.profiler.stats()})
+
+    # --- Commands ---
+    def execute(self, name, timeout=5.0, **kwargs):
+        """Applies one operator command and returns the snapshot that includes it."""
+        if not self.alive:
+            with self._lock:
+                self._apply(name, kwargs)
+                self._after_commands()
+            return self._snapshot
+        done = {"event": threading.Event(), "error": None}
+        self._commands.put((name, kwargs, done))
+        if not done["event"].wait(timeout):
+            raise TimeoutError(f"simulation engine did not apply '{name}' within {timeout}s")
+        if done["error"] is not None:
+            raise done["error"]
+        return self._snapshot
+
+    def prefill_timeline(self, until=None):
+        """
+        Checkpoints ahead of the live run (by default up to PREFILL_CHECKPOINTS
+        checkpoints past the live hour) so seeks into that range are short.
+        Runs on the calling thread (about a millisecond per simulated hour,
+        plus the prefill planner's forecasts) on a scratch state; the engine
+        keeps ticking.
+        """
+        if until is None:
+            until = min(self.state.idx + PREFILL_CHECKPOINTS * self.timeline.every, len(self.plant.total_p) - 1)
+        return self.timeline.prefill(self.plant, until, self.prefill_planner, stop=self._prefill_stop)
+
+    def _prefill_loop(self):
+        while True:
+            self._prefill_wanted.wait()
+            # Wait for the commands to settle
+            while self._prefill_wanted.is_set() and not self._prefill_stop.is_set():
+                self._prefill_wanted.clear()
+                self._prefill_stop.wait(PREFILL_DELAY_S)
+            if self._prefill_stop.is_set():
+                return
+            try:
+                self.prefill_timeline()
+            except Exception:
+                # Seeks still work without prefilled checkpoints, only slower
+                pass
+
+    def _invalidate_after(self, hour):
+        """The run diverges after `hour`: drop later checkpoints and prefill again."""
+        self.timeline.invalidate_after(hour)
+        self._want_prefill()
+
+    def _want_prefill(self):
+        if self._prefill_thread is not None:
+            self._prefill_wanted.set()
+
+    def _apply(self, name, kw):
+        state = self.state
+        if name == "seek":
+            hour = int(kw["hour"])
+            t0 = time.perf_counter()
+            ticks = self.timeline.seek(state, self.plant, hour, self.mpc_planner)
+            grid_physics.log_event(state, "Timeline", "Seek", f"Jumped to hour {hour} "
+                                   f"({ticks} ticks replayed in {(time.perf_counter() - t0) * 1e3:.0f} ms)")
+            # The prefill window follows the live hour
+            self._want_prefill()
+            # The views are the ones computed for that hour; a refresh would step the feeder controls again
+            return
+        # Reject bad commands before anything is marked stale or invalidated
+        if name == "set":
+            unknown = set(kw) - SETTABLE - {"log"}
+            if unknown:
+                raise ValueError(f"not operator-settable: {sorted(unknown)}")
+        elif name not in _COMMANDS:
+            raise ValueError(f"unknown simulation command '{name}'")
+        self._stale_views = True
+        if not (name == "set" and set(kw) <= _PACING | {"log"}):
+            # The run diverges here: later checkpoints no longer describe it
+            self._invalidate_after(state.idx)
+        if name == "set":
+            log = kw.pop("log", None)
+            for key, value in kw.items():
+                setattr(state, key, value)
+            if log:
+                grid_physics.log_event(state, *log)
+        elif name == "restart":
+            grid_physics.restart(state)
+            # A new run: nothing recorded so far belongs to it
+            self._invalidate_after(-1)
+        elif name == "inject_fault":
+            state.fault_active = True
+            state.fault_bus = kw["bus"]
+            state.fault_type = kw["fault_type"]
+            grid_physics.log_event(state, "Contingency", "Fault", f"Injected: {kw['fault_type']}")
+        elif name == "clear_fault":
+            state.fault_active = False
+            state.relay_trip = False
+            state.recloser_state = "CLOSED"
+            grid_physics.log_event(state, *kw.get("log", ("Restoration", "Manual", "Fault Cleared by Operator")))
+        elif name == "monitor_bus":
+            if kw["bus"] != state.monitored_bus:
+                grid_physics.log_event(state, "Operator", "Monitor",
+                                       f"Feeder panel moved from {state.monitored_bus} to {kw['bus']}")
+                state.monitored_bus = kw["bus"]
+                if state.run_simulation:
+                    # Don't leave the new bus blank until the next tick (paused: refresh covers it)
+                    state.feeder = grid_physics.feeder_solve(state, self.plant, state.monitored_bus, state.idx)
+
+    def _after_commands(self):
+        if self._stale_views:
+            if not self.state.run_simulation:
+                # Paused clock: views still follow the operator's changes
+                grid_physics.refresh(self.state, self.plant)
+            # The run continues from the changed state
+            self.timeline.record(self.state)
+        self._stale_views = False
+        self._publish(0.0)
+
+    # --- Tick loop ---
+    def _run(self):
+        next_tick = time.monotonic() + self.state.speed
+        while True:
+            wait = max(0.0, next_tick - time.monotonic()) if self.state.run_simulation else 0.5
+            try:
+                cmd = self._commands.get(timeout=wait)
+            except queue.Empty:
+                cmd = None
+            if cmd is _STOP:
+                return
+            if cmd is not None:
+                self._drain_commands(cmd)
+                continue
+            if not self.state.run_simulation:
+                next_tick = time.monotonic() + self.state.speed
+                continue
+            profiler = self.profiler
+            with self._lock:
+                profiler.begin()
+                try:
+                    grid_physics.tick(self.state, self.plant, self.mpc_planner, profiler)
+                except Exception as exc:
+                    # Keep serving the last good state: pause and tell the operators why
+                    self.state.run_simulation = False
+                    grid_physics.log_event(self.state, "Engine", "Error", f"Simulation paused: {exc!r}")
+                self.timeline.record(self.state)
+                if self.state.idx % self.timeline.every == 0:
+                    # One checkpoint further: top the prefill window up
+                    self._want_prefill()
+                profiler.lap("checkpoint")
+                self._publish(profiler.elapsed_ms())
+                profiler.lap("publish")
+                tick_ms = profiler.end()
+                self._check_budget(tick_ms)
+            TICK_SECONDS.observe(tick_ms / 1e3)
+            self._tick_times.append(time.monotonic())
+            # Fixed cadence; after an overrun the schedule restarts from now
+            next_tick = max(next_tick + self.state.speed, time.monotonic())
+
+    def _check_budget(self, tick_ms):
+        overrun = self.profiler.check_budget(tick_ms, self.state.speed * 1e3)
+        if overrun is None:
+            return
+        OVERRUNS.inc()
+        self._overruns_unlogged += 1
+        now = time.monotonic()
+        if now - self._overrun_logged < OVERRUN_LOG_S:
+            return
+        stage, stage_ms = overrun
+        more = f" (+{self._overruns_unlogged - 1} more since the last report)" if self._overruns_unlogged > 1 else ""
+        # Shows up with the next publish
+        grid_physics.log_event(self.state, "Engine", "Overrun",
+                               f"Tick took {tick_ms:.1f} ms of its {self.state.speed * 1e3:.0f} ms budget; "
+                               f"slowest stage {stage} ({stage_ms:.1f} ms){more}")
+        self._overrun_logged = now
+        self._overruns_unlogged = 0
+
+    def _drain_commands(self, first):
+        batch = [first]
+        while True:
+            try:
+                batch.append(self._commands.get_nowait())
+            except queue.Empty:
+                break
+        stop = _STOP in batch
+        with self._lock:
+            for cmd in batch:
+                if cmd is _STOP:
+                    continue
+                name, kwargs, done = cmd
+                try:
+                    self._apply(name, kwargs)
+                except Exception as exc:
+                    done["error"] = exc
+            self._after_commands()
+        for cmd in batch:
+            if cmd is not _STOP:
+                cmd[2]["event"].set()
+        if stop:
+            self._commands.put(_STOP)
@@ -0,0 +1,200 @@
+"""
+BINARY TELEMETRY FRAMES
+Compact per-tick frames for live views that patch existing plot traces
+instead of redrawing complete Plotly figures (telemetry_server.py /ws?codec=bin
+and the static/live_client.html renderer).
+
+A frame is a small header followed by field records. All numbers are
+little-endian float32; a key frame carries every field in full, a delta frame
+only what changed since the previous frame of the same stream:
+
+  header   magic "DTB1" | flags u8 (1 = key, 2 = zlib body) | pad u8
+           | seq u32 | base_seq u32 (delta applies on top of it) | published_at f64
+  record   field u8 | kind u8 | count u16 | data
+           DENSE  count float32 values (the whole field)
+           SPARSE count u16 element indices, then count float32 values
+           APPEND count float32 values appended to a history trace
+           TEXT   count bytes of UTF-8 JSON (rarely changing status strings)
+
+Unchanged fields are left out of delta frames entirely; a field switches to
+SPARSE when few of its elements changed. Histories go out as APPEND records
+while they grow, and DENSE again after a restart or a seek replaced them
+(GridState.history_epoch). With compress=True the record body
+is zlib-deflated whenever that makes it smaller.
+
+A client can only apply a delta on top of base_seq. The server tracks what
+each client last received and sends it the key frame instead whenever that
+doesn't match (first frame, dropped frames, changed subscription).
+"""
+import json
+import struct
+import zlib
+
+import numpy as np
+
+from grid_physics import PLOT_HISTORY
+
+MAGIC = b"DTB1"
+HEADER = struct.Struct("<4sBBIId")
+RECORD = struct.Struct("<BBH")
+FLAG_KEY, FLAG_ZLIB = 1, 2
+DENSE, SPARSE, APPEND, TEXT = 0, 1, 2, 3
+
+# Grid-wide values sent as one float32 vector (field "scalars")
+SCALARS = (
+    "idx", "grid_freq", "p_load_total", "total_pv_gen", "p_bess", "p_grid_net", "q_val",
+    "delta_p", "delta_q", "bess_soc", "tap_position", "mpc_curtailment", "transformer_thermal",
+    "spatial_penetration_pct", "room_temp",
+)
+# Per-bus arrays, restricted to the stream's bus selection (field "buses" lists it)
+BUS_ARRAYS = ("bus_v", "bus_p", "bus_q", "bus_pv", "bus_i")
+HISTORIES = ("global_v_history", "global_pf_history", "global_j_history")
+STATUS = ("run_simulation", "fault_active", "fault_bus", "fault_type", "relay_trip", "recloser_state",
+          "bess_mode", "mpc_active", "bess_active", "fdi_attack")
+
+FIELDS = ("scalars", "buses", "status") + BUS_ARRAYS + HISTORIES
+FIELD_ID = {name: k for k, name in enumerate(FIELDS)}
+
+
+class FrameError(ValueError):
+    pass
+
+
+class BinaryFrame:
+    """One tick of one stream: the delta is encoded up front, the key frame on first use."""
+    __slots__ = ("seq", "base_seq", "delta", "encoder", "_values", "_key")
+
+    def __init__(self, seq, base_seq, delta, encoder, values):
+        self.seq, self.base_seq, self.delta = seq, base_seq, delta
+        self.encoder, self._values, self._key = encoder, values, None
+
+    @property
+    def key(self):
+        if self._key is None:
+            self._key = self.encoder._pack(self.seq, 0, *self._values, None, True)
+        return self._key
+
+
+class FrameEncoder:
+    """Turns successive snapshots of one stream (bus selection) into BinaryFrames."""
+    def __init__(self, network, selection=None, compress=False):
+        self.rows = np.arange(len(network.bus_list)) if selection is None else np.asarray(selection, dtype=int)
+        self.compress = compress
+        self.last = None          # most recent BinaryFrame
+        self._prev = None
+
+    def encode(self, snap):
+        values = self._values(snap)
+        prev = self._prev
+        if prev is None:
+            base_seq, delta = 0, self._pack(snap.seq, 0, snap.published_at, values, None, True)
+        else:
+            base_seq, delta = prev[0], self._pack(snap.seq, prev[0], snap.published_at, values, prev[1], False)
+        self._prev = (snap.seq, values)
+        frame = BinaryFrame(snap.seq, base_seq, delta, self, (snap.published_at, values))
+        if prev is None:
+            frame._key = delta
+        self.last = frame
+        return frame
+
+    def _values(self, snap):
+        values = {
+            "scalars": np.array([getattr(snap, name) for name in SCALARS], dtype=np.float32),
+            "buses": self.rows.astype(np.float32),
+            "status": json.dumps({name: getattr(snap, name) for name in STATUS}, separators=(",", ":"),
+                                 default=lambda v: v.item()).encode(),
+        }
+        for name in BUS_ARRAYS:
+            values[name] = np.asarray(getattr(snap, name), dtype=np.float32)[self.rows]
+        for name in HISTORIES:
+            # Histories only grow within an epoch; the length tells a delta how many values are new
+            hist = getattr(snap, name)
+            values[name] = (snap.history_epoch, len(hist), np.array(hist[-PLOT_HISTORY:], dtype=np.float32))
+        return values
+
+    def _pack(self, seq, base_seq, published_at, values, prev, key):
+        body = bytearray()
+        for name in FIELDS:
+            cur = values[name]
+            old = None if key else prev[name]
+            if name == "status":
+                if key or cur != old:
+                    body += RECORD.pack(FIELD_ID[name], TEXT, len(cur)) + cur
+            elif name in HISTORIES:
+                epoch, n, tail = cur
+                if key or epoch != old[0] or n < old[1]:
+                    body += _record(name, DENSE, tail)
+                elif n > old[1]:
+                    body += _record(name, APPEND, tail[-min(n - old[1], len(tail)):])
+            elif key or cur.shape != old.shape:
+                body += _record(name, DENSE, cur)
+            else:
+                changed = np.flatnonzero(cur != old)
+                if len(changed) == 0:
+                    continue
+                # Sparse costs 6 bytes per changed element, dense 4 per element
+                if 6 * len(changed) < 4 * len(cur):
+                    body += RECORD.pack(FIELD_ID[name], SPARSE, len(changed))
+                    body += changed.astype("<u2").tobytes() + cur[changed].astype("<f4").tobytes()
+                else:
+                    body += _record(name, DENSE, cur)
+        flags = FLAG_KEY if key else 0
+        if self.compress:
+            packed = zlib.compress(bytes(body), 6)
+            if len(packed) < len(body):
+                body, flags = packed, flags | FLAG_ZLIB
+        return HEADER.pack(MAGIC, flags, 0, seq, base_seq, published_at) + bytes(body)
+
+
+def _record(name, kind, values):
+    return RECORD.pack(FIELD_ID[name], kind, len(values)) + values.astype("<f4").tobytes()
+
+
+class FrameDecoder:
+    """
+    Client-side state rebuilt from a stream of frames (the reference for the
+    JavaScript decoder in static/live_client.html). apply() returns the names
+    of the fields the frame touched, i.e. the traces a renderer must patch.
+    """
+    def __init__(self):
+        self.seq = None
+        self.published_at = None
+        self.values = {}
+
+    def apply(self, data):
+        magic, flags, _, seq, base_seq, published_at = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise FrameError("not a telemetry frame")
+        if not flags & FLAG_KEY and base_seq != self.seq:
+            raise FrameError(f"delta for seq {base_seq} but client is at {self.seq}")
+        body = memoryview(data)[HEADER.size:]
+        if flags & FLAG_ZLIB:
+            body = memoryview(zlib.decompress(body))
+        if flags & FLAG_KEY:
+            self.values = {}
+        touched, pos = [], 0
+        while pos < len(body):
+            field, kind, n = RECORD.unpack_from(body, pos)
+            pos += RECORD.size
+            name = FIELDS[field]
+            if kind == TEXT:
+                self.values[name] = json.loads(bytes(body[pos:pos + n]))
+                pos += n
+            elif kind == SPARSE:
+                idx = np.frombuffer(body, "<u2", n, pos)
+                pos += 2 * n
+                arr = self.values[name] = self.values[name].copy()
+                arr[idx] = np.frombuffer(body, "<f4", n, pos)
+                pos += 4 * n
+            else:
+                vals = np.frombuffer(body, "<f4", n, pos)
+                pos += 4 * n
+                if kind == APPEND:
+                    vals = np.concatenate((self.values[name], vals))[-PLOT_HISTORY:]
+                self.values[name] = vals
+            touched.append(name)
+        self.seq, self.published_at = seq, published_at
+        return touched
+
+    def scalar(self, name):
+        return float(self.values["scalars"][SCALARS.index(name)])
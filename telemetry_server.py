@@ -0,0 +1,472 @@
+"""
+TELEMETRY SERVER
+Headless asyncio server around the shared simulation engine (sim_engine.py)
+that streams every published snapshot to local clients: bus voltages and
+flows, frequency, BESS state of charge and protection state.
+
+Endpoints (plain HTTP/1.1 on one port, standard library only):
+  GET /stream?feeder=A,B&bus=bus1003   Server-Sent Events, one frame per tick
+  GET /ws?feeder=C                     WebSocket, one text message per tick; the
+                                       client may send {"feeder": [...], "bus": [...]}
+                                       to change its subscription
+  GET /ws?codec=bin&compress=1         WebSocket with binary delta frames
+                                       (telemetry_codec.py) instead of JSON
+  GET /snapshot?bus=bus2005            the latest frame as one JSON document
+  GET /stats                           subscriber, frame and drop counters
+  GET /metrics                         the process metrics registry (metrics.py) in
+                                       the Prometheus text format
+  GET /layout                          static topology for renderers (bus
+                                       names, coordinates, feeders, line segments)
+  GET /live                            lightweight live view (static/live_client.html)
+                                       that patches its plots from binary frames
+
+Without filters a subscription covers every bus; feeder and bus filters are
+combined (union). Feeders are the topology's A/B/C plus SUB (source bus).
+
+Backpressure is per client: each subscriber has a small bounded queue and a
+client that can't keep up loses its oldest frames (telemetry is latest-wins),
+which are counted. The engine thread never waits on the network: its listener
+only schedules the fan-out on the event loop. Each frame is encoded once per
+distinct filter and shared by every subscriber using that filter; a binary
+subscriber gets the shared delta frame when it holds the frame the delta
+builds on, and the full key frame otherwise (e.g. after drops).
+
+Run from the repository root:
+    python telemetry_server.py --port 8765 --speed 1.0
+    curl -N "http://127.0.0.1:8765/stream?feeder=A"
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import metrics
+
+from grid_network import FEEDERS, SUBSTATION, normalize_bus_name
+from sim_engine import SimulationEngine, load_plant
+from telemetry_codec import BinaryFrame, FrameEncoder
+
+QUEUE_FRAMES = 4              # frames buffered per client before the oldest is dropped
+WRITE_BUFFER_BYTES = 64 * 1024
+MAX_REQUEST_BYTES = 16 * 1024
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+LIVE_CLIENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "live_client.html")
+CODECS = ("json", "bin")
+
+
+class SubscriptionError(ValueError):
+    pass
+
+
+def bus_selection(network, feeders=(), buses=()):
+    """Bus indices (bus_list order) for a subscription, or None for every bus."""
+    feeders = {f.upper() for f in feeders}
+    buses = {normalize_bus_name(b) for b in buses}
+    unknown = feeders - set(FEEDERS) - {SUBSTATION}
+    if unknown:
+        raise SubscriptionError(f"unknown feeder(s) {sorted(unknown)}; expected {list(FEEDERS) + [SUBSTATION]}")
+    unknown = buses - set(network.bus_list)
+    if unknown:
+        raise SubscriptionError(f"unknown bus(es) {sorted(unknown)}")
+    if not feeders and not buses:
+        return None
+    return tuple(k for k, (bus, feeder) in enumerate(zip(network.bus_list, network.bus_feeder))
+                 if feeder in feeders or bus in buses)
+
+
+def telemetry_frame(snap, network, selection=None):
+    """JSON-able frame of one snapshot, restricted to the selected buses."""
+    if selection is None:
+        rows, names = slice(None), list(network.bus_list)
+    else:
+        rows, names = list(selection), [network.bus_list[k] for k in selection]
+
+    def col(values, digits):
+        return np.round(values[rows], digits).tolist()
+
+    return {
+        "seq": snap.seq,
+        "hour": int(snap.idx),
+        "published_at": round(snap.published_at, 3),
+        "grid": {
+            "freq_hz": round(float(snap.grid_freq), 4),
+            "p_net_kw": round(float(snap.p_grid_net), 2),
+            "q_kvar": round(float(snap.q_val), 2),
+            "pv_kw": round(float(snap.total_pv_gen), 2),
+            "bess_kw": round(float(snap.p_bess), 2),
+            "bess_mode": snap.bess_mode,
+            "soc_pct": round(float(snap.bess_soc), 3),
+            "tap_pu": round(float(snap.tap_position), 4),
+            "xfmr_temp_c": round(float(snap.transformer_thermal), 2),
+        },
+        "protection": {
+            "recloser": snap.recloser_state,
+            "relay_trip": bool(snap.relay_trip),
+            "fault_active": bool(snap.fault_active),
+            "fault_bus": snap.fault_bus if snap.fault_active else None,
+            "fault_type": snap.fault_type if snap.fault_active else None,
+        },
+        "buses": {
+            "name": names,
+            "v_pu": col(snap.bus_v, 5),
+            "p_kw": col(snap.bus_p, 2),
+            "q_kvar": col(snap.bus_q, 2),
+            "pv_kw": col(snap.bus_pv, 2),
+            "i_a": col(snap.bus_i, 2),
+        },
+    }
+
+
+def encode_frame(snap, network, selection=None):
+    return json.dumps(telemetry_frame(snap, network, selection), separators=(",", ":")).encode()
+
+
+def topology_layout(network):
+    """Everything static a renderer needs once, so per-tick frames carry only values."""
+    return {
+        "bus": list(network.bus_list),
+        "x": [network.bus_coords[b][0] for b in network.bus_list],
+        "y": [network.bus_coords[b][1] for b in network.bus_list],
+        "feeder": list(network.bus_feeder),
+        "transformer": [b in network.transformer_nodes for b in network.bus_list],
+        "edge_x": list(network.edge_x),
+        "edge_y": list(network.edge_y),
+    }
+
+
+class Subscriber:
+    """One client's bounded frame queue; full queue = drop the oldest frame."""
+    def __init__(self, selection, transport, max_frames=QUEUE_FRAMES, codec="json", compress=False):
+        self.selection = selection
+        self.transport = transport
+        self.codec, self.compress = codec, compress
+        self.frames = asyncio.Queue(max_frames)
+        self.sent = 0
+        self.dropped = 0
+        self.holds = None         # (encoder, seq) of the last binary frame sent
+
+    @property
+    def stream(self):
+        return self.selection, self.codec, self.compress
+
+    def offer(self, payload):
+        if self.frames.full():
+            self.frames.get_nowait()
+            self.dropped += 1
+        self.frames.put_nowait(payload)
+
+    def payload(self, item):
+        if not isinstance(item, BinaryFrame):
+            return item
+        # A delta is only valid on top of the frame it was encoded against
+        data = item.delta if self.holds == (item.encoder, item.base_seq) else item.key
+        self.holds = (item.encoder, item.seq)
+        return data
+
+
+# ----------------------------------------------------------
+# WEBSOCKET FRAMING (RFC 6455, server side)
+# ----------------------------------------------------------
+def ws_accept_key(client_key):
+    return base64.b64encode(hashlib.sha1((client_key + WS_GUID).encode()).digest()).decode()
+
+def ws_frame(payload, opcode=0x1):
+    """Unmasked, unfragmented server frame."""
+    n = len(payload)
+    if n < 126:
+        head = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        head = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return head + payload
+
+async def ws_read(reader):
+    """(opcode, payload) of the next client frame; client frames are always masked."""
+    b0, b1 = await reader.readexactly(2)
+    n = b1 & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if n > MAX_REQUEST_BYTES:
+        raise ConnectionError("websocket message too large")
+    mask = await reader.readexactly(4) if b1 & 0x80 else b"\0\0\0\0"
+    data = np.frombuffer(await reader.readexactly(n), dtype=np.uint8)
+    payload = (data ^ np.resize(np.frombuffer(mask, dtype=np.uint8), n)).tobytes()
+    return b0 & 0x0F, payload
+
+
+class TelemetryServer:
+    def __init__(self, engine, host="127.0.0.1", port=8765, queue_frames=QUEUE_FRAMES):
+        self.engine = engine
+        self.network = engine.plant.network
+        self.host, self.port = host, port
+        self.queue_frames = queue_frames
+        self.subscribers = set()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.fanout_ms = 0.0
+        self._encoders = {}       # binary stream -> FrameEncoder holding its previous frame
+        self._loop = None
+        self._server = None
+        self._export_metrics()
+
+    def _export_metrics(self):
+        def by_transport():
+            counts = {("sse",): 0, ("ws",): 0}
+            for sub in tuple(self.subscribers):
+                counts[(sub.transport,)] += 1
+            return counts
+
+        metrics.gauge("telemetry_subscribers", "Connected telemetry clients", ("transport",)).set_function(by_transport)
+        metrics.gauge("telemetry_queued_frames", "Frames waiting in subscriber queues").set_function(
+            lambda: sum(sub.frames.qsize() for sub in tuple(self.subscribers)))
+        metrics.counter("telemetry_frames_sent_total", "Frames written to clients").set_function(
+            lambda: self.frames_sent)
+        metrics.counter("telemetry_frames_dropped_total", "Frames dropped from full subscriber queues").set_function(
+            lambda: self.frames_dropped)
+        metrics.gauge("telemetry_fanout_seconds", "Duration of the last fan-out").set_function(
+            lambda: self.fanout_ms / 1e3)
+
+    # --- Lifecycle ---
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_REQUEST_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.engine.add_listener(self._on_publish)
+        return self
+
+    async def stop(self):
+        self.engine.remove_listener(self._on_publish)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    # --- Fan-out ---
+    def _on_publish(self, snap):
+        # Engine thread: hand off and return immediately
+        self._loop.call_soon_threadsafe(self._fan_out, snap)
+
+    def _fan_out(self, snap):
+        t0 = time.perf_counter()
+        encoded = {}
+        for sub in tuple(self.subscribers):
+            payload = encoded.get(sub.stream)
+            if payload is None:
+                payload = encoded[sub.stream] = self._encode(snap, sub)
+            before = sub.dropped
+            sub.offer(payload)
+            self.frames_dropped += sub.dropped - before
+        # Forget the delta state of binary streams nobody subscribes to any more
+        for stream in set(self._encoders) - set(encoded):
+            del self._encoders[stream]
+        self.fanout_ms = (time.perf_counter() - t0) * 1e3
+
+    def _encode(self, snap, sub):
+        if sub.codec == "json":
+            return encode_frame(snap, self.network, sub.selection)
+        return self._encoder(sub.stream).encode(snap)
+
+    def _encoder(self, stream):
+        encoder = self._encoders.get(stream)
+        if encoder is None:
+            encoder = self._encoders[stream] = FrameEncoder(self.network, stream[0], stream[2])
+        return encoder
+
+    def stats(self):
+        snap = self.engine.snapshot()
+        return {
+            "subscribers": len(self.subscribers),
+            "sse": sum(s.transport == "sse" for s in self.subscribers),
+            "websocket": sum(s.transport == "ws" for s in self.subscribers),
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "last_fanout_ms": round(self.fanout_ms, 3),
+            "seq": snap.seq,
+            "hour": int(snap.idx),
+            "tick_ms": round(snap.tick_ms, 3),
+        }
+
+    # --- HTTP ---
+    async def _handle(self, reader, writer):
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_BYTES)
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {k.strip().lower(): v.strip() for k, v in (l.split(":", 1) for l in lines[1:] if ":" in l)}
+            url = urlsplit(target)
+            query = parse_qs(url.query)
+            if method != "GET":
+                return await self._respond(writer, 405, {"error": "GET only"})
+            try:
+                selection = bus_selection(self.network, _csv(query, "feeder"), _csv(query, "bus"))
+            except SubscriptionError as exc:
+                return await self._respond(writer, 400, {"error": str(exc)})
+            codec = query.get("codec", ["json"])[-1]
+            if codec not in CODECS:
+                return await self._respond(writer, 400, {"error": f"unknown codec '{codec}'; expected {list(CODECS)}"})
+            compress = query.get("compress", ["0"])[-1] in ("1", "true")
+
+            if url.path == "/stream":
+                if codec != "json":
+                    return await self._respond(writer, 400, {"error": "binary frames are served on /ws only"})
+                await self._serve_sse(reader, writer, selection)
+            elif url.path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self._serve_ws(reader, writer, headers, selection, codec, compress)
+            elif url.path == "/snapshot":
+                await self._respond(writer, 200, telemetry_frame(self.engine.snapshot(), self.network, selection))
+            elif url.path == "/stats":
+                await self._respond(writer, 200, self.stats())
+            elif url.path == "/metrics":
+                await self._respond(writer, 200, metrics.REGISTRY.render().encode(), metrics.CONTENT_TYPE)
+            elif url.path == "/layout":
+                await self._respond(writer, 200, topology_layout(self.network))
+            elif url.path == "/live":
+                with open(LIVE_CLIENT, "rb") as f:
+                    await self._respond(writer, 200, f.read(), "text/html; charset=utf-8")
+            else:
+                await self._respond(writer, 404, {"error": f"no route {url.path}"})
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        await writer.drain()
+
+    def _subscribe(self, selection, transport, codec="json", compress=False):
+        sub = Subscriber(selection, transport, self.queue_frames, codec, compress)
+        # Start with the current state instead of waiting up to one tick
+        snap = self.engine.snapshot()
+        if codec == "json":
+            sub.offer(encode_frame(snap, self.network, selection))
+        else:
+            # The stream's latest frame (as a key frame), so the next shared delta applies
+            encoder = self._encoder(sub.stream)
+            sub.offer(encoder.last or encoder.encode(snap))
+        self.subscribers.add(sub)
+        return sub
+
+    async def _pump(self, writer, sub, wrap, stopper, control=None):
+        """Writes the subscriber's frames (and control replies) until `stopper` finishes."""
+        while not stopper.done():
+            getter = asyncio.ensure_future(sub.frames.get())
+            waiting = {getter, stopper}
+            if control is not None:
+                ctrl = asyncio.ensure_future(control.get())
+                waiting.add(ctrl)
+            done, pending = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending - {stopper}:
+                task.cancel()
+            if control is not None and ctrl in done:
+                opcode, payload = ctrl.result()
+                writer.write(ws_frame(payload, opcode))
+                if opcode == 0x8:
+                    break
+            if getter in done:
+                writer.write(wrap(sub.payload(getter.result())))
+                sub.sent += 1
+                self.frames_sent += 1
+            # Blocks only this client; meanwhile its queue drops old frames
+            await writer.drain()
+        # Close handshake reply queued just before the client left
+        while control is not None and not control.empty():
+            opcode, payload = control.get_nowait()
+            writer.write(ws_frame(payload, opcode))
+
+    async def _serve_sse(self, reader, writer, selection):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Connection: keep-alive\r\nAccess-Control-Allow-Origin: *\r\n\r\n")
+        sub = self._subscribe(selection, "sse")
+        # SSE clients send nothing after the request: EOF means they are gone
+        eof = asyncio.ensure_future(reader.read())
+        try:
+            await self._pump(writer, sub, lambda payload: b"data: " + payload + b"\n\n", eof)
+        finally:
+            eof.cancel()
+            self.subscribers.discard(sub)
+
+    async def _serve_ws(self, reader, writer, headers, selection, codec="json", compress=False):
+        key = headers.get("sec-websocket-key")
+        if not key:
+            return await self._respond(writer, 400, {"error": "missing Sec-WebSocket-Key"})
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + ws_accept_key(key).encode() + b"\r\n\r\n")
+        sub = self._subscribe(selection, "ws", codec, compress)
+        control = asyncio.Queue()
+        receiver = asyncio.ensure_future(self._ws_receive(reader, sub, control))
+        wrap = ws_frame if codec == "json" else (lambda payload: ws_frame(payload, 0x2))
+        try:
+            await self._pump(writer, sub, wrap, receiver, control)
+        finally:
+            receiver.cancel()
+            self.subscribers.discard(sub)
+
+    async def _ws_receive(self, reader, sub, control):
+        """Client messages: subscription changes, ping, close. Returns when the client leaves."""
+        while True:
+            try:
+                opcode, payload = await ws_read(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            if opcode == 0x8:
+                await control.put((0x8, payload[:2]))
+                return
+            if opcode == 0x9:
+                await control.put((0xA, payload))
+            elif opcode == 0x1:
+                try:
+                    req = json.loads(payload)
+                    sub.selection = bus_selection(self.network, req.get("feeder", ()), req.get("bus", ()))
+                except (ValueError, AttributeError) as exc:
+                    await control.put((0x1, json.dumps({"error": str(exc)}).encode()))
+
+
+def _csv(query, name):
+    return [v for item in query.get(name, ()) for v in item.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--speed", type=float, default=1.0, help="Seconds per simulation tick")
+    parser.add_argument("--penetration", type=int, default=10, help="Solar penetration slider (%%)")
+    parser.add_argument("--queue-frames", type=int, default=QUEUE_FRAMES)
+    args = parser.parse_args()
+
+    engine = SimulationEngine(load_plant())
+    engine.execute("set", speed=args.speed, spatial_penetration_pct=args.penetration, run_simulation=True)
+    engine.start()
+    server = TelemetryServer(engine, args.host, args.port, args.queue_frames)
+    print(f"telemetry on http://{args.host}:{args.port} (/stream, /ws, /snapshot, /stats, /metrics, /live); tick every {args.speed}s")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+
+
+if __name__ == "__main__":
+    main()
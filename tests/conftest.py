@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def plant():
+    """The replay plant from the repository's historical data (all three feeders)."""
+    from sim_engine import load_plant
+
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        return load_plant()
+    finally:
+        os.chdir(cwd)
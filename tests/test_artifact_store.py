@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+import pytest
+
+import forecasting
+from artifact_store import META_FILE, ArtifactStore, artifact_key, data_digest
+from fallback_forecaster import LagLeastSquares
+
+
+def writer(text):
+    def write(entry_dir):
+        with open(os.path.join(entry_dir, "model.txt"), "w") as fout:
+            fout.write(text)
+    return write
+
+
+def read(store, key):
+    with open(os.path.join(store.path(key), "model.txt")) as fin:
+        return fin.read()
+
+
+def test_key_follows_array_content():
+    key = artifact_key("models", np.arange(24.0), {"units": 16})
+    assert artifact_key("models", np.arange(24.0), {"units": 16}) == key
+    assert artifact_key("models", np.arange(24.0) + 1, {"units": 16}) != key
+    assert artifact_key("models", np.arange(24), {"units": 16}) != key     # same values, other dtype
+    assert artifact_key("models", np.arange(24.0), {"units": 32}) != key
+
+
+def test_put_publishes_whole_entries_and_keeps_the_first_writer(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.put("k1", writer("first"), {"series": "load"})
+    assert store.has("k1")
+    path, meta = store.open("k1")
+    assert meta == {"series": "load", "key": "k1"}
+    store.put("k1", writer("second"))
+    assert read(store, "k1") == "first"
+    assert [name for name in os.listdir(tmp_path) if name.startswith(".")] == []
+
+
+def test_failed_build_leaves_nothing_behind(tmp_path):
+    def broken(entry_dir):
+        writer("half")(entry_dir)
+        raise RuntimeError("fit diverged")
+
+    store = ArtifactStore(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        store.put("k1", broken)
+    assert not store.has("k1")
+    assert os.listdir(tmp_path) == []
+
+
+def test_evict_drops_the_least_recently_used_unprotected_entries(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_entries=3)
+    for t, key in enumerate(("a", "b", "c", "d")):
+        store.put(key, writer(key))
+        meta = os.path.join(store.path(key), META_FILE)
+        os.utime(meta, (1000 + t, 1000 + t))
+    assert [key for _, key in store.entries()] == ["b", "c", "d"]
+    store.open("b")                      # a load makes it the most recently used
+    store.put("e", writer("e"), protect={"c"})
+    assert sorted(key for _, key in store.entries()) == ["b", "c", "e"]
+
+
+class QueueOnly:
+    """Stands in for training_worker.TrainingWorker: records submissions, trains nothing."""
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, series, values, **kw):
+        self.jobs.append((series, kw['source_digest']))
+        return len(self.jobs)
+
+
+@pytest.fixture
+def series(tmp_path, monkeypatch):
+    """Two months of an hourly series, with the model store and manifest in a scratch directory."""
+    monkeypatch.chdir(tmp_path)
+    hours = np.arange(24 * 60)
+    return 1000.0 + 200.0 * np.sin(2 * np.pi * hours / 24)
+
+
+def publish_set(values, source_digest):
+    kernel = LagLeastSquares().fit(values)
+
+    def write(entry_dir):
+        np.save(os.path.join(entry_dir, "baseline.npy"), np.full(len(values) + forecasting.FORECAST_HORIZON, 1000.0))
+        kernel.save(os.path.join(entry_dir, "kernel.npz"))
+
+    key = f"set-{source_digest}"
+    forecasting.STORE.put(key, write, {'source_digest': source_digest, 'config': forecasting.model_config(False)})
+    forecasting.publish_models(key)
+    return key
+
+
+def test_published_set_of_the_same_source_is_served(series):
+    key = publish_set(series, data_digest(series))
+    worker = QueueOnly()
+    svc = forecasting.ForecastService(series, n_hours=len(series), worker=worker)
+    assert svc.ready and svc.artifact_key == key
+    assert worker.jobs == []
+
+
+def test_published_set_from_other_data_is_never_served(series):
+    publish_set(series, data_digest(series * 1.1))
+    worker = QueueOnly()
+    svc = forecasting.ForecastService(series, n_hours=len(series), worker=worker)
+    assert not svc.ready and svc.artifact_key is None
+    # Rebuilt from its own source instead
+    assert worker.jobs == [("load", data_digest(series))]
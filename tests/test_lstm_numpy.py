@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from lstm_numpy import MinMaxParams, NumpyLSTM, export_lstm_npz, kernel_from_keras
+
+keras = pytest.importorskip("tensorflow").keras
+
+LOOKBACK, UNITS = 24, 16
+TOL = 1e-5
+
+
+def keras_lstm(activation="tanh", recurrent_activation="sigmoid", seed=0):
+    keras.utils.set_random_seed(seed)
+    model = keras.Sequential([
+        keras.Input(shape=(LOOKBACK, 1)),
+        keras.layers.LSTM(UNITS, activation=activation, recurrent_activation=recurrent_activation),
+        keras.layers.Dense(1),
+    ])
+    # Larger than the initializer's weights, so the gates leave their linear range
+    model.set_weights([w * 3.0 for w in model.get_weights()])
+    return model
+
+
+def windows(n=64, seed=1):
+    return np.random.default_rng(seed).uniform(0.0, 1.0, (n, LOOKBACK, 1)).astype(np.float32)
+
+
+@pytest.mark.parametrize("activation, recurrent_activation", [
+    ("tanh", "sigmoid"),          # fused fast path
+    ("tanh", "hard_sigmoid"),
+    ("sigmoid", "sigmoid"),
+])
+def test_forward_pass_matches_keras(activation, recurrent_activation):
+    model = keras_lstm(activation, recurrent_activation)
+    kernel = kernel_from_keras(model)
+    X = windows()
+    expected = np.asarray(model.predict_on_batch(X))
+    np.testing.assert_allclose(kernel.predict_on_batch(X), expected, atol=TOL)
+    # (batch, lookback) windows are accepted too
+    np.testing.assert_allclose(kernel.predict_on_batch(X[..., 0]), expected, atol=TOL)
+
+
+def test_rollout_matches_recursive_keras_predictions():
+    model = keras_lstm()
+    kernel = kernel_from_keras(model)
+    buf = list(windows(1)[0, :, 0])
+    for _ in range(12):
+        window = np.array(buf[-LOOKBACK:], dtype=np.float32).reshape(1, LOOKBACK, 1)
+        buf.append(float(model.predict_on_batch(window)[0, 0]))
+    np.testing.assert_allclose(kernel.rollout(windows(1)[0], 12), buf[LOOKBACK:], atol=1e-4)
+
+
+def test_npz_round_trip_keeps_weights_and_scaler(tmp_path):
+    model = keras_lstm()
+    scaler = MinMaxParams(scale=[1 / 5000.0], min_=[-0.2])
+    path = str(tmp_path / "lstm.npz")
+    exported = export_lstm_npz(model, scaler, path)
+    loaded = NumpyLSTM.load(path)
+
+    assert (loaded.lookback, loaded.units) == (LOOKBACK, UNITS)
+    for a, b in zip(loaded.get_keras_weights(), exported.get_keras_weights()):
+        np.testing.assert_array_equal(a, b)
+    X = windows()
+    np.testing.assert_allclose(loaded.predict_on_batch(X), model.predict_on_batch(X), atol=TOL)
+    kw = np.array([[1000.0], [2500.0]])
+    np.testing.assert_allclose(loaded.scaler.inverse_transform(loaded.scaler.transform(kw)), kw)
+
+
+def test_unsupported_layer_is_rejected():
+    model = keras_lstm(activation="relu")
+    with pytest.raises(ValueError, match="activation"):
+        kernel_from_keras(model)
@@ -0,0 +1,112 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from metrics import CONTENT_TYPE, Counter, Gauge, Histogram, Registry, serve
+
+
+@pytest.fixture
+def registry():
+    # A private registry: the module-level one holds whatever the imported modules registered
+    return Registry()
+
+
+def test_counter_and_gauge_samples(registry):
+    ticks = registry.get_or_create(Counter, "ticks_total", "Ticks run")
+    ticks.inc()
+    ticks.inc(2)
+    speed = registry.get_or_create(Gauge, "speed", "Playback speed")
+    speed.set(0.25)
+    assert registry.render() == ("# HELP speed Playback speed\n"
+                                 "# TYPE speed gauge\n"
+                                 "speed 0.25\n"
+                                 "# HELP ticks_total Ticks run\n"
+                                 "# TYPE ticks_total counter\n"
+                                 "ticks_total 3\n")
+    with pytest.raises(ValueError, match="only go up"):
+        ticks.inc(-1)
+
+
+def test_label_values_and_help_are_escaped(registry):
+    errors = registry.get_or_create(Counter, "errors_total", 'Errors by "page"\nand kind', ("page", "kind"))
+    errors.labels(page="a\\b", kind='say "hi"').inc()
+    errors.labels(page="line\nbreak", kind="x").inc(5)
+    assert errors.render() == [
+        r'# HELP errors_total Errors by \"page\"\nand kind',
+        "# TYPE errors_total counter",
+        r'errors_total{page="a\\b",kind="say \"hi\""} 1',
+        r'errors_total{page="line\nbreak",kind="x"} 5',
+    ]
+    with pytest.raises(ValueError, match="takes labels"):
+        errors.labels("only one")
+
+
+def test_histogram_buckets_are_cumulative_with_inclusive_bounds(registry):
+    latency = registry.get_or_create(Histogram, "tick_seconds", "Tick latency", buckets=(0.5, 0.1, 1.0))
+    for value in (0.1, 0.1, 0.3, 1.0, 7.5):
+        latency.observe(value)
+    assert latency.render()[2:] == [
+        'tick_seconds_bucket{le="0.1"} 2',
+        'tick_seconds_bucket{le="0.5"} 3',
+        'tick_seconds_bucket{le="1"} 4',
+        'tick_seconds_bucket{le="+Inf"} 5',
+        "tick_seconds_sum 9",
+        "tick_seconds_count 5",
+    ]
+
+
+def test_labelled_histogram_puts_le_last(registry):
+    loads = registry.get_or_create(Histogram, "load_seconds", "Model loads", ("series",), buckets=(1.0,))
+    loads.labels("solar").observe(2.0)
+    loads.labels("load").observe(0.5)
+    assert loads.render()[2:] == [
+        'load_seconds_bucket{series="load",le="1"} 1',
+        'load_seconds_bucket{series="load",le="+Inf"} 1',
+        'load_seconds_sum{series="load"} 0.5',
+        'load_seconds_count{series="load"} 1',
+        'load_seconds_bucket{series="solar",le="1"} 0',
+        'load_seconds_bucket{series="solar",le="+Inf"} 1',
+        'load_seconds_sum{series="solar"} 2',
+        'load_seconds_count{series="solar"} 1',
+    ]
+
+
+def test_gauge_functions_are_read_on_scrape(registry):
+    depth = {"cmd": 3, "snap": 0}
+    queues = registry.get_or_create(Gauge, "queue_depth", "Queue depth", ("queue",))
+    queues.set_function(lambda: dict(depth))
+    rss = registry.get_or_create(Gauge, "rss_bytes", "Resident memory")
+    rss.set_function(lambda: None)                     # unknown on this platform: no sample
+    assert queues.render()[2:] == ['queue_depth{queue="cmd"} 3', 'queue_depth{queue="snap"} 0']
+    depth["cmd"] = 1
+    assert queues.render()[2] == 'queue_depth{queue="cmd"} 1'
+    assert rss.render()[2:] == []
+
+    def broken():
+        raise RuntimeError("gone")
+    queues.set_function(broken)
+    assert queues.render()[2:] == []
+
+
+def test_get_or_create_returns_the_registered_metric(registry):
+    ticks = registry.get_or_create(Counter, "ticks_total", "Ticks run")
+    assert registry.get_or_create(Counter, "ticks_total", "Ticks run") is ticks
+    with pytest.raises(ValueError, match="already registered as a counter"):
+        registry.get_or_create(Gauge, "ticks_total", "Ticks run")
+
+
+def test_serve_exposes_the_registry(registry):
+    registry.get_or_create(Counter, "ticks_total", "Ticks run").inc(4)
+    server = serve(port=0, registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(url + "/metrics") as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert response.read().decode() == registry.render()
+        with pytest.raises(urllib.error.HTTPError) as err:
+            urllib.request.urlopen(url + "/nope")
+        assert err.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+import grid_physics
+from headless import lookahead_planner
+from mpc_controller import (
+    BESS_CAPACITY_KWH, BESS_MOVES, CANDIDATES, CLOUD_SHADING_FACTOR, CURTAIL_OPTIONS, TAP_MOVES,
+    VOLTAGE_SENSITIVITY_CONST, _score, plan_dispatch, plan_dispatch_stochastic, sample_scenarios,
+)
+
+HORIZON = 12
+
+
+def reference_candidate(future_load, solar, current_tap, current_soc, t_move, b_move, c_opt):
+    """(cost, violated) of one held candidate, as the nested-loop planner scored it."""
+    steps = np.arange(1, len(future_load) + 1)
+    soc_path = current_soc - steps * (b_move * 1.0 / BESS_CAPACITY_KWH) * 100
+    soc_cost = 50000.0 * np.count_nonzero((soc_path < 10.0) | (soc_path > 90.0))
+    net_load_est = future_load - solar * (1.0 - c_opt) - b_move
+    v_pred = current_tap + t_move - net_load_est / VOLTAGE_SENSITIVITY_CONST
+    cost = soc_cost + 10000 * np.sum((1.0 - v_pred)**2)
+    cost -= 50.0 * np.count_nonzero((v_pred >= 0.99) & (v_pred <= 1.01))
+    move_cost = (500.0 if t_move != 0 else 0.0) + (50.0 if b_move != 0 else 0.0) + c_opt * 2000.0
+    cost += move_cost * len(future_load)
+    return cost, bool(np.any((v_pred > 1.045) | (v_pred < 0.955)))
+
+
+def reference_plan(future_load, future_irradiance, current_tap, current_soc, solar_capacity_kw,
+                   cloud_shading=False):
+    """The nested-loop planner _score replaced, kept as the reference."""
+    future_load = np.asarray(future_load, dtype=float)
+    solar = np.asarray(future_irradiance, dtype=float) * solar_capacity_kw
+    if cloud_shading:
+        solar = solar * CLOUD_SHADING_FACTOR
+    best, min_cost = (current_tap, 0.0, 0.0), float('inf')
+    tap_moves = TAP_MOVES
+    if current_tap > 1.05: tap_moves = (-0.01, 0.0)
+    if current_tap < 0.95: tap_moves = (0.0, 0.01)
+    for t_move in tap_moves:
+        if not (0.90 <= current_tap + t_move <= 1.10): continue
+        for b_move in BESS_MOVES:
+            for c_opt in CURTAIL_OPTIONS:
+                cost, violated = reference_candidate(future_load, solar, current_tap, current_soc,
+                                                     t_move, b_move, c_opt)
+                if not violated and cost < min_cost:
+                    min_cost, best = cost, (current_tap + t_move, b_move, c_opt)
+    return best
+
+
+def cases(n=300, seed=0):
+    """Random look-aheads spanning quiet, overloaded and PV-flooded feeders."""
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        load = rng.uniform(500.0, 9000.0) + rng.normal(0.0, 800.0, HORIZON)
+        irradiance = np.clip(rng.uniform(0.0, 1.0) + rng.normal(0.0, 0.1, HORIZON), 0.0, 1.0)
+        yield (load, irradiance, float(rng.choice([0.89, 0.94, 0.97, 1.0, 1.03, 1.06, 1.10])),
+               float(rng.uniform(5.0, 95.0)), float(rng.uniform(0.0, 8000.0)), bool(rng.integers(2)))
+
+
+def test_plan_dispatch_matches_the_nested_loop_planner():
+    for args in cases():
+        assert plan_dispatch(*args) == pytest.approx(reference_plan(*args))
+
+
+def test_score_matches_per_candidate_evaluation():
+    load, irradiance, tap, soc, capacity, shading = next(cases(seed=1))
+    scenarios = load + np.random.default_rng(2).normal(0.0, 300.0, (5, HORIZON))
+    taps, _, cost, violated = _score(scenarios, np.tile(irradiance, (5, 1)), tap, soc, capacity, shading)
+    assert cost.shape == violated.shape == (len(CANDIDATES), 5)
+    solar = irradiance * capacity * (CLOUD_SHADING_FACTOR if shading else 1.0)
+    for c, (t_move, b_move, c_opt) in enumerate(CANDIDATES):
+        assert taps[c] == pytest.approx(tap + t_move)
+        for k, row in enumerate(scenarios):
+            ref_cost, ref_violated = reference_candidate(row, solar, tap, soc, t_move, b_move, c_opt)
+            assert cost[c, k] == pytest.approx(ref_cost)
+            assert violated[c, k] == ref_violated
+
+
+def test_one_scenario_stochastic_plan_is_the_deterministic_plan():
+    for load, irradiance, tap, soc, capacity, shading in cases(100, seed=3):
+        plan = plan_dispatch(load, irradiance, tap, soc, capacity, shading)
+        if plan == (tap, 0.0, 0.0):
+            continue    # no feasible candidate: the stochastic planner picks the least risky one instead
+        assert plan_dispatch_stochastic(load[None], irradiance[None], tap, soc, capacity, shading,
+                                        risk=0.0) == pytest.approx(plan)
+
+
+def test_sample_scenarios_bootstraps_whole_residual_rows():
+    forecast = np.linspace(1000.0, 2000.0, HORIZON)
+    residuals = np.random.default_rng(4).normal(0.0, 100.0, (50, HORIZON + 6))
+    scenarios = sample_scenarios(forecast, residuals, k=16, rng=np.random.default_rng(5), lower=1100.0)
+    assert scenarios.shape == (16, HORIZON)
+    assert scenarios.min() >= 1100.0
+    # Same generator state, same draw
+    again = sample_scenarios(forecast, residuals, k=16, rng=np.random.default_rng(5), lower=1100.0)
+    np.testing.assert_array_equal(scenarios, again)
+    np.testing.assert_array_equal(sample_scenarios(forecast, None), forecast[None])
+
+
+def test_lookahead_planner_plans_the_dashboard_window(plant):
+    """Perfect-foresight headless MPC plans on [idx, idx + horizon), the hours a forecast row at idx covers."""
+    bus0 = plant.network.bus_list[0]
+    state = grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0, seed=0)
+    state.spatial_penetration_pct = 80
+    capacity = plant.network.active_solar_capacity(state.spatial_penetration_pct)
+    n = len(plant.total_p)
+    for idx in (0, 12, 4000, n - 3):
+        hours = np.arange(idx, idx + 6) % n
+        irradiance = np.array([grid_physics.get_solar_contribution(plant, h) for h in hours])
+        expected = plan_dispatch(plant.total_p[hours], irradiance, state.tap_position, state.bess_soc, capacity)
+        assert lookahead_planner(plant, horizon=6)(state, idx, plant.total_p[idx]) == pytest.approx(expected)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from scada_ingest import (
+    BUSES_PER_RTU, EXC_ILLEGAL_ADDRESS, EXC_ILLEGAL_FUNCTION, EXC_ILLEGAL_VALUE, FUNC_WRITE_MULTIPLE, MBAP,
+    WRITE_HEAD, Aligner, ModbusError, encode_scan, parse_scan, rtu_buses, rtu_count,
+)
+
+TIMESTAMP = 1_700_000_000.25
+
+
+def scan(unit, n, timestamp=TIMESTAMP, seed=0):
+    """(pdu, values) of one scan reporting the first n buses of `unit`."""
+    rng = np.random.default_rng(seed)
+    values = np.column_stack((rng.uniform(0.9, 1.1, n), rng.uniform(0, 500, n), rng.uniform(-50, 50, n)))
+    frame = encode_scan(42, unit, timestamp, *values.T)
+    assert MBAP.unpack_from(frame) == (42, 0, len(frame) - 6, unit)
+    return frame[MBAP.size:], values.astype(np.float32)
+
+
+def pdu(start, quantity, nbytes, data):
+    return WRITE_HEAD.pack(FUNC_WRITE_MULTIPLE, start, quantity, nbytes) + data
+
+
+def test_scan_round_trip(plant):
+    network = plant.network
+    last = rtu_count(network)
+    for unit, n in ((1, BUSES_PER_RTU), (2, 3), (last, len(rtu_buses(network, last)))):
+        data, values = scan(unit, n)
+        timestamp, buses, parsed = parse_scan(network, unit, data)
+        assert timestamp == TIMESTAMP
+        np.testing.assert_array_equal(buses, rtu_buses(network, unit)[:n])
+        np.testing.assert_array_equal(parsed, values)
+        assert parsed.dtype == np.float32 and parsed.flags.writeable
+
+
+def test_last_rtu_owns_the_remainder(plant):
+    network = plant.network
+    owned = np.concatenate([rtu_buses(network, unit) for unit in range(1, rtu_count(network) + 1)])
+    np.testing.assert_array_equal(owned, np.arange(len(network.bus_list)))
+
+
+@pytest.mark.parametrize("unit, make, code", [
+    (1, lambda data: bytes([0x03]) + data[1:], EXC_ILLEGAL_FUNCTION),
+    (0, lambda data: data, EXC_ILLEGAL_ADDRESS),
+    (999, lambda data: data, EXC_ILLEGAL_ADDRESS),
+    (1, lambda data: pdu(6, 10, 20, data[WRITE_HEAD.size:]), EXC_ILLEGAL_ADDRESS),       # not at register 0
+    (1, lambda data: pdu(0, 11, 22, data[WRITE_HEAD.size:] + b"\0\0"), EXC_ILLEGAL_ADDRESS),  # half a bus
+    (1, lambda data: pdu(0, 4 + 6 * (BUSES_PER_RTU + 1), 8 + 12 * (BUSES_PER_RTU + 1), bytes(8 + 12 * (BUSES_PER_RTU + 1))),
+     EXC_ILLEGAL_ADDRESS),                                                                  # more buses than the RTU has
+    (1, lambda data: pdu(0, 10, 22, data[WRITE_HEAD.size:]), EXC_ILLEGAL_VALUE),           # byte count off
+    (1, lambda data: data[:-2], EXC_ILLEGAL_VALUE),                                        # truncated
+])
+def test_malformed_scans_are_refused(plant, unit, make, code):
+    data, _ = scan(1, 1)
+    with pytest.raises(ModbusError) as err:
+        parse_scan(plant.network, unit, make(data))
+    assert err.value.code == code
+
+
+def test_aligner_keeps_the_latest_value_per_bus_and_bucket():
+    aligner = Aligner(n_bus=4, interval=1.0, lateness=2.0)
+    aligner.add(10.2, np.array([0, 1]), np.array([[1.0, 10, 1], [1.01, 20, 2]], dtype=np.float32))
+    aligner.add(10.7, np.array([1]), np.array([[1.02, 30, 3]], dtype=np.float32))
+    aligner.add(11.1, np.array([2]), np.array([[0.99, 40, 4]], dtype=np.float32))
+    assert aligner.close_ready(12.99) == []
+    [(start, frame)] = aligner.close_ready(13.0)
+    assert start == 10.0
+    np.testing.assert_array_equal(frame[:2], np.array([[1.0, 10, 1], [1.02, 30, 3]], dtype=np.float32))
+    assert np.isnan(frame[2:]).all()
+    assert list(aligner.open) == [11]
+
+
+def test_points_for_closed_buckets_are_counted_late():
+    aligner = Aligner(n_bus=4, interval=1.0, lateness=2.0)
+    point = np.array([[1.0, 10, 1]], dtype=np.float32)
+    aligner.add(10.5, np.array([0]), point)
+    aligner.add(12.5, np.array([0]), point)
+    assert [start for start, _ in aligner.close_ready(13.5)] == [10.0]
+    aligner.add(10.9, np.array([1]), point)                         # its bucket closed
+    aligner.add(8.0, np.array([0, 1]), np.vstack([point, point]))   # older than anything closed
+    assert aligner.late_points == 3 + 6
+    aligner.add(11.2, np.array([0]), point)                         # bucket 11 never opened: still on time
+    assert [start for start, _ in aligner.close_ready(15.0)] == [11.0, 12.0]
+    assert aligner.late_points == 9 and aligner.open == {}
@@ -0,0 +1,85 @@
+import pytest
+
+import grid_physics
+from sim_engine import PREFILL_CHECKPOINTS, SimulationEngine
+
+
+@pytest.fixture
+def engine(plant):
+    """An engine driven inline (no thread), 100 hours into a run."""
+    bus0 = plant.network.bus_list[0]
+    engine = SimulationEngine(plant, state=grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0, seed=0))
+    engine.timeline.record(engine.state, force=True)
+    engine.timeline.prefill(plant, until=100)
+    engine.execute("seek", hour=30)
+    return engine
+
+
+@pytest.mark.parametrize("name, kw, match", [
+    ("set", {"foo": 1}, "not operator-settable"),
+    ("set", {"bess_active": True, "idx": 5}, "not operator-settable"),
+    ("warp", {}, "unknown simulation command"),
+])
+def test_rejected_commands_keep_the_timeline(engine, name, kw, match):
+    hours, snapshot = engine.timeline.hours, engine.snapshot()
+    with pytest.raises(ValueError, match=match):
+        engine.execute(name, **kw)
+    assert engine.timeline.hours == hours
+    assert engine.state.bess_active is snapshot.bess_active is False
+
+
+def test_accepted_commands_drop_later_checkpoints(engine):
+    engine.execute("set", bess_active=True)
+    assert engine.timeline.hours[-1] <= 30
+    assert engine.state.bess_active
+
+
+def test_pacing_keeps_the_timeline(engine):
+    hours = engine.timeline.hours
+    engine.execute("set", speed=0.5, run_simulation=False)
+    assert engine.timeline.hours == hours
+
+
+def test_prefill_plans_with_its_own_planner_up_to_the_window(plant):
+    def live(state, idx, load):
+        raise AssertionError("the prefill used the live planner")
+
+    def replay(state, idx, load):
+        planned.append(idx)
+        return state.tap_position, 0.0, 0.0
+
+    planned = []
+    bus0 = plant.network.bus_list[0]
+    engine = SimulationEngine(plant, mpc_planner=live, prefill_planner=replay,
+                              state=grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0, seed=0))
+    engine.execute("set", mpc_active=True)
+    window = PREFILL_CHECKPOINTS * engine.timeline.every
+    assert engine.prefill_timeline() == window
+    assert engine.timeline.hours[-1] == window
+    assert planned == list(range(1, window + 1))
+    assert engine.prefill_timeline() == 0
+
+
+def test_paused_refresh_leaves_the_run_alone(plant):
+    bus0 = plant.network.bus_list[0]
+    state = grid_physics.GridState(fault_bus="bus1003", monitored_bus="bus1003", seed=0)
+    state.auto_tap_mode = state.apfc_auto_mode = True
+    state.spatial_penetration_pct = 80
+    for _ in range(30):
+        grid_physics.tick(state, plant)
+    state.fault_active = True
+    grid_physics.tick(state, plant)
+    before = (state.tap_position, state.capacitor_bank_kvAr, state.relay_accumulator, state.tap_moves_count,
+              len(state.history_tap), state.rng.bit_generator.state, state.delta_p, state.feeder["delta_feeder"])
+    views = []
+    for _ in range(2):
+        grid_physics.refresh(state, plant)
+        after = (state.tap_position, state.capacitor_bank_kvAr, state.relay_accumulator, state.tap_moves_count,
+                 len(state.history_tap), state.rng.bit_generator.state)
+        assert after == before[:6]
+        # Deltas against the previous hour (up to the PV noise), not against the refresh before
+        assert state.delta_p == pytest.approx(before[6], abs=0.05 * state.total_pv_gen + 1e-9)
+        assert state.feeder["delta_feeder"] == pytest.approx(before[7])
+        views.append((state.delta_p, state.p_grid_net, state.feeder["measured_v"]))
+    assert views[0] == views[1]
+    assert state.feeder["bus"] == "bus1003" != bus0
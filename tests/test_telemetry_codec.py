@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+import grid_physics
+from grid_physics import PLOT_HISTORY
+from sim_engine import take_snapshot
+from timeline import Timeline
+from telemetry_codec import (
+    BUS_ARRAYS, FLAG_KEY, FLAG_ZLIB, HEADER, HISTORIES, SCALARS, STATUS, FrameDecoder, FrameEncoder, FrameError,
+)
+
+
+@pytest.fixture(scope="module")
+def snapshots(plant):
+    """Consecutive snapshots of a short run with a fault injected and cleared halfway."""
+    bus0 = plant.network.bus_list[0]
+    state = grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0, seed=0)
+    state.bess_active, state.spatial_penetration_pct = True, 50
+    snaps = []
+    for seq in range(1, 41):
+        if seq == 15:
+            state.fault_active, state.fault_type = True, "L-L (Line-to-Line)"
+        if seq == 25:
+            state.fault_active = False
+        grid_physics.tick(state, plant)
+        snaps.append(take_snapshot(state, seq=seq))
+    return snaps
+
+
+def assert_decoded(decoder, snap, rows):
+    np.testing.assert_array_equal(decoder.values["scalars"],
+                                  np.array([getattr(snap, k) for k in SCALARS], dtype=np.float32))
+    np.testing.assert_array_equal(decoder.values["buses"], rows.astype(np.float32))
+    for name in BUS_ARRAYS:
+        np.testing.assert_array_equal(decoder.values[name], np.asarray(getattr(snap, name), dtype=np.float32)[rows])
+    for name in HISTORIES:
+        np.testing.assert_array_equal(decoder.values[name],
+                                      np.array(getattr(snap, name)[-PLOT_HISTORY:], dtype=np.float32))
+    assert decoder.values["status"] == {k: getattr(snap, k) for k in STATUS}
+    assert (decoder.seq, decoder.published_at) == (snap.seq, snap.published_at)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+@pytest.mark.parametrize("selection", [None, [0, 3, 7, 20]])
+def test_delta_stream_round_trip(plant, snapshots, compress, selection):
+    encoder = FrameEncoder(plant.network, selection, compress=compress)
+    decoder = FrameDecoder()
+    for snap in snapshots:
+        frame = encoder.encode(snap)
+        decoder.apply(frame.delta)
+        assert_decoded(decoder, snap, encoder.rows)
+
+
+def test_key_frame_resyncs_a_new_client(plant, snapshots):
+    encoder = FrameEncoder(plant.network, compress=True)
+    for snap in snapshots:
+        frame = encoder.encode(snap)
+    late = FrameDecoder()
+    late.apply(frame.key)
+    assert_decoded(late, snapshots[-1], encoder.rows)
+    assert HEADER.unpack_from(frame.key)[1] & FLAG_KEY
+
+
+def test_deltas_are_smaller_than_key_frames(plant, snapshots):
+    encoder = FrameEncoder(plant.network, compress=True)
+    frames = [encoder.encode(snap) for snap in snapshots]
+    assert all(len(f.delta) < len(f.key) for f in frames[1:])
+    assert any(HEADER.unpack_from(f.delta)[1] & FLAG_ZLIB for f in frames)
+
+
+def test_delta_on_the_wrong_base_is_rejected(plant, snapshots):
+    encoder = FrameEncoder(plant.network)
+    first = encoder.encode(snapshots[0])
+    encoder.encode(snapshots[1])
+    third = encoder.encode(snapshots[2])
+    decoder = FrameDecoder()
+    decoder.apply(first.delta)
+    with pytest.raises(FrameError, match="delta for seq"):
+        decoder.apply(third.delta)
+    with pytest.raises(FrameError, match="not a telemetry frame"):
+        decoder.apply(b"XXXX" + third.delta[4:])
+
+
+def test_seek_resends_the_replaced_histories(plant):
+    """A seek forward from hour 5 restores the hour-24 checkpoint and replays to 30: the histories end up
+    longer than the last frame's, but none of their values continue it."""
+    bus0 = plant.network.bus_list[0]
+    state = grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0, seed=0)
+    timeline = Timeline(24)
+    timeline.record(state, force=True)
+    timeline.prefill(plant, until=48)
+    encoder, decoder = FrameEncoder(plant.network), FrameDecoder()
+    for seq in range(1, 6):
+        grid_physics.tick(state, plant)
+        decoder.apply(encoder.encode(take_snapshot(state, seq=seq)).delta)
+    timeline.seek(state, plant, 30)
+    snap = take_snapshot(state, seq=6)
+    decoder.apply(encoder.encode(snap).delta)
+    assert_decoded(decoder, snap, encoder.rows)
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import struct
+
+import pytest
+
+import grid_physics
+from sim_engine import SimulationEngine
+from telemetry_server import (
+    MAX_REQUEST_BYTES, SubscriptionError, TelemetryServer, bus_selection, ws_accept_key, ws_frame, ws_read,
+)
+
+# RFC 6455 section 1.3 and 5.7 examples
+RFC_KEY, RFC_ACCEPT = "dGhlIHNhbXBsZSBub25jZQ==", "s3pPLMBiTxaQ9kYGzzhZRbK+xOo="
+RFC_MASKED_HELLO = bytes([0x81, 0x85, 0x37, 0xfa, 0x21, 0x3d, 0x7f, 0x9f, 0x4d, 0x51, 0x58])
+
+
+def client_frame(payload, opcode=0x1, mask=b"\x11\x22\x33\x44"):
+    """Masked, unfragmented client frame."""
+    n = len(payload)
+    if n < 126:
+        head = struct.pack("!BB", 0x80 | opcode, 0x80 | n)
+    elif n < 1 << 16:
+        head = struct.pack("!BBH", 0x80 | opcode, 0x80 | 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, 0x80 | 127, n)
+    return head + mask + bytes(b ^ mask[k % 4] for k, b in enumerate(payload))
+
+
+async def read_server_frame(reader):
+    """(opcode, payload) of the next server frame, which is never masked."""
+    b0, b1 = await reader.readexactly(2)
+    assert not b1 & 0x80
+    n = b1 & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", await reader.readexactly(8))[0]
+    return b0 & 0x0F, await reader.readexactly(n)
+
+
+def read_client_frame(data):
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await ws_read(reader)
+    return asyncio.run(read())
+
+
+def test_accept_key_matches_the_rfc_example():
+    assert ws_accept_key(RFC_KEY) == RFC_ACCEPT
+
+
+def test_masked_client_frames_are_unmasked():
+    assert read_client_frame(RFC_MASKED_HELLO) == (0x1, b"Hello")
+    payload = json.dumps({"bus": ["bus1003"] * 30}).encode()
+    assert read_client_frame(client_frame(payload)) == (0x1, payload)
+    assert read_client_frame(client_frame(b"", opcode=0x9)) == (0x9, b"")
+
+
+def test_oversized_client_frame_is_refused():
+    with pytest.raises(ConnectionError, match="too large"):
+        read_client_frame(client_frame(b"x" * (MAX_REQUEST_BYTES + 1)))
+
+
+@pytest.mark.parametrize("n, head", [(5, 2), (125, 2), (126, 4), (65535, 4), (65536, 10)])
+def test_server_frame_length_encodings(n, head):
+    payload = bytes(range(256)) * (n // 256) + bytes(range(n % 256))
+    frame = ws_frame(payload, 0x2)
+    assert len(frame) == head + n
+    assert frame[0] == 0x82 and not frame[1] & 0x80
+
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(frame)
+        return await read_server_frame(reader)
+    assert asyncio.run(read()) == (0x2, payload)
+
+
+def test_bus_selection(plant):
+    network = plant.network
+    assert bus_selection(network) is None
+    rows = bus_selection(network, feeders=["a"])
+    assert rows and all(network.bus_feeder[k] == "A" for k in rows)
+    assert len(rows) == sum(f == "A" for f in network.bus_feeder)
+    bus = network.bus_list[rows[-1] + 1]
+    assert network.bus_feeder[rows[-1] + 1] != "A"
+    # Bus names are normalized; a bus of another feeder joins the feeder's, in bus_list order
+    assert bus_selection(network, feeders=["A"], buses=[bus.upper()]) == tuple(sorted(rows + (rows[-1] + 1,)))
+    assert bus_selection(network, buses=[bus, bus]) == (rows[-1] + 1,)
+    with pytest.raises(SubscriptionError, match="unknown feeder"):
+        bus_selection(network, feeders=["Z"])
+    with pytest.raises(SubscriptionError, match="unknown bus"):
+        bus_selection(network, buses=["bus0"])
+
+
+def test_websocket_session(plant):
+    bus0 = plant.network.bus_list[0]
+    engine = SimulationEngine(plant, state=grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0, seed=0))
+    feeder_a = [b for b, f in zip(plant.network.bus_list, plant.network.bus_feeder) if f == "A"]
+
+    async def session():
+        server = await TelemetryServer(engine, port=0).start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        try:
+            writer.write(f"GET /ws?feeder=A HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+                         f"Connection: Upgrade\r\nSec-WebSocket-Key: {RFC_KEY}\r\n\r\n".encode())
+            head = (await reader.readuntil(b"\r\n\r\n")).decode()
+            assert head.startswith("HTTP/1.1 101") and f"Sec-WebSocket-Accept: {RFC_ACCEPT}" in head
+
+            # The current state first, restricted to the subscription
+            opcode, payload = await read_server_frame(reader)
+            assert opcode == 0x1 and json.loads(payload)["buses"]["name"] == feeder_a
+
+            writer.write(client_frame(json.dumps({"feeder": ["Z"]}).encode()))
+            opcode, payload = await read_server_frame(reader)
+            assert opcode == 0x1 and "unknown feeder" in json.loads(payload)["error"]
+
+            writer.write(client_frame(json.dumps({"bus": [bus0.upper()]}).encode()))
+            writer.write(client_frame(b"are you there", opcode=0x9))
+            assert await read_server_frame(reader) == (0xA, b"are you there")
+
+            # The next published snapshot goes out with the new selection
+            engine.execute("set", speed=0.5)
+            opcode, payload = await read_server_frame(reader)
+            frame = json.loads(payload)
+            assert frame["buses"]["name"] == [bus0] and frame["seq"] == engine.snapshot().seq
+
+            writer.write(client_frame(struct.pack("!H", 1000) + b"bye", opcode=0x8))
+            assert await read_server_frame(reader) == (0x8, struct.pack("!H", 1000))
+            assert await reader.read() == b""
+            await asyncio.sleep(0)
+            assert server.subscribers == set()
+        finally:
+            writer.close()
+            await server.stop()
+
+    asyncio.run(session())
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import grid_physics
+from timeline import Timeline
+
+HOURS = 400
+EVERY = 24
+CHECKED = ("bess_soc", "tap_position", "transformer_thermal", "grid_freq", "rotor_angle", "room_temp",
+           "capacitor_bank_kvAr", "relay_accumulator", "p_grid_net", "total_pv_gen", "bus_v")
+
+
+def fresh_state(plant, seed=0):
+    bus0 = plant.network.bus_list[0]
+    state = grid_physics.GridState(fault_bus=bus0, monitored_bus=bus0, seed=seed)
+    state.bess_active, state.spatial_penetration_pct = True, 60
+    state.auto_tap_mode = state.apfc_auto_mode = True
+    return state
+
+
+def values(state):
+    return [np.copy(getattr(state, k)) for k in CHECKED]
+
+
+def assert_same(actual, expected):
+    for name, a, b in zip(CHECKED, actual, expected):
+        np.testing.assert_array_equal(a, b, err_msg=name)
+
+
+@pytest.fixture(scope="module")
+def reference(plant):
+    """{hour: checked values} of one uninterrupted run."""
+    state = fresh_state(plant)
+    ref = {}
+    for _ in range(HOURS):
+        grid_physics.tick(state, plant)
+        ref[state.idx] = values(state)
+    return ref
+
+
+@pytest.fixture
+def timeline(plant):
+    state = fresh_state(plant)
+    timeline = Timeline(EVERY)
+    timeline.record(state, force=True)
+    timeline.prefill(plant, until=HOURS)
+    return timeline
+
+
+def test_prefill_checkpoints_every_interval(timeline):
+    assert timeline.hours == list(range(0, HOURS + 1, EVERY))
+
+
+def test_seek_is_exact_in_any_order(plant, reference, timeline):
+    state = fresh_state(plant, seed=123)   # a different RNG: the checkpoint's must win
+    for hour in np.random.default_rng(0).integers(1, HOURS, 40):
+        ticks = timeline.seek(state, plant, int(hour))
+        assert state.idx == hour
+        assert ticks < EVERY
+        assert_same(values(state), reference[hour])
+
+
+def test_run_continues_exactly_after_a_seek(plant, reference, timeline):
+    state = fresh_state(plant)
+    timeline.seek(state, plant, 150)
+    np.random.seed(99)                     # other users of the global RNG change nothing
+    np.random.random(1000)
+    for _ in range(60):
+        grid_physics.tick(state, plant)
+        assert_same(values(state), reference[state.idx])
+
+
+def test_invalidated_prefill_records_nothing_stale(plant, timeline):
+    generation = timeline._generation
+    timeline.invalidate_after(100)
+    assert timeline.hours == list(range(0, 101, EVERY))
+    state = fresh_state(plant)
+    timeline.seek(state, plant, 120)
+    assert not timeline.record(state, force=True, generation=generation)
+    assert timeline.hours[-1] == 120 // EVERY * EVERY
+
+
+def test_seek_out_of_range(plant, timeline):
+    with pytest.raises(ValueError, match="hour must be in"):
+        timeline.seek(fresh_state(plant), plant, len(plant.total_p))
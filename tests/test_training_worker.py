@@ -0,0 +1,78 @@
+import io
+import pickle
+
+import numpy as np
+import pytest
+
+from training_worker import DONE, FAILED, QUEUED, RUNNING, TrainingWorker, _worker_main
+
+
+def stream(*objs):
+    buf = io.BytesIO()
+    for obj in objs:
+        pickle.dump(obj, buf)
+    buf.seek(0)
+    return buf
+
+
+def events_of(buf):
+    buf.seek(0)
+    out = []
+    while True:
+        try:
+            out.append(pickle.load(buf))
+        except EOFError:
+            return out
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    # The child inherits the working directory: a job it gets to never publishes into the repository
+    monkeypatch.chdir(tmp_path)
+    worker = TrainingWorker()
+    yield worker
+    worker.stop(timeout=0.1)
+
+
+def test_pending_job_is_not_queued_twice(worker):
+    job_id = worker.submit("load", np.zeros(5))
+    assert worker.submit("load", np.ones(5)) == job_id
+    assert worker.status("load")['state'] == QUEUED
+    assert worker.submit("solar", np.zeros(5), is_solar=True) != job_id
+
+
+def test_stopped_worker_fails_its_pending_job_and_restarts(worker):
+    first = worker.submit("load", np.zeros(5))
+    worker.stop(timeout=0.1)
+    assert not worker.alive
+    status = worker.status("load")
+    assert (status['job_id'], status['state'], status['stage']) == (first, FAILED, "worker exited")
+    assert not worker.busy("load")
+    assert worker.submit("load", np.zeros(5)) != first
+    assert worker.alive
+
+
+def test_events_of_a_superseded_job_are_ignored(worker):
+    worker.submit("load", np.zeros(5))
+    worker.stop(timeout=0.1)
+    current = worker.submit("load", np.zeros(5))
+    worker._drain_events(stream(
+        {'job_id': current - 1, 'series': "load", 'state': DONE, 'stage': "published", 'progress': 1.0},
+        {'job_id': current, 'series': "load", 'state': RUNNING, 'stage': "lstm", 'progress': 0.5},
+    ))
+    status = worker.status("load")
+    assert (status['job_id'], status['state'], status['stage']) == (current, RUNNING, "lstm")
+
+
+def test_worker_loop_reports_a_failed_job_and_stops_at_the_sentinel(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # A scalar series fails before anything is fitted
+    job = {'job_id': 7, 'series': "load", 'values': np.float64(1.0), 'is_solar': False, 'start_hour': 0,
+           'baseline_hours': None, 'parent': None, 'epochs': None, 'source_digest': None}
+    never_read = {'job_id': 8, 'series': "solar"}
+    events = io.BytesIO()
+    _worker_main(stream(job, None, never_read), events)
+    reported = events_of(events)
+    assert [(ev['job_id'], ev['state'], ev['stage']) for ev in reported] == [(7, RUNNING, "start"),
+                                                                             (7, FAILED, "error")]
+    assert "TypeError" in reported[-1]['error']
@@ -0,0 +1,176 @@
+"""
+SIMULATION TIMELINE (CHECKPOINTED SEEK)
+Jumping to an arbitrary hour used to mean either resetting `idx` (BESS SOC,
+tap position, transformer thermal state, frequency and protection state
+then belong to the wrong hour) or replaying every tick up to it. A Timeline
+keeps a compact checkpoint of the dynamic grid state every CHECKPOINT_HOURS
+hours of a run; seek() restores the nearest checkpoint at or before the
+target hour and fast-forwards through the few remaining ticks.
+
+A checkpoint copies the GridState fields other than the audit log and the
+clock pacing (per-tick outputs included, plot histories cut to their last
+PLOT_HISTORY points) together with the state's own RNG (GridState.rng), so
+the fast-forward after a restore replays the original run tick for tick,
+whatever other threads draw from the global NumPy RNG meanwhile.
+
+Checkpoints describe the run as it happened. Operator commands change what
+comes after the hour they were applied at, so the engine drops every later
+checkpoint when one arrives (invalidate_after). Hours past the last
+checkpoint are reached by simulating forward. prefill() does that ahead of
+time on a scratch state, so that hours up to where it stopped are a short
+replay away; it touches nothing but the timeline and may run on its own
+thread (sim_engine runs it in the background over a window ahead of the
+live hour), stopping as soon as an invalidation makes what it simulates
+obsolete.
+"""
+import bisect
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+import grid_physics
+from grid_physics import PLOT_HISTORY
+
+CHECKPOINT_HOURS = 24
+
+# Belong to the session, not to the simulated hour: a seek leaves them alone
+# (restore() bumps history_epoch)
+LIVE_FIELDS = frozenset({"audit_log", "run_simulation", "speed", "compact_histories", "history_epoch"})
+# Checkpointed as its bit generator state, restored into the state's own generator
+_RNG_FIELD = "rng"
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    hour: int
+    fields: dict
+    rng_state: dict
+
+
+def _copy(value):
+    if isinstance(value, list):
+        return value[-PLOT_HISTORY:]
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    return value
+
+
+def capture(state):
+    fields = {k: _copy(v) for k, v in vars(state).items() if k not in LIVE_FIELDS and k != _RNG_FIELD}
+    return Checkpoint(state.idx, fields, state.rng.bit_generator.state)
+
+
+def restore(state, checkpoint):
+    for key, value in checkpoint.fields.items():
+        # Fresh containers: the next tick appends to the histories in place
+        setattr(state, key, _copy(value))
+    state.rng.bit_generator.state = checkpoint.rng_state
+    # The histories are the checkpoint's now, not a continuation of the live ones
+    state.history_epoch += 1
+
+
+class Timeline:
+    """
+    Checkpoints of one run, indexed by hour of the year. record() is called
+    after every tick and keeps the state whenever the hour is a multiple of
+    `every`. Thread-safe; seek() and prefill() must run on the thread that
+    owns the state (the engine thread, or the caller when headless).
+    """
+    def __init__(self, every=CHECKPOINT_HOURS):
+        if every < 1:
+            raise ValueError("checkpoint interval must be at least one hour")
+        self.every = every
+        self._lock = threading.Lock()
+        self._checkpoints = {}
+        self._hours = []
+        # Bumped by every invalidation; a prefill started under an older one stops
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._hours)
+
+    @property
+    def hours(self):
+        return list(self._hours)
+
+    def record(self, state, force=False, generation=None):
+        """Keeps a checkpoint of `state` at checkpoint hours; with a `generation`, only if still current."""
+        if not force and state.idx % self.every:
+            return True
+        checkpoint = capture(state)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            if checkpoint.hour not in self._checkpoints:
+                bisect.insort(self._hours, checkpoint.hour)
+            self._checkpoints[checkpoint.hour] = checkpoint
+        return True
+
+    def invalidate_after(self, hour):
+        """Drops the checkpoints later than `hour` (the run diverged there)."""
+        with self._lock:
+            self._generation += 1
+            cut = bisect.bisect_right(self._hours, hour)
+            for h in self._hours[cut:]:
+                del self._checkpoints[h]
+            del self._hours[cut:]
+
+    def nearest(self, hour):
+        """Latest checkpoint at or before `hour`, or None."""
+        with self._lock:
+            i = bisect.bisect_right(self._hours, hour)
+            return self._checkpoints[self._hours[i - 1]] if i else None
+
+    def latest(self):
+        with self._lock:
+            return self._checkpoints[self._hours[-1]] if self._hours else None
+
+    def seek(self, state, plant, hour, mpc_planner=None):
+        """
+        Moves `state` to `hour` with consistent dynamic state and returns the
+        number of ticks replayed. Starts from the nearest checkpoint, or from
+        the live state when that is already closer (seeking forward past the
+        last checkpoint), and records checkpoints along the way.
+        """
+        n_hours = len(plant.total_p)
+        if not 0 <= hour < n_hours:
+            raise ValueError(f"hour must be in [0, {n_hours}), got {hour}")
+        base = self.nearest(hour) or self.latest()
+        # Whichever of the checkpoint and the live state is fewer ticks short of the target (the year wraps)
+        if base is not None and (hour - base.hour) % n_hours < (hour - state.idx) % n_hours:
+            restore(state, base)
+        ticks = 0
+        while state.idx != hour:
+            grid_physics.tick(state, plant, mpc_planner)
+            self.record(state)
+            ticks += 1
+        return ticks
+
+    def prefill(self, plant, until=None, mpc_planner=None, stop=None):
+        """
+        Simulates ahead from the last checkpoint to `until` (default: the
+        last hour of the year) on a scratch state, recording checkpoints, so
+        later seeks into that range are short. Stops early when a checkpoint
+        is invalidated meanwhile or `stop` (a threading.Event) is set.
+        Returns the number of ticks simulated.
+        """
+        until = len(plant.total_p) - 1 if until is None else until
+        with self._lock:
+            generation = self._generation
+            last = self._checkpoints[self._hours[-1]] if self._hours else None
+        if last is None:
+            raise ValueError("timeline has no checkpoint to start from")
+        if last.hour >= until:
+            return 0
+        scratch = grid_physics.GridState()
+        restore(scratch, last)
+        ticks = 0
+        while scratch.idx < until and not (stop is not None and stop.is_set()):
+            grid_physics.tick(scratch, plant, mpc_planner)
+            ticks += 1
+            if not self.record(scratch, generation=generation):
+                break
+        return ticks
@@ -0,0 +1,185 @@
+"""
+BACKGROUND TRAINING WORKER
+Model fitting runs in a separate process fed by a job queue, so Prophet fits
+and LSTM epochs never block a dashboard session. The worker publishes each
+finished model set atomically (see forecasting.train_and_publish); serving
+code keeps using the last published models until the manifest version moves.
+
+The process is a fresh interpreter running this file: jobs go to it pickled
+on its stdin, progress events come back pickled on its stdout and are folded
+into a per-series status table by a drain thread in the parent process.
+(multiprocessing's spawn would re-run the parent's __main__ in the child,
+which under Streamlit is the dashboard script.) The worker exits at the end
+of its job stream, or mid-job as soon as the parent is gone.
+"""
+import itertools
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+import numpy as np
+
+# Job states reported through status()
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def _send(stream, obj):
+    pickle.dump(obj, stream, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.flush()
+
+
+def _worker_main(jobs, events):
+    """Worker process loop: one job at a time until a None sentinel or the end of the job stream."""
+    # Imported here so the parent never pays for the training stacks
+    import forecasting
+
+    while True:
+        try:
+            job = pickle.load(jobs)
+        except EOFError:
+            break
+        if job is None:
+            break
+        job_id, series = job['job_id'], job['series']
+
+        def progress(stage, fraction, _id=job_id, _series=series):
+            _send(events, {'job_id': _id, 'series': _series, 'state': RUNNING,
+                           'stage': stage, 'progress': float(fraction)})
+
+        progress("start", 0.0)
+        try:
+            entry = forecasting.train_and_publish(
+                job['values'], is_solar=job['is_solar'], start_hour=job['start_hour'],
+                baseline_hours=job['baseline_hours'], parent=job['parent'],
+                epochs=job['epochs'], progress=progress, source_digest=job['source_digest'])
+            _send(events, {'job_id': job_id, 'series': series, 'state': DONE, 'stage': "published",
+                           'progress': 1.0, 'version': entry['version']})
+        except Exception:
+            _send(events, {'job_id': job_id, 'series': series, 'state': FAILED, 'stage': "error",
+                           'progress': 1.0, 'error': traceback.format_exc(limit=3)})
+
+
+class TrainingWorker:
+    """
+    Parent-side handle for the training process. submit() is non-blocking and
+    de-duplicates: a series with a queued or running job gets no second job.
+    The process is started lazily on the first submit.
+    """
+    def __init__(self):
+        self._jobs = None
+        self._proc = None
+        self._drain = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._status = {}
+
+    # --- Lifecycle ---
+    def start(self):
+        with self._lock:
+            if self.alive:
+                return
+            # A clean interpreter: it inherits neither Streamlit's threads nor its __main__
+            self._proc = subprocess.Popen([sys.executable, os.path.abspath(__file__)],
+                                          stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            # submit() only queues: a job is larger than the pipe buffer, and the child
+            # reads the next one only when it is done training
+            self._jobs = queue.Queue()
+            threading.Thread(target=self._feed_jobs, args=(self._jobs, self._proc.stdin),
+                             name="forecast-trainer-jobs", daemon=True).start()
+            self._drain = threading.Thread(target=self._drain_events, args=(self._proc.stdout,),
+                                           name="forecast-trainer-events", daemon=True)
+            self._drain.start()
+
+    def stop(self, timeout=5.0):
+        with self._lock:
+            proc, jobs = self._proc, self._jobs
+            self._proc = None
+        if proc is None:
+            return
+        jobs.put(None)
+        try:
+            proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            proc.terminate()
+
+    @property
+    def alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    # --- Jobs ---
+    def submit(self, series, values, is_solar=False, start_hour=0, baseline_hours=None,
+               parent=None, epochs=None, source_digest=None):
+        """Queues a training job; returns its id, or the pending job's id for this series."""
+        pending = self.status(series)
+        if pending is not None and pending['state'] in (QUEUED, RUNNING) and self.alive:
+            return pending['job_id']
+        self.start()
+        job_id = next(self._ids)
+        job = {'job_id': job_id, 'series': series, 'values': np.asarray(values, dtype=float),
+               'is_solar': is_solar, 'start_hour': int(start_hour), 'baseline_hours': baseline_hours,
+               'parent': parent, 'epochs': epochs, 'source_digest': source_digest}
+        with self._lock:
+            self._status[series] = {'job_id': job_id, 'series': series, 'state': QUEUED,
+                                    'stage': "queued", 'progress': 0.0, 'submitted_at': time.time()}
+        self._jobs.put(job)
+        return job_id
+
+    def status(self, series):
+        """Latest status dict for a series' most recent job, or None."""
+        with self._lock:
+            st = self._status.get(series)
+            if st is not None and st['state'] in (QUEUED, RUNNING) and not self.alive:
+                # Worker died mid-job: surface it instead of spinning forever
+                st = dict(st, state=FAILED, stage="worker exited")
+                self._status[series] = st
+            return dict(st) if st is not None else None
+
+    def busy(self, series):
+        st = self.status(series)
+        return st is not None and st['state'] in (QUEUED, RUNNING)
+
+    @staticmethod
+    def _feed_jobs(jobs, pipe):
+        while True:
+            job = jobs.get()
+            try:
+                _send(pipe, job)
+            except (OSError, ValueError):
+                return # Worker gone
+            if job is None:
+                pipe.close()
+                return
+
+    def _drain_events(self, events):
+        while True:
+            try:
+                ev = pickle.load(events)
+            except (EOFError, OSError, pickle.UnpicklingError):
+                return # Worker exited
+            with self._lock:
+                st = self._status.get(ev['series'])
+                # Ignore stale events from a superseded job
+                if st is not None and st['job_id'] != ev['job_id']:
+                    continue
+                self._status[ev['series']] = dict(st or {}, **ev)
+
+
+def _exit_with(parent, poll=1.0):
+    """Ends the worker once its parent is gone, even mid-job (end of the job stream only comes between jobs)."""
+    while os.getppid() == parent:
+        time.sleep(poll)
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    # Worker process (see TrainingWorker.start). Events get their own copy of
+    # stdout; fd 1 then points at stderr, so library output can't corrupt them.
+    threading.Thread(target=_exit_with, args=(os.getppid(),), name="parent-watch", daemon=True).start()
+    events = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    _worker_main(sys.stdin.buffer, events)